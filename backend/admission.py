@@ -0,0 +1,287 @@
+"""
+Admission control for the expensive endpoints
+Receipt uploads (OCR) and recipe recommendations take far longer than the
+list reads, and under a burst they can hold every worker thread while
+cheap requests wait behind them. AdmissionControlMiddleware gives each of
+those routes
+
+    a concurrency limit      at most N requests run at once
+    a bounded wait queue     up to M more wait (FIFO) for a slot, each for
+                             at most ADMISSION_QUEUE_TIMEOUT_SECONDS
+                             (UPLOAD_QUEUE_TIMEOUT_SECONDS for uploads)
+    fast rejection           a full queue or an expired wait answers 503
+                             with Retry-After instead of piling up
+
+and uploads additionally get a per-user token bucket (429 with Retry-After
+once a user has used up UPLOAD_BURST uploads faster than
+UPLOAD_RATE_PER_MINUTE). Retry-After for 503s is estimated from the
+route's recent service time and the queue length.
+
+All state lives in the worker process, so with serve.py --workers N the
+limits apply per worker. Rejections are counted in
+freshtrack_admission_shed_total{route, reason}.
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from starlette.routing import compile_path
+
+from metrics import counter, gauge, histogram
+
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "1") == "1"
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+
+# 0 turns the limit off
+UPLOAD_MAX_CONCURRENCY = int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4"))
+UPLOAD_MAX_QUEUE = int(os.getenv("UPLOAD_MAX_QUEUE", "16"))
+# OCR takes seconds, so uploads may wait longer than reads
+UPLOAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_QUEUE_TIMEOUT_SECONDS", "15"))
+UPLOAD_RATE_PER_MINUTE = float(os.getenv("UPLOAD_RATE_PER_MINUTE", "12"))
+UPLOAD_BURST = int(os.getenv("UPLOAD_BURST", "6"))
+RECOMMEND_MAX_CONCURRENCY = int(os.getenv("RECOMMEND_MAX_CONCURRENCY", "8"))
+RECOMMEND_MAX_QUEUE = int(os.getenv("RECOMMEND_MAX_QUEUE", "32"))
+
+# Users with a token bucket remembered per worker; the least recently seen
+# is forgotten first (and starts again with a full bucket)
+MAX_TRACKED_USERS = 10000
+
+# Bounds of the Retry-After estimate for 503s
+MIN_RETRY_AFTER_SECONDS = 1
+MAX_RETRY_AFTER_SECONDS = 60
+
+SHED = counter(
+    "freshtrack_admission_shed_total",
+    "Requests rejected by admission control; reason=queue_full|queue_timeout|rate_limited",
+    ("route", "reason")
+)
+ACTIVE = gauge(
+    "freshtrack_admission_active",
+    "Requests holding a concurrency slot",
+    ("route",)
+)
+QUEUED = gauge(
+    "freshtrack_admission_queued",
+    "Requests waiting for a concurrency slot",
+    ("route",)
+)
+QUEUE_WAIT = histogram(
+    "freshtrack_admission_queue_wait_seconds",
+    "Time admitted requests waited for a concurrency slot",
+    ("route",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+
+class Rejected(Exception):
+    """Request refused before it ran"""
+
+    def __init__(self, status: int, reason: str, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+class ConcurrencyLimiter:
+    """
+    At most max_concurrency holders, max_queue FIFO waiters
+
+    Runs on the worker's event loop only, so no locking. A released slot is
+    handed straight to the oldest waiter, so late arrivals can't overtake
+    the queue.
+    """
+
+    def __init__(self, route: str, max_concurrency: int, max_queue: int,
+                 timeout: float = QUEUE_TIMEOUT_SECONDS):
+        self.route = route
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: deque = deque()
+        # Moving average of how long a request holds its slot
+        self.service_seconds = 0.0
+
+    def retry_after(self) -> float:
+        """Seconds until the current queue has probably drained"""
+        return self.service_seconds * (len(self._waiters) + 1) / self.max_concurrency
+
+    async def acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            ACTIVE.inc(route=self.route)
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            raise Rejected(503, "queue_full", self.retry_after(), "Server busy, try again later")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        QUEUED.inc(route=self.route)
+        started = time.perf_counter()
+        try:
+            # Returns normally if release() handed us the slot just as the
+            # timeout fired
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise Rejected(503, "queue_timeout", self.retry_after(), "Server busy, try again later")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Handed a slot just as the client went away
+                self._pass_slot()
+            raise
+        finally:
+            QUEUED.dec(route=self.route)
+            if future in self._waiters:
+                self._waiters.remove(future)
+        QUEUE_WAIT.observe(time.perf_counter() - started, route=self.route)
+
+    def release(self, held_seconds: float):
+        self.service_seconds = held_seconds if not self.service_seconds else (
+            0.8 * self.service_seconds + 0.2 * held_seconds
+        )
+        self._pass_slot()
+
+    def _pass_slot(self):
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                # The slot goes to the waiter; active stays the same
+                future.set_result(None)
+                return
+        self.active -= 1
+        ACTIVE.dec(route=self.route)
+
+
+class UserRateLimiter:
+    """Token bucket per user: `burst` requests at once, refilled at rate_per_minute"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_users: int = MAX_TRACKED_USERS):
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, user: str) -> float:
+        """
+        Spend one token for this user
+
+        Returns:
+            0 if the request may run, else seconds until a token is available
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(user, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / self.rate
+
+        self._buckets[user] = (tokens, now)
+        if len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RoutePolicy:
+    """Limits for one route template and method"""
+
+    def __init__(self, method: str, path: str, max_concurrency: int, max_queue: int,
+                 timeout: float = QUEUE_TIMEOUT_SECONDS, user_rate: Optional[UserRateLimiter] = None,
+                 user_param: str = "user_id"):
+        self.method = method
+        self.path = path
+        self.path_regex, _, _ = compile_path(path)
+        self.limiter = ConcurrencyLimiter(path, max_concurrency, max_queue, timeout) if max_concurrency > 0 else None
+        self.user_rate = user_rate
+        self.user_param = user_param
+
+    def match(self, scope) -> Optional[Dict[str, str]]:
+        """Path parameters if this policy covers the request, else None"""
+        if scope["method"] != self.method:
+            return None
+        match = self.path_regex.match(scope["path"])
+        return match.groupdict() if match else None
+
+
+def default_policies() -> List[RoutePolicy]:
+    """Receipt uploads and recipe recommendations, configured from the environment"""
+    if not ADMISSION_CONTROL:
+        return []
+
+    upload_rate = None
+    if UPLOAD_RATE_PER_MINUTE > 0 and UPLOAD_BURST > 0:
+        upload_rate = UserRateLimiter(UPLOAD_RATE_PER_MINUTE, UPLOAD_BURST)
+
+    return [
+        RoutePolicy("POST", "/api/receipt/upload/{user_id}", UPLOAD_MAX_CONCURRENCY, UPLOAD_MAX_QUEUE,
+                    timeout=UPLOAD_QUEUE_TIMEOUT_SECONDS, user_rate=upload_rate),
+        RoutePolicy("GET", "/api/recipes/recommend/{user_id}", RECOMMEND_MAX_CONCURRENCY, RECOMMEND_MAX_QUEUE),
+    ]
+
+
+async def send_rejection(send, rejected: Rejected):
+    retry_after = min(MAX_RETRY_AFTER_SECONDS, max(MIN_RETRY_AFTER_SECONDS, math.ceil(rejected.retry_after)))
+    body = json.dumps({"detail": rejected.detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": rejected.status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(retry_after).encode("latin-1")),
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying RoutePolicy limits; other requests pass straight through"""
+
+    def __init__(self, app, policies: Optional[List[RoutePolicy]] = None):
+        self.app = app
+        self.policies = default_policies() if policies is None else policies
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.policies:
+            await self.app(scope, receive, send)
+            return
+
+        for policy in self.policies:
+            params = policy.match(scope)
+            if params is not None:
+                break
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            if policy.user_rate is not None:
+                wait = policy.user_rate.take(params.get(policy.user_param, ""))
+                if wait:
+                    raise Rejected(429, "rate_limited", wait, "Too many requests, slow down")
+            if policy.limiter is not None:
+                await policy.limiter.acquire()
+        except Rejected as rejected:
+            SHED.inc(route=policy.path, reason=rejected.reason)
+            await send_rejection(send, rejected)
+            return
+
+        if policy.limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            policy.limiter.release(time.perf_counter() - started)
@@ -0,0 +1,164 @@
+"""
+Benchmark for the list endpoint read path
+Loads N food items for one user from a throwaway SQLite database and
+serializes them to a JSON body three ways:
+
+    orm_pydantic  - ORM objects -> FoodItemResponse (from_attributes) -> json
+                    (what FastAPI does for response_model=List[FoodItemResponse])
+    core_json     - Core tuples -> food_item_dicts -> stdlib json
+    core_orjson   - Core tuples -> food_item_dicts -> orjson (FastJSONResponse)
+
+Usage:
+    python bench_serialization.py
+    python bench_serialization.py --rows 50000 --repeat 3
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def seed(rows: int) -> int:
+    """Insert one user with `rows` unconsumed food items"""
+    from sqlalchemy import insert
+    from database import SessionLocal
+    from models import User, FoodItem
+
+    db = SessionLocal()
+    user = User(email="bench@freshtrack.app", username="bench")
+    db.add(user)
+    db.commit()
+
+    now = datetime.utcnow()
+    db.execute(insert(FoodItem), [
+        {
+            "user_id": user.id,
+            "food_name": f"item-{index}",
+            "category": "蔬菜",
+            "purchase_date": now,
+            "expiration_date": now + timedelta(days=index % 30 - 5, hours=index % 24),
+            "quantity": 1 + index % 5,
+            "quantity_unit": "个"
+        }
+        for index in range(rows)
+    ])
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+def orm_pydantic(user_id: int) -> dict:
+    from pydantic import TypeAdapter
+    from database import SessionLocal
+    from models import FoodItem
+    from main import FoodItemResponse
+
+    adapter = TypeAdapter(List[FoodItemResponse])
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        items = db.query(FoodItem).filter(
+            FoodItem.user_id == user_id, FoodItem.is_consumed == 0
+        ).order_by(FoodItem.expiration_date, FoodItem.id).all()
+        loaded = time.perf_counter()
+
+        content = adapter.dump_python(adapter.validate_python(items, from_attributes=True), mode="json")
+        built = time.perf_counter()
+
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        encoded = time.perf_counter()
+    finally:
+        db.close()
+
+    return {'query': loaded - started, 'build': built - loaded, 'encode': encoded - built, 'bytes': len(body)}
+
+
+def core_rows(user_id: int, use_orjson: bool) -> dict:
+    from sqlalchemy import select
+    from database import SessionLocal
+    from models import FoodItem
+    import main
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        column_names = main.row_columns(FoodItem, main.FoodItemResponse, None)
+        rows = db.execute(
+            select(*[FoodItem.__table__.c[name] for name in column_names]).where(
+                FoodItem.user_id == user_id, FoodItem.is_consumed == 0
+            ).order_by(FoodItem.expiration_date, FoodItem.id)
+        ).all()
+        loaded = time.perf_counter()
+
+        content = main.food_item_dicts(rows, column_names)
+        built = time.perf_counter()
+
+        orjson = main.orjson
+        main.orjson = orjson if use_orjson else None
+        try:
+            body = main.FastJSONResponse(content).body
+        finally:
+            main.orjson = orjson
+        encoded = time.perf_counter()
+    finally:
+        db.close()
+
+    return {'query': loaded - started, 'build': built - loaded, 'encode': encoded - built, 'bytes': len(body)}
+
+
+def best_of(fn, repeat: int) -> dict:
+    """Fastest total of `repeat` runs (after one warm-up run)"""
+    fn()
+    runs = [fn() for _ in range(repeat)]
+    return min(runs, key=lambda run: run['query'] + run['build'] + run['encode'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list serialization paths")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="freshtrack-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Imported after DATABASE_URL is set so the engine points at the temp DB
+    from database import init_db
+    import models  # noqa: F401  (registers the tables for init_db)
+    import main as api
+
+    init_db()
+    user_id = seed(args.rows)
+
+    variants = {'orm_pydantic': lambda: orm_pydantic(user_id)}
+    variants['core_json'] = lambda: core_rows(user_id, use_orjson=False)
+    if api.orjson is not None:
+        variants['core_orjson'] = lambda: core_rows(user_id, use_orjson=True)
+    else:
+        print("⚠️  orjson not installed, skipping core_orjson")
+
+    results = {name: best_of(fn, args.repeat) for name, fn in variants.items()}
+    baseline = sum(results['orm_pydantic'][stage] for stage in ('query', 'build', 'encode'))
+
+    print("\n" + "=" * 60)
+    print(f"📊 LIST SERIALIZATION BENCHMARK ({args.rows} rows, best of {args.repeat})")
+    print("=" * 60)
+    print(f"{'variant':14} {'query ms':>9} {'build ms':>9} {'encode ms':>10} {'total ms':>9} {'speedup':>8}")
+    for name, run in results.items():
+        total = run['query'] + run['build'] + run['encode']
+        print(f"{name:14} {run['query'] * 1000:>9.1f} {run['build'] * 1000:>9.1f} "
+              f"{run['encode'] * 1000:>10.1f} {total * 1000:>9.1f} {baseline / total:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
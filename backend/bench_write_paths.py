@@ -0,0 +1,183 @@
+"""
+Microbenchmark for the single-row write endpoints
+Compares the old SELECT-then-mutate ORM path with the single-statement
+UPDATE/DELETE ... RETURNING handlers in main.py, against a throwaway
+SQLite database. Reports per-request time and SQL statements per request.
+
+Both paths do the same change tracking: the ORM path bumps the user's
+data_version and stamps sync_version itself, the handlers leave it to the
+change tracking triggers; deletes get their tombstone from the trigger
+either way.
+
+Usage:
+    python bench_write_paths.py
+    python bench_write_paths.py --rows 5000 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+class StatementCounter:
+    """Counts SQL statements sent to the engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+# ---- The pre-RETURNING implementations, kept here for comparison ----
+
+def legacy_mark_item_consumed(item_id, db):
+    from models import FoodItem, bump_data_version
+
+    item = db.query(FoodItem).filter(FoodItem.id == item_id).first()
+    item.is_consumed = 1
+    item.sync_version = bump_data_version(db, item.user_id)
+    db.commit()
+    return {"message": f"Item '{item.food_name}' marked as consumed"}
+
+
+def legacy_mark_purchased(item_id, db):
+    from models import ShoppingListItem, bump_data_version
+
+    item = db.query(ShoppingListItem).filter(ShoppingListItem.id == item_id).first()
+    item.is_purchased = 1
+    item.sync_version = bump_data_version(db, item.user_id)
+    db.commit()
+    return {"message": f"'{item.item_name}' marked as purchased"}
+
+
+def legacy_delete_item(item_id, db):
+    from models import FoodItem
+
+    item = db.query(FoodItem).filter(FoodItem.id == item_id).first()
+    # Version bump and tombstone: food_items_tombstone trigger
+    db.delete(item)
+    db.commit()
+    return {"message": "Item deleted successfully"}
+
+
+def seed(rows: int):
+    """Insert one user with `rows` food items and `rows` shopping items"""
+    from database import SessionLocal
+    from models import User, FoodItem, ShoppingListItem
+
+    db = SessionLocal()
+    user = User(email=f"bench-{time.time_ns()}@freshtrack.app", username="bench")
+    db.add(user)
+    db.commit()
+
+    expires = datetime.utcnow() + timedelta(days=7)
+    food_items = [
+        FoodItem(user_id=user.id, food_name=f"item-{index}", category="蔬菜", expiration_date=expires)
+        for index in range(rows)
+    ]
+    shopping_items = [
+        ShoppingListItem(user_id=user.id, item_name=f"item-{index}")
+        for index in range(rows)
+    ]
+    db.add_all(food_items + shopping_items)
+    db.commit()
+
+    result = [item.id for item in food_items], [item.id for item in shopping_items]
+    db.close()
+    return result
+
+
+def run_case(handler, ids, counter: StatementCounter, loop) -> dict:
+    """Call a handler once per id, each with a fresh session like a request"""
+    from database import SessionLocal
+
+    statements_before = counter.count
+    started = time.perf_counter()
+
+    for item_id in ids:
+        db = SessionLocal()
+        try:
+            result = handler(item_id, db)
+            if asyncio.iscoroutine(result):
+                loop.run_until_complete(result)
+        finally:
+            db.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(ids),
+        'us_per_request': round(elapsed / len(ids) * 1_000_000, 1),
+        'statements_per_request': round((counter.count - statements_before) / len(ids), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark single-row consume/purchase/delete paths")
+    parser.add_argument("--rows", type=int, default=2000, help="Requests per case")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="freshtrack-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # Imported after DATABASE_URL is set so the engine points at the temp DB
+    from database import engine, init_db
+    import models  # noqa: F401  (registers the tables for init_db)
+    import main as api
+
+    init_db()
+    counter = StatementCounter(engine)
+
+    cases = [
+        ('consume', legacy_mark_item_consumed, api.mark_item_consumed, 0),
+        ('purchase', legacy_mark_purchased, api.mark_purchased, 1),
+        ('delete', legacy_delete_item, api.delete_item, 0),
+    ]
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    for name, legacy, current, id_set in cases:
+        # Fresh rows for each variant so both do the same amount of work
+        legacy_ids = seed(args.rows)[id_set]
+        current_ids = seed(args.rows)[id_set]
+
+        before = run_case(legacy, legacy_ids, counter, loop)
+        after = run_case(current, current_ids, counter, loop)
+        results[name] = {
+            'before': before,
+            'after': after,
+            'speedup': round(before['us_per_request'] / after['us_per_request'], 2)
+        }
+    loop.close()
+
+    print("\n" + "=" * 60)
+    print("📊 WRITE PATH BENCHMARK")
+    print("=" * 60)
+    for name, result in results.items():
+        print(f"\n{name}:")
+        for variant in ('before', 'after'):
+            stats = result[variant]
+            print(f"   {variant:6} {stats['us_per_request']:>8} µs/request   "
+                  f"{stats['statements_per_request']} statements/request")
+        print(f"   speedup: {result['speedup']}x")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
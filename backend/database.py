@@ -1,13 +1,16 @@
 """
 Database configuration and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
 import os
 
-# SQLite database URL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./data/freshtrack.db"
+import query_profiler
+
+# SQLite database URL (override with DATABASE_URL, e.g. for load tests)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/freshtrack.db")
 
 # Create engine
 engine = create_engine(
@@ -15,6 +18,30 @@ engine = create_engine(
     connect_args={"check_same_thread": False}
 )
 
+# Milliseconds a SQLite writer waits for another process's write lock
+# before failing with "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        """
+        Let several processes (API workers, email monitor) share the file:
+        WAL lets readers run alongside the single writer, busy_timeout makes
+        writers queue for the lock instead of erroring
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        # With WAL: no fsync per commit; a power cut may lose the latest
+        # commits but can't corrupt the database
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+# Opt-in per-statement profiling (SQL_PROFILE=1), see query_profiler.py
+if query_profiler.PROFILE_ENABLED:
+    query_profiler.install(engine)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -31,9 +58,40 @@ def get_db():
     finally:
         db.close()
 
+def upgrade_schema():
+    """
+    Apply additive schema changes to an existing database
+
+    create_all() skips tables that already exist, so columns and indexes
+    added to those tables later are created here. New columns must be
+    nullable or have a server_default.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    # Triggers declared by the models (change tracking, see models.py)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            for ddl in Base.metadata.info.get("sqlite_triggers", ()):
+                conn.exec_driver_sql(ddl)
+
 def init_db():
     """
     Initialize database tables
     """
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
     print("✅ Database initialized successfully!")
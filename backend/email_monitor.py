@@ -6,15 +6,24 @@ import imaplib
 import email
 from email.header import decode_header
 import os
+import re
+import signal
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional
 from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import logging
 
 from ocr_service import ReceiptOCRService
-from models import User, FoodItem, FoodShelfLife
+from ocr_scheduler import OCRScheduler, get_ocr_scheduler, EMAIL
+from models import User, FoodItem, bump_data_version
 from database import SessionLocal
+from sender_cache import SenderCache
+from reference_data import shelf_life_index
 
 
 # Configure logging
@@ -25,7 +34,20 @@ logger = logging.getLogger(__name__)
 class EmailMonitorService:
     """Service for monitoring email inbox and processing receipt images"""
 
-    def __init__(self, email_address: str, password: str, imap_server: str = "imap.gmail.com"):
+    # Messages whose senders are resolved together per IMAP header fetch
+    FETCH_BATCH_SIZE = 100
+
+    # A running check counts as alive while it made progress (an IMAP round
+    # trip or a processed message) this recently
+    STALL_SECONDS = float(os.getenv("EMAIL_MONITOR_STALL_SECONDS", "600"))
+
+    def __init__(self, email_address: str, password: str, imap_server: str = "imap.gmail.com",
+                 ocr_service: Optional[ReceiptOCRService] = None,
+                 sender_cache: Optional[SenderCache] = None,
+                 auto_register: bool = True,
+                 imap_port: Optional[int] = None,
+                 use_ssl: bool = True,
+                 ocr_scheduler: Optional[OCRScheduler] = None):
         """
         Initialize email monitor service
 
@@ -33,14 +55,42 @@ class EmailMonitorService:
             email_address: Email address to monitor (e.g., receipt@freshtrack.app)
             password: Email password or app-specific password
             imap_server: IMAP server address
+            imap_port: IMAP port (defaults to 993 with SSL, 143 without)
+            use_ssl: Connect over IMAP4_SSL (disable only for local test servers)
+            ocr_scheduler: Scheduler running OCR jobs (the process-wide one if omitted)
+            ocr_service: Shared OCR service instance (a new one is created if omitted)
+            sender_cache: Shared sender -> user ID cache (a new one is created if omitted)
+            auto_register: Create users for unknown senders
         """
         self.email_address = email_address
         self.password = password
         self.imap_server = imap_server
-        self.ocr_service = ReceiptOCRService()
+        self.imap_port = imap_port
+        self.use_ssl = use_ssl
+        self.ocr_service = ocr_service or ReceiptOCRService()
+        self.ocr_scheduler = ocr_scheduler or get_ocr_scheduler()
+        self.sender_cache = sender_cache or SenderCache()
+        self.auto_register = auto_register
         self.scheduler = BackgroundScheduler()
+        self.interval_minutes = None
+
+        # Set on shutdown so a running check stops after its current message
+        self._stop_requested = threading.Event()
+
+        # Counters exposed through the daemon's /metrics endpoint
+        self.stats = {
+            'last_check_started': None,
+            'last_check_finished': None,
+            'last_check_ok': None,
+            # Heartbeat: updated after every IMAP round trip and processed message
+            'last_progress': None,
+            'backlog': 0,
+            'emails_processed': 0,
+            'items_added': 0,
+            'errors': 0
+        }
 
-    def connect_to_mailbox(self) -> imaplib.IMAP4_SSL:
+    def connect_to_mailbox(self) -> imaplib.IMAP4:
         """
         Connect to email server using IMAP
 
@@ -48,7 +98,10 @@ class EmailMonitorService:
             IMAP connection object
         """
         try:
-            mail = imaplib.IMAP4_SSL(self.imap_server)
+            if self.use_ssl:
+                mail = imaplib.IMAP4_SSL(self.imap_server, self.imap_port or imaplib.IMAP4_SSL_PORT)
+            else:
+                mail = imaplib.IMAP4(self.imap_server, self.imap_port or imaplib.IMAP4_PORT)
             mail.login(self.email_address, self.password)
             logger.info(f"✅ Connected to {self.email_address}")
             return mail
@@ -80,26 +133,166 @@ class EmailMonitorService:
         Returns:
             Email address
         """
-        import re
         match = re.search(r'<(.+?)>', from_header)
         if match:
             return match.group(1)
-        return from_header
+        return from_header.strip()
 
-    def process_email_attachments(self, msg, user_id: int, db: Session) -> int:
+    def fetch_senders(self, mail, message_ids: List[bytes], use_uid: bool = False) -> Dict[bytes, str]:
         """
-        Process image attachments from email
+        Fetch the sender of many messages with a single IMAP command
+
+        Only the From header is requested (with BODY.PEEK, so messages stay
+        unread) which lets a whole batch be resolved to users up front.
 
         Args:
-            msg: Email message object
-            user_id: User ID
+            mail: IMAP connection with a mailbox selected
+            message_ids: Message sequence numbers (or UIDs if use_uid)
+            use_uid: Treat message_ids as UIDs
+
+        Returns:
+            Mapping of message ID to sender email address
+        """
+        if not message_ids:
+            return {}
+
+        message_set = b','.join(message_ids).decode()
+        query = '(BODY.PEEK[HEADER.FIELDS (FROM)])'
+        if use_uid:
+            status, data = mail.uid('FETCH', message_set, query)
+        else:
+            status, data = mail.fetch(message_set, query)
+
+        if status != "OK":
+            raise RuntimeError(f"Failed to fetch sender headers: {status}")
+
+        senders = {}
+        for part in data:
+            if not isinstance(part, tuple):
+                continue
+
+            envelope, header_bytes = part
+            if use_uid:
+                match = re.search(rb'UID (\d+)', envelope)
+            else:
+                match = re.match(rb'(\d+)', envelope)
+            if not match:
+                continue
+
+            headers = email.message_from_bytes(header_bytes)
+            senders[match.group(1)] = self.extract_sender_email(headers.get('From', ''))
+
+        return senders
+
+    def resolve_user_ids(self, sender_emails: Iterable[str], db: Session) -> Dict[str, Optional[int]]:
+        """
+        Resolve many senders to user IDs in at most two statements
+
+        Cached senders are answered from the LRU cache. The rest are looked
+        up with one IN query, and unknown senders are registered with one
+        multi-row INSERT (if auto-registration is enabled).
+
+        Args:
+            sender_emails: Sender email addresses
             db: Database session
 
         Returns:
-            Number of items added
+            Mapping of sender email to user ID (None for senders that are
+            skipped: invalid addresses, or unknown with auto-register off)
         """
-        items_added = 0
+        resolved: Dict[str, Optional[int]] = {}
+        pending = []
+
+        for sender_email in set(sender_emails):
+            found, user_id = self.sender_cache.get(sender_email)
+            if found:
+                resolved[sender_email] = user_id
+            elif '@' not in sender_email:
+                self.sender_cache.put_negative(sender_email)
+                resolved[sender_email] = None
+            else:
+                pending.append(sender_email)
+
+        if not pending:
+            return resolved
+
+        rows = db.query(User.id, User.email).filter(User.email.in_(pending)).all()
+        for user_id, user_email in rows:
+            self.sender_cache.put(user_email, user_id)
+            resolved[user_email] = user_id
+
+        unknown = [sender_email for sender_email in pending if sender_email not in resolved]
+
+        if unknown and self.auto_register:
+            # Senders registered concurrently by another process are skipped
+            # and picked up by the re-select
+            self.register_senders(unknown, db)
+
+            rows = db.query(User.id, User.email).filter(User.email.in_(unknown)).all()
+            for user_id, user_email in rows:
+                self.sender_cache.put(user_email, user_id)
+                resolved[user_email] = user_id
+
+            logger.info(f"👤 Registered {len(unknown)} new user(s)")
+
+        for sender_email in unknown:
+            if sender_email not in resolved:
+                self.sender_cache.put_negative(sender_email)
+                resolved[sender_email] = None
 
+        return resolved
+
+    def register_senders(self, sender_emails: List[str], db: Session):
+        """
+        Create users for sender_emails, skipping emails that already exist
+
+        SQLite and PostgreSQL do it in one INSERT ... ON CONFLICT DO NOTHING.
+        Other databases try one multi-row INSERT and, if another process
+        registered one of the senders first, fall back to one INSERT per
+        sender that ignores the duplicate.
+
+        Args:
+            sender_emails: Email addresses not found in the users table
+            db: Database session (committed on return)
+        """
+        now = datetime.utcnow()
+        rows = [{'email': sender_email, 'created_at': now} for sender_email in sender_emails]
+        dialect = db.get_bind().dialect.name
+
+        if dialect in ("sqlite", "postgresql"):
+            if dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            db.execute(dialect_insert(User).values(rows).on_conflict_do_nothing(index_elements=['email']))
+            db.commit()
+            return
+
+        try:
+            db.execute(insert(User).values(rows))
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(User).values(row))
+            except IntegrityError:
+                pass
+        db.commit()
+
+    def iter_image_attachments(self, msg):
+        """
+        Yield receipt image attachments from an email message
+
+        Args:
+            msg: Email message object
+
+        Yields:
+            Tuples of (filename, image bytes)
+        """
         for part in msg.walk():
             # Check if attachment is an image
             content_type = part.get_content_type()
@@ -107,61 +300,96 @@ class EmailMonitorService:
                 filename = part.get_filename()
 
                 if filename:
-                    # Save image temporarily
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    temp_path = f"./temp_receipts/{user_id}_{timestamp}_{filename}"
+                    yield filename, part.get_payload(decode=True)
 
-                    # Create temp directory if not exists
-                    os.makedirs("./temp_receipts", exist_ok=True)
+    def save_receipt_items(self, items: List[Dict], user_id: int, db: Session) -> int:
+        """
+        Save OCR-extracted items for a user with estimated expiration dates
 
-                    # Save attachment
-                    with open(temp_path, 'wb') as f:
-                        f.write(part.get_payload(decode=True))
+        Args:
+            items: Items returned by ReceiptOCRService
+            user_id: User ID
+            db: Database session
 
-                    logger.info(f"📸 Saved receipt image: {temp_path}")
+        Returns:
+            Number of items added
+        """
+        version = bump_data_version(db, user_id) if items else None
+        for item_data in items:
+            # Get shelf life info
+            shelf_life_days = self.get_shelf_life(
+                item_data['name'],
+                item_data['category'],
+                db
+            )
+
+            # Calculate expiration date
+            purchase_date = datetime.now()
+            expiration_date = purchase_date + timedelta(days=shelf_life_days)
+
+            # Create food item
+            food_item = FoodItem(
+                user_id=user_id,
+                food_name=item_data['name'],
+                category=item_data['category'],
+                purchase_date=purchase_date,
+                expiration_date=expiration_date,
+                quantity=item_data['quantity'],
+                price=item_data['total_price'],
+                sync_version=version
+            )
+
+            db.add(food_item)
+
+        db.commit()
+        return len(items)
 
-                    try:
-                        # Process with OCR
-                        items = self.ocr_service.process_receipt_image(temp_path)
-
-                        # Save items to database
-                        for item_data in items:
-                            # Get shelf life info
-                            shelf_life_days = self.get_shelf_life(
-                                item_data['name'],
-                                item_data['category'],
-                                db
-                            )
-
-                            # Calculate expiration date
-                            purchase_date = datetime.now()
-                            expiration_date = purchase_date + timedelta(days=shelf_life_days)
-
-                            # Create food item
-                            food_item = FoodItem(
-                                user_id=user_id,
-                                food_name=item_data['name'],
-                                category=item_data['category'],
-                                purchase_date=purchase_date,
-                                expiration_date=expiration_date,
-                                quantity=item_data['quantity'],
-                                price=item_data['total_price']
-                            )
-
-                            db.add(food_item)
-                            items_added += 1
-
-                        db.commit()
-                        logger.info(f"✅ Added {len(items)} items to database")
+    def process_email_attachments(self, msg, user_id: int, db: Session) -> int:
+        """
+        Process image attachments from email
 
-                    except Exception as e:
-                        logger.error(f"❌ Error processing receipt: {str(e)}")
-                        db.rollback()
+        Args:
+            msg: Email message object
+            user_id: User ID
+            db: Database session
 
-                    finally:
-                        # Clean up temp file
-                        if os.path.exists(temp_path):
-                            os.remove(temp_path)
+        Returns:
+            Number of items added
+        """
+        items_added = 0
+
+        for filename, payload in self.iter_image_attachments(msg):
+            # Save image temporarily
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            temp_path = f"./temp_receipts/{user_id}_{timestamp}_{filename}"
+
+            # Create temp directory if not exists
+            os.makedirs("./temp_receipts", exist_ok=True)
+
+            # Save attachment
+            with open(temp_path, 'wb') as f:
+                f.write(payload)
+
+            logger.info(f"📸 Saved receipt image: {temp_path}")
+
+            try:
+                # Process with OCR as a background (email) job
+                items = self.ocr_scheduler.submit(
+                    EMAIL, self.ocr_service.process_receipt_image, temp_path
+                ).result()
+
+                # Save items to database
+                items_added += self.save_receipt_items(items, user_id, db)
+                logger.info(f"✅ Added {len(items)} items to database")
+
+            except Exception as e:
+                logger.error(f"❌ Error processing receipt: {str(e)}")
+                db.rollback()
+
+            finally:
+                # Clean up temp file
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
 
         return items_added
 
@@ -177,13 +405,10 @@ class EmailMonitorService:
         Returns:
             Shelf life in days (defaults to 7 if not found)
         """
-        # Try to find exact match
-        shelf_life = db.query(FoodShelfLife).filter(
-            FoodShelfLife.food_name_cn.ilike(f"%{food_name}%")
-        ).first()
-
-        if shelf_life and shelf_life.refrigerator_max:
-            return shelf_life.refrigerator_max
+        # Try to find a match in the shelf-life table (cached in memory)
+        refrigerator_days = shelf_life_index.refrigerator_days(food_name, db)
+        if refrigerator_days:
+            return refrigerator_days
 
         # Default shelf life by category
         default_shelf_life = {
@@ -204,6 +429,9 @@ class EmailMonitorService:
         This method is called periodically by the scheduler
         """
         logger.info("🔍 Checking for new receipt emails...")
+        self.heartbeat()
+        self.stats['last_check_started'] = time.time()
+        check_ok = False
 
         db = SessionLocal()
 
@@ -213,116 +441,219 @@ class EmailMonitorService:
 
             # Search for unread emails
             status, messages = mail.search(None, 'UNSEEN')
+            self.heartbeat()
 
             if status != "OK":
                 logger.warning("Failed to search emails")
                 return
 
             email_ids = messages[0].split()
+            check_ok = True
 
             if not email_ids:
                 logger.info("No new emails found")
                 return
 
             logger.info(f"📧 Found {len(email_ids)} new email(s)")
+            self.stats['backlog'] = len(email_ids)
 
-            for email_id in email_ids:
-                try:
-                    # Fetch email
-                    status, msg_data = mail.fetch(email_id, '(RFC822)')
-                    msg = email.message_from_bytes(msg_data[0][1])
+            for start in range(0, len(email_ids), self.FETCH_BATCH_SIZE):
+                if self._stop_requested.is_set():
+                    logger.info(f"⏹️  Shutdown requested, leaving {self.stats['backlog']} email(s) for the next run")
+                    break
 
-                    # Get sender
-                    from_header = msg.get('From', '')
-                    sender_email = self.extract_sender_email(from_header)
+                batch = email_ids[start:start + self.FETCH_BATCH_SIZE]
 
-                    logger.info(f"📨 Processing email from: {sender_email}")
+                # Resolve every sender of the batch to a user up front
+                senders = self.fetch_senders(mail, batch)
+                user_ids = self.resolve_user_ids(senders.values(), db)
+                self.heartbeat()
 
-                    # Find or create user
-                    user = self.get_user_by_email(sender_email, db)
+                for email_id in batch:
+                    if self._stop_requested.is_set():
+                        break
 
-                    if not user:
-                        # Auto-register new user
-                        user = User(email=sender_email)
-                        db.add(user)
-                        db.commit()
-                        db.refresh(user)
-                        logger.info(f"👤 Created new user: {sender_email}")
+                    try:
+                        sender_email = senders.get(email_id)
+                        user_id = user_ids.get(sender_email)
+
+                        if user_id is None:
+                            # Mark as read so it isn't re-examined on every check
+                            mail.store(email_id, '+FLAGS', '\\Seen')
+                            logger.warning(f"⚠️  Skipping email {email_id} from unresolved sender: {sender_email}")
+                            continue
+
+                        # Fetch email
+                        status, msg_data = mail.fetch(email_id, '(RFC822)')
+                        msg = email.message_from_bytes(msg_data[0][1])
 
-                    # Process attachments
-                    items_added = self.process_email_attachments(msg, user.id, db)
+                        logger.info(f"📨 Processing email from: {sender_email}")
 
-                    if items_added > 0:
-                        logger.info(f"✅ Added {items_added} items for user {user.email}")
-                        # TODO: Send push notification to user
-                        # send_notification(user.id, f"已添加 {items_added} 件食材")
+                        # Process attachments
+                        items_added = self.process_email_attachments(msg, user_id, db)
+                        self.stats['emails_processed'] += 1
+                        self.stats['items_added'] += items_added
 
-                except Exception as e:
-                    logger.error(f"❌ Error processing email {email_id}: {str(e)}")
-                    continue
+                        if items_added > 0:
+                            logger.info(f"✅ Added {items_added} items for user {sender_email}")
+                            # TODO: Send push notification to user
+                            # send_notification(user_id, f"已添加 {items_added} 件食材")
+
+                    except Exception as e:
+                        self.stats['errors'] += 1
+                        logger.error(f"❌ Error processing email {email_id}: {str(e)}")
+                        continue
+
+                    finally:
+                        self.stats['backlog'] -= 1
+                        self.heartbeat()
 
             mail.logout()
 
         except Exception as e:
+            self.stats['errors'] += 1
             logger.error(f"❌ Error in check_new_emails: {str(e)}")
 
         finally:
             db.close()
+            self.stats['last_check_finished'] = time.time()
+            self.stats['last_check_ok'] = check_ok
+
+    def heartbeat(self):
+        """Record that the current check is making progress"""
+        self.stats['last_progress'] = time.time()
+
+    def is_healthy(self) -> bool:
+        """
+        Liveness check: the scheduler is running and checks keep happening
+
+        A check in progress is alive as long as it keeps making progress
+        (a large backlog can take longer than any interval); one without a
+        heartbeat for STALL_SECONDS is stuck. Between checks, a check that
+        has not started for three intervals means the scheduler thread is
+        stuck or dead.
+        """
+        if not self.scheduler.running:
+            return False
+
+        last_started = self.stats['last_check_started']
+        if last_started is None or self.interval_minutes is None:
+            return True
+
+        now = time.time()
+        last_finished = self.stats['last_check_finished']
+        if last_finished is None or last_finished < last_started:
+            return now - self.stats['last_progress'] < self.STALL_SECONDS
+
+        return now - last_started < self.interval_minutes * 60 * 3
+
+    def get_stats(self) -> Dict:
+        """Snapshot of monitor counters for the metrics endpoint"""
+        return {
+            'mailbox': self.email_address,
+            'interval_minutes': self.interval_minutes,
+            **self.stats
+        }
 
     def start_monitoring(self, interval_minutes: int = 5):
         """
         Start background monitoring of email inbox
 
+        The first check runs right away on the scheduler thread, so this
+        returns immediately.
+
         Args:
             interval_minutes: Check interval in minutes (default: 5)
         """
         logger.info(f"🚀 Starting email monitor (checking every {interval_minutes} minutes)")
+        self.interval_minutes = interval_minutes
+        self._stop_requested.clear()
 
-        # Schedule periodic checks
+        # Schedule periodic checks, starting with an immediate one
         self.scheduler.add_job(
             self.check_new_emails,
             'interval',
             minutes=interval_minutes,
-            id='email_check_job'
+            id='email_check_job',
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True
         )
 
-        # Run initial check
-        self.check_new_emails()
-
         # Start scheduler
         self.scheduler.start()
 
         logger.info("✅ Email monitoring started successfully!")
 
     def stop_monitoring(self):
-        """Stop email monitoring"""
-        self.scheduler.shutdown()
+        """Stop email monitoring, letting an in-progress check finish its current email"""
+        self._stop_requested.set()
+        self.scheduler.shutdown(wait=True)
         logger.info("⏹️  Email monitoring stopped")
 
 
+def run_daemon(monitor: EmailMonitorService, interval_minutes: int = 5,
+               health_host: str = "0.0.0.0", health_port: Optional[int] = 8081):
+    """
+    Run the monitor as a daemon until SIGTERM or SIGINT
+
+    The main thread sleeps on an event instead of spinning, and shutdown
+    drains the email currently being processed before exiting.
+
+    Args:
+        monitor: Configured email monitor
+        interval_minutes: Check interval in minutes
+        health_host: Interface for the liveness/metrics endpoint
+        health_port: Port for the liveness/metrics endpoint (None disables it)
+    """
+    from health_server import HealthServer
+
+    shutdown = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"📴 Received {signal.Signals(signum).name}, shutting down...")
+        shutdown.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    health_server = None
+    if health_port is not None:
+        health_server = HealthServer(monitor.get_stats, monitor.is_healthy, host=health_host, port=health_port)
+        health_server.start()
+
+    monitor.start_monitoring(interval_minutes=interval_minutes)
+
+    try:
+        shutdown.wait()
+    finally:
+        monitor.stop_monitoring()
+        if health_server is not None:
+            health_server.stop()
+
+
 # Example usage
 if __name__ == "__main__":
     # Load credentials from environment variables
-    import os
     from dotenv import load_dotenv
 
     load_dotenv()
 
     EMAIL_ADDRESS = os.getenv("RECEIPT_EMAIL_ADDRESS", "receipt@freshtrack.app")
     EMAIL_PASSWORD = os.getenv("RECEIPT_EMAIL_PASSWORD", "")
+    IMAP_SERVER = os.getenv("IMAP_SERVER", "imap.gmail.com")
+    CHECK_INTERVAL_MINUTES = int(os.getenv("EMAIL_CHECK_INTERVAL_MINUTES", "5"))
+    HEALTH_PORT = os.getenv("EMAIL_MONITOR_HEALTH_PORT", "8081")
 
     if not EMAIL_PASSWORD:
         print("❌ Please set RECEIPT_EMAIL_PASSWORD environment variable")
         exit(1)
 
-    # Create and start monitor
-    monitor = EmailMonitorService(EMAIL_ADDRESS, EMAIL_PASSWORD)
-    monitor.start_monitoring(interval_minutes=5)
-
-    # Keep running
-    try:
-        while True:
-            pass
-    except KeyboardInterrupt:
-        monitor.stop_monitoring()
-        print("\n👋 Email monitor stopped")
+    # Create monitor and run until signalled
+    monitor = EmailMonitorService(EMAIL_ADDRESS, EMAIL_PASSWORD, IMAP_SERVER)
+    run_daemon(
+        monitor,
+        interval_minutes=CHECK_INTERVAL_MINUTES,
+        health_port=int(HEALTH_PORT) if HEALTH_PORT else None
+    )
+    print("\n👋 Email monitor stopped")
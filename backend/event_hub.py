@@ -0,0 +1,165 @@
+"""
+Per-user change feed for server-push clients
+One poller task per API worker watches users.data_version for the users that
+have open connections and fans each change out to all of their connections.
+Because it watches the database, changes made by other processes (email
+monitor, mailbox_ingest, other API workers) are picked up as well as this
+worker's own writes; poke() wakes it early after a local commit.
+
+An idle connection costs one asyncio.Queue and no database work, so a
+worker can hold thousands of them.
+"""
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+
+class UserChannel:
+    """Subscribers of one user and the last data version sent to them"""
+
+    def __init__(self, version: int):
+        self.version = version
+        self.subscribers: Set[asyncio.Queue] = set()
+
+
+class EventHub:
+    """Polls data versions and broadcasts change events to subscribers"""
+
+    def __init__(
+        self,
+        load_versions: Callable[[Iterable[int]], Dict[int, int]],
+        load_changes: Callable[[int, int], dict],
+        poll_interval: float = 1.0,
+        queue_size: int = 100
+    ):
+        """
+        Args:
+            load_versions: Blocking fn mapping user ids to current data versions
+            load_changes: Blocking fn (user_id, since) -> change event with a 'cursor'
+            poll_interval: Seconds between database polls
+            queue_size: Events buffered per connection before it's dropped
+        """
+        self.load_versions = load_versions
+        self.load_changes = load_changes
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+
+        self.channels: Dict[int, UserChannel] = {}
+        # Set by stop(): the worker is exiting, end new streams at once
+        self.closing = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the poller on the running event loop"""
+        self.closing = False
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+        self.close_streams()
+        self.channels.clear()
+
+    def close_streams(self):
+        """End every open stream and any opened from now on (event loop thread only)"""
+        self.closing = True
+        for channel in self.channels.values():
+            for queue in channel.subscribers:
+                self._close(queue)
+
+    def poke(self):
+        """Poll now instead of at the next interval (safe from any thread)"""
+        if self._loop and self._wake and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def subscribe(self, user_id: int) -> asyncio.Queue:
+        """
+        Open a connection's queue
+
+        Events are dicts; None means the stream should end (hub stopped or
+        the client fell too far behind and must resync).
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.closing:
+            queue.put_nowait(None)
+        channel = self.channels.get(user_id)
+        if channel is None:
+            versions = await asyncio.to_thread(self.load_versions, [user_id])
+            # Another subscriber may have created it while we were waiting
+            channel = self.channels.setdefault(user_id, UserChannel(versions.get(user_id, 0)))
+        channel.subscribers.add(queue)
+        return queue
+
+    def channel_version(self, user_id: int) -> int:
+        """Version the next broadcast to this user's subscribers starts from"""
+        return self.channels[user_id].version
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        channel = self.channels.get(user_id)
+        if channel is None:
+            return
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            del self.channels[user_id]
+
+    def connection_count(self) -> int:
+        return sum(len(channel.subscribers) for channel in self.channels.values())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            if not self.channels:
+                continue
+
+            try:
+                await self._poll()
+            except Exception as e:
+                logger.error(f"❌ Event hub poll failed: {str(e)}")
+
+    async def _poll(self):
+        versions = await asyncio.to_thread(self.load_versions, list(self.channels))
+
+        for user_id, version in versions.items():
+            channel = self.channels.get(user_id)
+            if channel is None or version <= channel.version:
+                continue
+
+            event = await asyncio.to_thread(self.load_changes, user_id, channel.version)
+            channel.version = max(channel.version, event['cursor'])
+            self._broadcast(channel, event)
+
+    def _broadcast(self, channel: UserChannel, event: dict):
+        for queue in list(channel.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: end its stream, the client reconnects and
+                # catches up from its last event id
+                channel.subscribers.discard(queue)
+                self._close(queue)
+
+    @staticmethod
+    def _close(queue: asyncio.Queue):
+        """Replace whatever is buffered with the end-of-stream marker"""
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
@@ -0,0 +1,315 @@
+"""
+Synthetic data generator and bulk loader
+Creates a realistic FreshTrack dataset of any size for benchmarking:
+users, food items, shopping list entries, recipes and shelf-life entries.
+Activity is skewed like real usage - a heavy-tailed (lognormal) share of
+items per user, so a few households own dozens of times the median, and a
+Zipf distribution over foods (milk and eggs are far more common than
+cheese) - and item dates spread over the last months with older items
+mostly consumed.
+
+Rows are generated lazily and inserted in --chunk-size executemany batches,
+one transaction per chunk, so memory stays flat however many rows are
+loaded (apart from one float per user for the activity weights). On SQLite
+the batches go straight to the driver, skipping SQLAlchemy's per-row
+parameter processing. Non-unique secondary indexes of the loaded tables
+are dropped first and rebuilt once at the end, which is much faster than
+maintaining them row by row; unique indexes (users.email) stay in place
+so the load can't leave duplicates behind.
+
+Usage:
+    python generate_data.py --users 1000 --items 50000
+    python generate_data.py --users 1000000 --items 50000000 --recipes 100000 --shelf-life 10000
+    DATABASE_URL=sqlite:///./data/bench.db python generate_data.py --items 5000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+from typing import Dict, Iterable, Iterator, List
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+STORAGE_LOCATIONS = ["refrigerator", "refrigerator", "refrigerator", "pantry", "freezer"]
+QUANTITY_UNITS = ["个", "个", "斤", "瓶", "盒", "袋"]
+RECIPE_CATEGORIES = ["中式家常菜", "健康早餐", "汤", "凉菜", "西式"]
+STAPLES = ["盐", "糖", "油", "酱油", "醋", "蒜"]
+
+
+def zipf_cum_weights(count: int, exponent: float) -> array:
+    """Cumulative weights of ranks 1..count under a Zipf distribution"""
+    return array('d', accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def lognormal_cum_weights(count: int, sigma: float, rng: random.Random) -> array:
+    """Cumulative activity weights of `count` users; sigma 0 means uniform"""
+    return array('d', accumulate(rng.lognormvariate(0.0, sigma) for _ in range(count)))
+
+
+def chunked(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def food_catalog() -> List[Dict]:
+    """Foods with shelf lives, from the sample shelf-life data"""
+    from init_sample_data import SAMPLE_FOOD_DATA
+
+    return [
+        {
+            'name': food.get('food_name_cn') or food['food_name'],
+            'category': food.get('category') or '其他',
+            'days': food.get('refrigerator_max') or food.get('pantry_max') or 7
+        }
+        for food in SAMPLE_FOOD_DATA
+    ]
+
+
+class DatasetGenerator:
+    """Lazy row generators for each table"""
+
+    def __init__(self, args, first_user_id: int):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.first_user_id = first_user_id
+        self.now = datetime.utcnow()
+        self.foods = food_catalog()
+        self.food_weights = zipf_cum_weights(len(self.foods), 1.0)
+        # O(users) memory; the item streams themselves are constant memory
+        self.user_weights = lognormal_cum_weights(args.users, args.skew, self.random) if args.users else None
+
+    def pick_users(self, count: int) -> List[int]:
+        ranks = self.random.choices(range(self.args.users), cum_weights=self.user_weights, k=count)
+        return [self.first_user_id + rank for rank in ranks]
+
+    def pick_foods(self, count: int) -> List[Dict]:
+        return self.random.choices(self.foods, cum_weights=self.food_weights, k=count)
+
+    def users(self) -> Iterator[Dict]:
+        for index in range(self.args.users):
+            user_id = self.first_user_id + index
+            yield {
+                'id': user_id,
+                'email': f"user{user_id}@example.com",
+                'username': f"user{user_id}",
+                'created_at': self.now - timedelta(days=self.random.randint(0, 730)),
+                'data_version': 0
+            }
+
+    def food_items(self) -> Iterator[Dict]:
+        rng = self.random
+        for chunk_start in range(0, self.args.items, self.args.chunk_size):
+            count = min(self.args.chunk_size, self.args.items - chunk_start)
+            for user_id, food in zip(self.pick_users(count), self.pick_foods(count)):
+                age = rng.expovariate(1 / 20.0)
+                purchased = self.now - timedelta(days=age, minutes=rng.randint(0, 1440))
+                shelf_life = max(1.0, rng.gauss(food['days'], food['days'] * 0.2))
+                # Most items are eaten before (or soon after) they expire
+                consumed = age > shelf_life * 0.5 and rng.random() < 0.85
+                yield {
+                    'user_id': user_id,
+                    'food_name': food['name'],
+                    'category': food['category'],
+                    'purchase_date': purchased,
+                    'expiration_date': purchased + timedelta(days=shelf_life),
+                    'quantity': 1 + int(rng.expovariate(0.7)),
+                    'quantity_unit': rng.choice(QUANTITY_UNITS),
+                    'price': round(rng.uniform(2, 80), 2),
+                    'storage_location': rng.choice(STORAGE_LOCATIONS),
+                    'is_consumed': 1 if consumed else 0,
+                    'created_at': purchased,
+                    'updated_at': purchased,
+                    'sync_version': 0
+                }
+
+    def shopping_items(self) -> Iterator[Dict]:
+        rng = self.random
+        for chunk_start in range(0, self.args.shopping, self.args.chunk_size):
+            count = min(self.args.chunk_size, self.args.shopping - chunk_start)
+            for user_id, food in zip(self.pick_users(count), self.pick_foods(count)):
+                created = self.now - timedelta(days=rng.expovariate(1 / 10.0))
+                yield {
+                    'user_id': user_id,
+                    'item_name': food['name'],
+                    'quantity': rng.randint(1, 4),
+                    'quantity_unit': rng.choice(QUANTITY_UNITS),
+                    'is_purchased': 1 if rng.random() < 0.6 else 0,
+                    'created_at': created,
+                    'updated_at': created,
+                    'sync_version': 0
+                }
+
+    def recipes(self) -> Iterator[Dict]:
+        rng = self.random
+        for index in range(self.args.recipes):
+            ingredients = {food['name'] for food in self.pick_foods(rng.randint(2, 6))}
+            ingredients.update(rng.sample(STAPLES, rng.randint(1, 3)))
+            yield {
+                'name': f"Recipe {index + 1}",
+                'name_cn': f"菜谱{index + 1}",
+                'category': rng.choice(RECIPE_CATEGORIES),
+                'ingredients': json.dumps(sorted(ingredients), ensure_ascii=False),
+                'instructions': "1. 准备食材 2. 烹饪 3. 装盘",
+                'prep_time': rng.choice([5, 10, 15, 20, 30]),
+                'cook_time': rng.choice([0, 5, 10, 20, 40, 60]),
+                'servings': rng.randint(1, 6),
+                'created_at': self.now
+            }
+
+    def shelf_life(self) -> Iterator[Dict]:
+        rng = self.random
+        for index in range(self.args.shelf_life):
+            food = self.foods[index % len(self.foods)]
+            variant = index // len(self.foods)
+            days = food['days']
+            suffix = f" #{variant}" if variant else ""
+            yield {
+                'food_name': f"{food['name']}{suffix}",
+                'food_name_cn': f"{food['name']}{suffix}",
+                'category': food['category'],
+                'refrigerator_min': max(1, days // 2),
+                'refrigerator_max': days,
+                'freezer_min': days * 4 if rng.random() < 0.5 else None,
+                'freezer_max': days * 8 if rng.random() < 0.5 else None,
+                'created_at': self.now
+            }
+
+
+def secondary_indexes(tables) -> list:
+    """Indexes that can be dropped during the load: unique ones enforce constraints and stay"""
+    return [index for table in tables for index in table.indexes if not index.unique]
+
+
+def sqlite_rows(table, chunk: List[Dict]) -> List[Dict]:
+    """Datetimes in SQLAlchemy's SQLite storage format, for driver-level inserts"""
+    from sqlalchemy import DateTime
+
+    columns = [column.name for column in table.columns if isinstance(column.type, DateTime)]
+    for row in chunk:
+        for name in columns:
+            value = row.get(name)
+            if value is not None:
+                row[name] = value.isoformat(" ", "microseconds")
+    return chunk
+
+
+def load(engine, table, rows: Iterable[Dict], chunk_size: int) -> int:
+    """Insert rows chunk by chunk (executemany), committing each chunk"""
+    from sqlalchemy import insert
+
+    statement = insert(table)
+    total = 0
+    started = time.perf_counter()
+    for chunk in chunked(rows, chunk_size):
+        with engine.begin() as conn:
+            if engine.dialect.name == "sqlite":
+                names = list(chunk[0])
+                conn.exec_driver_sql(
+                    f"INSERT INTO {table.name} ({', '.join(names)}) "
+                    f"VALUES ({', '.join(':' + name for name in names)})",
+                    sqlite_rows(table, chunk)
+                )
+            else:
+                conn.execute(statement, chunk)
+        total += len(chunk)
+        rate = total / max(time.perf_counter() - started, 1e-9)
+        print(f"\r   {table.name}: {total:,} rows ({rate:,.0f}/s)", end="", flush=True)
+    if total:
+        print()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and bulk-load a synthetic FreshTrack dataset")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=50000, help="Food items across all users")
+    parser.add_argument("--shopping", type=int, default=None, help="Shopping list entries (default: items / 10)")
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--shelf-life", type=int, default=1000, help="Shelf-life reference entries")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="Lognormal sigma of items per user (0 = uniform)")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per executemany/transaction")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep-indexes", action="store_true", help="Don't drop and rebuild non-unique secondary indexes")
+    args = parser.parse_args()
+    if args.shopping is None:
+        args.shopping = args.items // 10
+    if args.users == 0 and (args.items or args.shopping):
+        parser.error("--items and --shopping need at least one user")
+
+    from sqlalchemy import event, func, select
+    from database import engine, init_db, SQLALCHEMY_DATABASE_URL
+    from models import User, FoodItem, ShoppingListItem, Recipe, FoodShelfLife
+
+    init_db()
+
+    if engine.dialect.name == "sqlite":
+        # Bulk-load settings for the loader's connections only: no fsync per
+        # chunk and a bigger page cache
+        @event.listens_for(engine, "connect")
+        def bulk_load_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.execute("PRAGMA cache_size=-65536")
+            cursor.close()
+        engine.dispose()
+
+    with engine.connect() as conn:
+        first_user_id = (conn.execute(select(func.max(User.id))).scalar() or 0) + 1
+
+    generator = DatasetGenerator(args, first_user_id)
+    plan = [
+        (User.__table__, generator.users()),
+        (FoodItem.__table__, generator.food_items()),
+        (ShoppingListItem.__table__, generator.shopping_items()),
+        (Recipe.__table__, generator.recipes()),
+        (FoodShelfLife.__table__, generator.shelf_life()),
+    ]
+
+    print(f"🚀 Loading into {SQLALCHEMY_DATABASE_URL}")
+    print(f"   users={args.users:,} items={args.items:,} shopping={args.shopping:,} "
+          f"recipes={args.recipes:,} shelf_life={args.shelf_life:,} chunk={args.chunk_size:,}")
+    started = time.perf_counter()
+
+    indexes = [] if args.keep_indexes else secondary_indexes(table for table, _ in plan)
+    if indexes:
+        print(f"🗑️  Dropping {len(indexes)} non-unique secondary indexes until the load is done")
+        with engine.begin() as conn:
+            for index in indexes:
+                index.drop(bind=conn, checkfirst=True)
+
+    try:
+        counts = {table.name: load(engine, table, rows, args.chunk_size) for table, rows in plan}
+    finally:
+        if indexes:
+            index_started = time.perf_counter()
+            print(f"🔨 Rebuilding {len(indexes)} indexes...")
+            with engine.begin() as conn:
+                for index in indexes:
+                    index.create(bind=conn, checkfirst=True)
+                if engine.dialect.name == "sqlite":
+                    conn.exec_driver_sql("ANALYZE")
+            print(f"   done in {time.perf_counter() - index_started:.1f}s")
+
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    print(f"\n✅ Loaded {total:,} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    for name, count in counts.items():
+        print(f"   - {name}: {count:,}")
+
+
+if __name__ == "__main__":
+    main()
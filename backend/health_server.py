@@ -0,0 +1,81 @@
+"""
+Lightweight liveness / metrics HTTP endpoint for background services
+Runs a tiny stdlib HTTP server on a daemon thread so ingestion processes can
+be probed without pulling in the FastAPI stack.
+"""
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+
+logger = logging.getLogger(__name__)
+
+
+class HealthServer:
+    """
+    Serve `/healthz` and `/metrics` for a long-running service
+
+    `/healthz` answers 200 while `is_healthy()` returns True and 503 otherwise;
+    `/metrics` returns the dict from `get_stats()` as JSON.
+    """
+
+    def __init__(
+        self,
+        get_stats: Callable[[], Dict],
+        is_healthy: Callable[[], bool] = lambda: True,
+        host: str = "0.0.0.0",
+        port: int = 8081
+    ):
+        self.get_stats = get_stats
+        self.is_healthy = is_healthy
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def _make_handler(self):
+        health_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/healthz":
+                    healthy = health_server.is_healthy()
+                    body = {"status": "ok" if healthy else "unhealthy"}
+                    self._send(200 if healthy else 503, body)
+                elif self.path == "/metrics":
+                    self._send(200, health_server.get_stats())
+                else:
+                    self._send(404, {"detail": "Not found"})
+
+            def _send(self, status_code: int, body: Dict):
+                payload = json.dumps(body, default=str).encode("utf-8")
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # Probes hit this every few seconds; keep them out of the logs
+                pass
+
+        return Handler
+
+    def start(self):
+        """Start serving on a background daemon thread"""
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="health-server", daemon=True)
+        self._thread.start()
+        logger.info(f"🩺 Health endpoint listening on http://{self.host}:{self.port}/healthz")
+
+    def stop(self):
+        """Stop the server and wait for its thread"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
@@ -0,0 +1,438 @@
+"""
+Local IMAP stand-in for testing email ingestion without a real mailbox
+Implements the small IMAP4rev1 subset used by EmailMonitorService and
+mailbox_ingest (LOGIN, SELECT, SEARCH, FETCH, STORE, UID, NOOP, LOGOUT) over
+plain TCP, plus helpers to seed it with synthetic receipt emails.
+
+Usage:
+    with running_imap_stub() as server:
+        seed_receipt_emails(server, "receipt@freshtrack.app", count=1000)
+        monitor = EmailMonitorService("receipt@freshtrack.app", "secret",
+                                      server.host, imap_port=server.port, use_ssl=False)
+        monitor.check_new_emails()
+"""
+import io
+import random
+import re
+import socketserver
+import threading
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+
+class StubMailbox:
+    """Messages of one stub account, with UIDs and \\Seen flags"""
+
+    def __init__(self, uidvalidity: int = 1):
+        self.uidvalidity = uidvalidity
+        self.next_uid = 1
+        self.messages: List[Dict] = []
+        self.lock = threading.Lock()
+
+    def append(self, raw: bytes, seen: bool = False) -> int:
+        """Add a raw RFC822 message and return its UID"""
+        with self.lock:
+            uid = self.next_uid
+            self.next_uid += 1
+            self.messages.append({'uid': uid, 'raw': raw, 'flags': {'\\Seen'} if seen else set()})
+            return uid
+
+    def unseen_count(self) -> int:
+        with self.lock:
+            return sum(1 for message in self.messages if '\\Seen' not in message['flags'])
+
+
+class IMAPStubServer(socketserver.ThreadingTCPServer):
+    """Threaded IMAP stub server; accounts are created with add_account()"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _IMAPStubHandler)
+        self.accounts: Dict[str, Dict] = {}
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def add_account(self, username: str, password: str = "secret") -> StubMailbox:
+        """Create (or return) the inbox for an account"""
+        if username not in self.accounts:
+            self.accounts[username] = {'password': password, 'inbox': StubMailbox()}
+        return self.accounts[username]['inbox']
+
+
+@contextmanager
+def running_imap_stub(host: str = "127.0.0.1", port: int = 0):
+    """Run an IMAPStubServer on a background thread for the duration of the block"""
+    server = IMAPStubServer(host, port)
+    thread = threading.Thread(target=server.serve_forever, name="imap-stub", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def _parse_sequence_set(sequence_set: str, largest: int) -> set:
+    """Expand an IMAP sequence set such as '1,3:5,7:*'"""
+    numbers = set()
+    for part in sequence_set.split(','):
+        if ':' in part:
+            low, high = part.split(':', 1)
+            low = largest if low == '*' else int(low)
+            high = largest if high == '*' else int(high)
+            if low > high:
+                low, high = high, low
+            numbers.update(range(low, high + 1))
+        else:
+            numbers.add(largest if part == '*' else int(part))
+    return numbers
+
+
+class _IMAPStubHandler(socketserver.StreamRequestHandler):
+    """One client connection"""
+
+    # Buffer each response and flush once per command; with unbuffered
+    # writes Nagle + delayed ACK add ~40ms to every FETCH
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.mailbox: Optional[StubMailbox] = None
+        self.username: Optional[str] = None
+
+    def send(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.wfile.write(data)
+
+    def send_line(self, line: str):
+        self.send(line + "\r\n")
+
+    def handle(self):
+        self.send_line("* OK IMAP4rev1 FreshTrack stub ready")
+        self.wfile.flush()
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            line = line.decode('utf-8', 'replace').rstrip("\r\n")
+            if not line:
+                continue
+
+            parts = line.split(' ', 2)
+            tag = parts[0]
+            command = parts[1].upper() if len(parts) > 1 else ''
+            args = parts[2] if len(parts) > 2 else ''
+
+            try:
+                if self.dispatch(tag, command, args) is False:
+                    return
+            except Exception as e:
+                self.send_line(f"{tag} BAD {e}")
+
+            self.wfile.flush()
+
+    def dispatch(self, tag: str, command: str, args: str):
+        use_uid = False
+        if command == 'UID':
+            use_uid = True
+            command, _, args = args.partition(' ')
+            command = command.upper()
+
+        if command == 'CAPABILITY':
+            self.send_line("* CAPABILITY IMAP4rev1")
+            self.send_line(f"{tag} OK CAPABILITY completed")
+        elif command == 'NOOP':
+            if self.mailbox is not None:
+                self.send_line(f"* {len(self.mailbox.messages)} EXISTS")
+            self.send_line(f"{tag} OK NOOP completed")
+        elif command == 'LOGIN':
+            self.login(tag, args)
+        elif command in ('SELECT', 'EXAMINE'):
+            self.select(tag)
+        elif command == 'SEARCH':
+            self.search(tag, args, use_uid)
+        elif command == 'FETCH':
+            self.fetch(tag, args, use_uid)
+        elif command == 'STORE':
+            self.store(tag, args, use_uid)
+        elif command == 'CLOSE':
+            self.mailbox = None
+            self.send_line(f"{tag} OK CLOSE completed")
+        elif command == 'LOGOUT':
+            self.send_line("* BYE FreshTrack stub logging out")
+            self.send_line(f"{tag} OK LOGOUT completed")
+            self.wfile.flush()
+            return False
+        else:
+            self.send_line(f"{tag} BAD Unsupported command {command}")
+
+    def login(self, tag: str, args: str):
+        tokens = re.findall(r'"((?:[^"\\]|\\.)*)"|(\S+)', args)
+        values = [quoted.replace('\\"', '"').replace('\\\\', '\\') if quoted else atom
+                  for quoted, atom in tokens]
+        account = self.server.accounts.get(values[0]) if len(values) == 2 else None
+
+        if account is None or account['password'] != values[1]:
+            self.send_line(f"{tag} NO [AUTHENTICATIONFAILED] Invalid credentials")
+            return
+
+        self.username = values[0]
+        self.send_line(f"{tag} OK LOGIN completed")
+
+    def select(self, tag: str):
+        if self.username is None:
+            self.send_line(f"{tag} NO Not logged in")
+            return
+
+        self.mailbox = self.server.accounts[self.username]['inbox']
+        with self.mailbox.lock:
+            total = len(self.mailbox.messages)
+            next_uid = self.mailbox.next_uid
+
+        self.send_line("* FLAGS (\\Seen \\Answered \\Flagged \\Deleted \\Draft)")
+        self.send_line(f"* {total} EXISTS")
+        self.send_line("* 0 RECENT")
+        self.send_line(f"* OK [UIDVALIDITY {self.mailbox.uidvalidity}] UIDs valid")
+        self.send_line(f"* OK [UIDNEXT {next_uid}] Predicted next UID")
+        self.send_line(f"{tag} OK [READ-WRITE] SELECT completed")
+
+    def _resolve(self, sequence_set: str, use_uid: bool) -> List[tuple]:
+        """Return (sequence number, message) pairs addressed by a sequence set"""
+        messages = self.mailbox.messages
+        if use_uid:
+            largest = messages[-1]['uid'] if messages else 0
+            wanted = _parse_sequence_set(sequence_set, largest)
+            return [(index + 1, message) for index, message in enumerate(messages) if message['uid'] in wanted]
+
+        wanted = _parse_sequence_set(sequence_set, len(messages))
+        return [(number, messages[number - 1]) for number in sorted(wanted) if 1 <= number <= len(messages)]
+
+    def search(self, tag: str, args: str, use_uid: bool):
+        if self.mailbox is None:
+            self.send_line(f"{tag} NO No mailbox selected")
+            return
+
+        tokens = args.upper().split()
+        with self.mailbox.lock:
+            matches = list(enumerate(self.mailbox.messages, start=1))
+            index = 0
+            while index < len(tokens):
+                token = tokens[index]
+                if token == 'UNSEEN':
+                    matches = [(n, m) for n, m in matches if '\\Seen' not in m['flags']]
+                elif token == 'SEEN':
+                    matches = [(n, m) for n, m in matches if '\\Seen' in m['flags']]
+                elif token == 'UID':
+                    index += 1
+                    uids = {m['uid'] for _, m in self._resolve(tokens[index], use_uid=True)}
+                    matches = [(n, m) for n, m in matches if m['uid'] in uids]
+                elif token != 'ALL':
+                    raise ValueError(f"Unsupported search key {token}")
+                index += 1
+
+        results = [str(m['uid'] if use_uid else n) for n, m in matches]
+        self.send_line("* SEARCH" + ("" if not results else " " + " ".join(results)))
+        self.send_line(f"{tag} OK SEARCH completed")
+
+    def fetch(self, tag: str, args: str, use_uid: bool):
+        if self.mailbox is None:
+            self.send_line(f"{tag} NO No mailbox selected")
+            return
+
+        sequence_set, _, items = args.partition(' ')
+        items = items.upper()
+
+        with self.mailbox.lock:
+            targets = self._resolve(sequence_set, use_uid)
+
+            for number, message in targets:
+                prefix = f"* {number} FETCH ("
+                if use_uid or re.search(r'\bUID\b', items):
+                    prefix += f"UID {message['uid']} "
+
+                if 'HEADER.FIELDS' in items:
+                    fields = re.search(r'HEADER\.FIELDS \(([^)]*)\)', items).group(1).split()
+                    payload = self._header_fields(message['raw'], fields)
+                    name = f"BODY[HEADER.FIELDS ({' '.join(fields)})]"
+                    if 'BODY.PEEK' not in items:
+                        message['flags'].add('\\Seen')
+                elif 'RFC822' in items or 'BODY[]' in items or 'BODY.PEEK[]' in items:
+                    payload = message['raw']
+                    name = 'RFC822' if 'RFC822' in items else 'BODY[]'
+                    if 'PEEK' not in items:
+                        message['flags'].add('\\Seen')
+                else:
+                    flags = ' '.join(sorted(message['flags']))
+                    self.send_line(f"{prefix}FLAGS ({flags}))")
+                    continue
+
+                self.send(f"{prefix}{name} {{{len(payload)}}}\r\n".encode('utf-8') + payload + b")\r\n")
+
+        self.send_line(f"{tag} OK FETCH completed")
+
+    @staticmethod
+    def _header_fields(raw: bytes, fields: List[str]) -> bytes:
+        header_block = raw.split(b'\r\n\r\n', 1)[0].split(b'\n\n', 1)[0]
+        wanted = {field.lower().encode() for field in fields}
+        lines = []
+        keep = False
+        for line in header_block.splitlines():
+            if line[:1] in (b' ', b'\t'):
+                if keep:
+                    lines.append(line)
+                continue
+            keep = line.split(b':', 1)[0].strip().lower() in wanted
+            if keep:
+                lines.append(line)
+        return b'\r\n'.join(lines) + b'\r\n\r\n'
+
+    def store(self, tag: str, args: str, use_uid: bool):
+        if self.mailbox is None:
+            self.send_line(f"{tag} NO No mailbox selected")
+            return
+
+        sequence_set, action, flags = args.split(' ', 2)
+        flags = set(flags.strip('()').split())
+
+        with self.mailbox.lock:
+            for number, message in self._resolve(sequence_set, use_uid):
+                if action.upper().startswith('+'):
+                    message['flags'] |= flags
+                elif action.upper().startswith('-'):
+                    message['flags'] -= flags
+                else:
+                    message['flags'] = set(flags)
+
+                if not action.upper().endswith('.SILENT'):
+                    self.send_line(f"* {number} FETCH (FLAGS ({' '.join(sorted(message['flags']))}))")
+
+        self.send_line(f"{tag} OK STORE completed")
+
+
+# ==================== SYNTHETIC RECEIPTS ====================
+
+SAMPLE_RECEIPT_ITEMS = [
+    ('milk', 15.90), ('yogurt', 8.50), ('cheese', 32.00), ('butter', 18.80),
+    ('tomato', 9.60), ('lettuce', 6.50), ('apple', 24.00), ('banana', 12.30),
+    ('orange', 16.00), ('grape', 28.00), ('chicken', 25.80), ('pork', 36.50),
+    ('beef', 58.00), ('fish', 42.00), ('egg', 18.00), ('soy sauce', 12.50),
+    ('sugar', 7.20), ('salt', 3.50), ('oil', 45.00), ('rice', 45.00)
+]
+
+
+def make_receipt_text(rng: random.Random, item_count: int) -> str:
+    """Receipt text in the 'name price' layout parse_receipt_text understands"""
+    picks = rng.sample(SAMPLE_RECEIPT_ITEMS, k=min(item_count, len(SAMPLE_RECEIPT_ITEMS)))
+    lines = ["FRESH MART", "Welcome"]
+    lines += [f"{name} {price:.2f}" for name, price in picks]
+    lines.append(f"TOTAL {sum(price for _, price in picks):.2f}")
+    return "\n".join(lines)
+
+
+def render_receipt_image(text: str) -> bytes:
+    """Render receipt text as a PNG, roughly like a photographed thermal receipt"""
+    from PIL import Image, ImageDraw
+
+    lines = text.split("\n")
+    width, line_height = 360, 22
+    image = Image.new('L', (width, 40 + line_height * len(lines)), color=255)
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((20, 20 + index * line_height), line, fill=0)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def make_receipt_email(sender: str, recipient: str, image: bytes, text: str) -> bytes:
+    """Build a forwarded-receipt email with one PNG attachment"""
+    message = EmailMessage()
+    message['From'] = f"Shopper <{sender}>"
+    message['To'] = recipient
+    message['Subject'] = "Fwd: Your receipt"
+    message.set_content("Forwarded receipt attached.\n\n" + text)
+    message.add_attachment(image, maintype='image', subtype='png', filename='receipt.png')
+    return message.as_bytes()
+
+
+def seed_receipt_emails(
+    server: IMAPStubServer,
+    mailbox_address: str,
+    count: int,
+    senders: int = 100,
+    password: str = "secret",
+    variants: int = 20,
+    seed: int = 42
+) -> StubMailbox:
+    """
+    Fill a stub account with synthetic receipt emails
+
+    Only `variants` distinct receipt images are rendered and reused, which
+    keeps seeding thousands of messages fast. Sender frequency is skewed so a
+    few senders send most of the mail, as on real partner inboxes.
+
+    Args:
+        server: Running stub server
+        mailbox_address: Account to seed (created if needed)
+        count: Number of emails
+        senders: Number of distinct sender addresses
+        password: Account password
+        variants: Distinct receipt images to generate
+        seed: Random seed for reproducible datasets
+
+    Returns:
+        The seeded mailbox
+    """
+    rng = random.Random(seed)
+    mailbox = server.add_account(mailbox_address, password)
+
+    receipts = []
+    for _ in range(variants):
+        text = make_receipt_text(rng, rng.randint(3, 8))
+        receipts.append((text, render_receipt_image(text)))
+
+    sender_weights = [1.0 / (rank + 1) for rank in range(senders)]
+    sender_ranks = rng.choices(range(senders), weights=sender_weights, k=count)
+
+    for rank in sender_ranks:
+        text, image = rng.choice(receipts)
+        mailbox.append(make_receipt_email(f"shopper{rank}@example.com", mailbox_address, image, text))
+
+    return mailbox
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Run a seeded local IMAP stub server")
+    parser.add_argument("--port", type=int, default=1143)
+    parser.add_argument("--account", default="receipt@freshtrack.app")
+    parser.add_argument("--password", default="secret")
+    parser.add_argument("--messages", type=int, default=100)
+    args = parser.parse_args()
+
+    with running_imap_stub(port=args.port) as server:
+        seed_receipt_emails(server, args.account, args.messages, password=args.password)
+        print(f"📬 IMAP stub on {server.host}:{server.port} "
+              f"({args.messages} messages for {args.account} / {args.password})")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
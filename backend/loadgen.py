@@ -0,0 +1,323 @@
+"""
+Load generator for the REST API
+Simulates web UI sessions against a running server: each virtual user
+follows the web/app.js flow
+
+    dashboard -> fridge (first page, "load more" sometimes) -> recipes -> add an item or consume one
+
+with think time between steps and the browser's ETag cache (If-None-Match).
+After each fridge page the user clicks "load more" with probability
+--load-more, up to --max-pages pages.
+Virtual users are asyncio tasks sharing one httpx connection pool; they are
+started evenly over --ramp seconds up to --users and run until --duration.
+
+Every --interval seconds a line reports the active users, throughput, error
+rate and latency percentiles of that window; the end of the run prints the
+same per operation. Use it to size worker counts: ramp until p95 or the
+error rate bends.
+
+Usage:
+    python loadgen.py --users 50 --ramp 30 --duration 120
+    python loadgen.py --base-url http://api:8000 --users 500 --user-ids 1-1000000 --think 0.5
+    python loadgen.py --users 20 --duration 60 --json results.json --max-error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+FOODS = [
+    ("牛奶", "乳制品", 7), ("鸡蛋", "蛋类", 21), ("番茄", "蔬菜", 7), ("西兰花", "蔬菜", 5),
+    ("苹果", "水果", 30), ("香蕉", "水果", 5), ("鸡肉", "肉类", 2), ("酸奶", "乳制品", 14),
+    ("土豆", "蔬菜", 30), ("猪肉", "肉类", 3),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Stats:
+    """Latencies and errors per operation, for the whole run and the current window"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.not_modified: Dict[str, int] = defaultdict(int)
+        self.window: List[Tuple[float, bool]] = []
+
+    def record(self, operation: str, seconds: float, ok: bool, not_modified: bool = False):
+        self.latencies[operation].append(seconds)
+        if not ok:
+            self.errors[operation] += 1
+        if not_modified:
+            self.not_modified[operation] += 1
+        self.window.append((seconds, ok))
+
+    def take_window(self) -> List[Tuple[float, bool]]:
+        window, self.window = self.window, []
+        return window
+
+
+class VirtualUser:
+    """One browser session looping through the web UI flow"""
+
+    def __init__(self, client: httpx.AsyncClient, user_id: int, stats: Stats, think: float,
+                 rng: random.Random, load_more: float = 0.3, max_pages: int = 5):
+        self.client = client
+        self.user_id = user_id
+        self.stats = stats
+        self.think = think
+        self.rng = rng
+        self.load_more = load_more
+        self.max_pages = max_pages
+        self.etag_cache: Dict[str, Tuple[str, object, Optional[str]]] = {}
+        self.fridge: List[dict] = []
+
+    async def request(self, operation: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(operation, time.perf_counter() - started, ok=False)
+            return None
+        ok = response.status_code < 400
+        self.stats.record(operation, time.perf_counter() - started, ok, response.status_code == 304)
+        return response if ok else None
+
+    async def conditional_get(self, operation: str, url: str) -> Tuple[object, Optional[str]]:
+        """GET with If-None-Match, like conditionalGet() in app.js"""
+        cached = self.etag_cache.get(url)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = await self.request(operation, "GET", url, headers=headers)
+        if response is None:
+            return None, None
+        if response.status_code == 304 and cached:
+            return cached[1], cached[2]
+
+        data = response.json()
+        next_cursor = response.headers.get("X-Next-Cursor")
+        etag = response.headers.get("ETag")
+        if etag:
+            self.etag_cache[url] = (etag, data, next_cursor)
+        return data, next_cursor
+
+    async def pause(self):
+        if self.think > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think))
+
+    async def load_dashboard(self):
+        await self.conditional_get("dashboard", f"/api/dashboard/{self.user_id}?days=3")
+
+    async def load_fridge(self):
+        """First page, then "load more" clicks (loadMoreFridgeItems() in app.js)"""
+        items, cursor, pages = [], None, 0
+        base = f"/api/items/{self.user_id}"
+        while True:
+            url = f"{base}?cursor={cursor}" if cursor else base
+            page, cursor = await self.conditional_get("fridge_page", url)
+            if page is None:
+                return
+            items.extend(page)
+            pages += 1
+            if not cursor or pages >= self.max_pages or self.rng.random() >= self.load_more:
+                break
+            await self.pause()
+        self.fridge = items
+
+    async def load_recipes(self):
+        await self.conditional_get("recipes", f"/api/recipes/recommend/{self.user_id}?limit=10")
+
+    async def add_item(self):
+        name, category, days = self.rng.choice(FOODS)
+        now = datetime.now()
+        await self.request("add_item", "POST", f"/api/items/{self.user_id}", json={
+            "food_name": name,
+            "category": category,
+            "purchase_date": now.isoformat(),
+            "expiration_date": (now + timedelta(days=days)).isoformat(),
+            "quantity": self.rng.randint(1, 3),
+            "quantity_unit": "个",
+            "storage_location": "refrigerator"
+        })
+
+    async def consume_item(self):
+        if not self.fridge:
+            return await self.add_item()
+        item = self.fridge.pop(self.rng.randrange(len(self.fridge)))
+        await self.request("consume_item", "PUT", f"/api/items/consume/{item['id']}")
+
+    async def run(self, deadline: float):
+        while time.monotonic() < deadline:
+            await self.load_dashboard()
+            await self.pause()
+            await self.load_fridge()
+            await self.pause()
+            await self.load_recipes()
+            await self.pause()
+            # Sessions add groceries a bit more often than they finish them,
+            # so fridges grow slowly like real ones
+            if self.rng.random() < 0.55:
+                await self.add_item()
+            else:
+                await self.consume_item()
+            await self.pause()
+
+
+async def register_users(client: httpx.AsyncClient, count: int) -> List[int]:
+    """Create one account per virtual user for this run"""
+    run_id = int(time.time())
+    user_ids = []
+    for index in range(count):
+        response = await client.post("/api/users/register", json={
+            "email": f"loadgen-{run_id}-{index}@example.com", "username": f"loadgen-{index}"
+        })
+        response.raise_for_status()
+        user_ids.append(response.json()["id"])
+    return user_ids
+
+
+def parse_id_range(value: str) -> Tuple[int, int]:
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+async def report(stats: Stats, active: List[int], interval: float, started: float, timeline: list):
+    print(f"{'t':>6} {'users':>6} {'req/s':>8} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    while True:
+        await asyncio.sleep(interval)
+        window = stats.take_window()
+        latencies = [seconds for seconds, _ in window]
+        errors = sum(1 for _, ok in window if not ok)
+        row = {
+            't': round(time.monotonic() - started, 1),
+            'users': active[0],
+            'rps': round(len(window) / interval, 1),
+            'error_rate': round(errors / len(window), 4) if window else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1)
+        }
+        timeline.append(row)
+        print(f"{row['t']:>6} {row['users']:>6} {row['rps']:>8} {row['error_rate'] * 100:>6.2f} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}", flush=True)
+
+
+async def run_load(args) -> dict:
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as client:
+        if args.user_ids:
+            low, high = parse_id_range(args.user_ids)
+            rng = random.Random(args.seed)
+            user_ids = [rng.randint(low, high) for _ in range(args.users)]
+        else:
+            print(f"👤 Registering {args.users} users...")
+            user_ids = await register_users(client, args.users)
+
+        stats = Stats()
+        timeline = []
+        active = [0]
+        started = time.monotonic()
+        deadline = started + args.duration
+        reporter = asyncio.create_task(report(stats, active, args.interval, started, timeline))
+
+        async def virtual_user(index: int):
+            await asyncio.sleep(args.ramp * index / args.users)
+            if time.monotonic() >= deadline:
+                return
+            active[0] += 1
+            try:
+                user = VirtualUser(client, user_ids[index], stats, args.think, random.Random(args.seed + index),
+                                   args.load_more, args.max_pages)
+                await user.run(deadline)
+            finally:
+                active[0] -= 1
+
+        print(f"🚀 {args.users} virtual users against {args.base_url}, ramp {args.ramp}s, "
+              f"duration {args.duration}s, think {args.think}s")
+        await asyncio.gather(*(virtual_user(index) for index in range(args.users)))
+        elapsed = time.monotonic() - started
+        reporter.cancel()
+
+    operations = {}
+    for operation, latencies in sorted(stats.latencies.items()):
+        operations[operation] = {
+            'requests': len(latencies),
+            'errors': stats.errors[operation],
+            'not_modified': stats.not_modified[operation],
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1)
+        }
+    total = sum(operation['requests'] for operation in operations.values())
+    errors = sum(operation['errors'] for operation in operations.values())
+    return {
+        'users': args.users,
+        'duration_seconds': round(elapsed, 1),
+        'requests': total,
+        'rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'operations': operations,
+        'timeline': timeline
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent web UI sessions against the API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users at peak")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds to start all users")
+    parser.add_argument("--duration", type=float, default=60.0, help="Total run time in seconds")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean think time between steps (seconds)")
+    parser.add_argument("--load-more", type=float, default=0.3,
+                        help="Chance of clicking \"load more\" after each fridge page")
+    parser.add_argument("--max-pages", type=int, default=5, help="Most fridge pages loaded per visit")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between progress lines")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--user-ids", help="Use existing users, e.g. 1-1000000 (default: register new ones)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="Write the summary and timeline to this file")
+    parser.add_argument("--max-error-rate", type=float, help="Exit non-zero above this error rate (e.g. 0.01)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args))
+
+    print("\n" + "=" * 72)
+    print(f"📊 LOAD TEST: {results['requests']} requests in {results['duration_seconds']}s "
+          f"({results['rps']} req/s, {results['error_rate'] * 100:.2f}% errors)")
+    print("=" * 72)
+    print(f"{'operation':14} {'requests':>9} {'errors':>7} {'304s':>6} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, operation in results['operations'].items():
+        print(f"{name:14} {operation['requests']:>9} {operation['errors']:>7} {operation['not_modified']:>6} "
+              f"{operation['rps']:>8} {operation['p50_ms']:>8} {operation['p95_ms']:>8} {operation['p99_ms']:>8}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+    if args.max_error_rate is not None and results['error_rate'] > args.max_error_rate:
+        print(f"\n❌ Error rate {results['error_rate'] * 100:.2f}% above {args.max_error_rate * 100:.2f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""
+Email ingestion load test
+Seeds a local IMAP stub with synthetic receipt emails and drives
+EmailMonitorService.check_new_emails (sync mode) and/or mailbox_ingest
+(async mode) against it with a throwaway SQLite database.
+
+Reports messages/sec, OCR and DB time shares and peak memory. With
+--min-rate it exits non-zero when throughput drops below the threshold, so
+it can run in CI without network access or a Gmail account.
+
+Usage:
+    python loadtest_ingest.py --messages 2000 --senders 200
+    python loadtest_ingest.py --mode async --mailboxes 4 --min-rate 50
+    python loadtest_ingest.py --ocr real        # needs the tesseract binary
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+class TimeAccumulator:
+    """Thread-safe running total of seconds spent in a code path"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.seconds += seconds
+            self.calls += 1
+
+    def reset(self):
+        with self._lock:
+            self.seconds = 0.0
+            self.calls = 0
+
+
+def max_rss_mb():
+    """
+    Peak resident memory of this process in MB
+
+    resource is Unix-only; on Windows psutil's peak working set is used if
+    installed, otherwise None.
+    """
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        memory = psutil.Process().memory_info()
+        return round(getattr(memory, 'peak_wset', memory.rss) / 1024 / 1024, 1)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+OCR_TIME = TimeAccumulator()
+DB_TIME = TimeAccumulator()
+
+
+def instrument(ocr_mode: str, stub_ocr_ms: float):
+    """
+    Time OCR calls and SQL statements
+
+    In stub mode OCR is replaced by a fixed delay plus the real text parser,
+    so the run doesn't depend on the tesseract binary.
+    """
+    from sqlalchemy import event
+    from database import engine
+    from ocr_service import ReceiptOCRService
+    from imap_stub import make_receipt_text
+    import random
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        DB_TIME.add(time.perf_counter() - conn.info['query_start'].pop())
+
+    original = ReceiptOCRService.process_receipt_image
+    stub_text = make_receipt_text(random.Random(0), 5)
+
+    def timed_process_receipt_image(self, image_path):
+        started = time.perf_counter()
+        try:
+            if ocr_mode == 'stub':
+                time.sleep(stub_ocr_ms / 1000.0)
+                return self.parse_receipt_text(stub_text)
+            return original(self, image_path)
+        finally:
+            OCR_TIME.add(time.perf_counter() - started)
+
+    ReceiptOCRService.process_receipt_image = timed_process_receipt_image
+
+
+def run_sync(server, account: str, password: str, total: int) -> dict:
+    """Drain the mailbox with one EmailMonitorService.check_new_emails call"""
+    from email_monitor import EmailMonitorService
+
+    monitor = EmailMonitorService(account, password, server.host, imap_port=server.port, use_ssl=False)
+
+    started = time.perf_counter()
+    monitor.check_new_emails()
+    elapsed = time.perf_counter() - started
+
+    return {'processed': monitor.stats['emails_processed'], 'wall_seconds': elapsed}
+
+
+def run_async(server, accounts, password: str, total: int, ocr_workers: int, checkpoint_file: str,
+              timeout: float) -> dict:
+    """Drain all mailboxes with MultiMailboxIngestService"""
+    from mailbox_ingest import MailboxConfig, MultiMailboxIngestService
+
+    configs = [
+        MailboxConfig(
+            name=account,
+            email_address=account,
+            password=password,
+            imap_server=server.host,
+            imap_port=server.port,
+            use_ssl=False,
+            interval_seconds=3600,
+            max_messages_per_minute=0,
+            max_in_flight=ocr_workers
+        )
+        for account in accounts
+    ]
+    service = MultiMailboxIngestService(configs, ocr_workers=ocr_workers, checkpoint_file=checkpoint_file)
+
+    async def drive():
+        task = asyncio.create_task(service.run())
+        deadline = time.monotonic() + timeout
+        while not task.done() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            stats = service.get_stats().values()
+            if sum(s['messages'] + s['errors'] for s in stats) >= total:
+                break
+        service.stop()
+        await task
+
+    started = time.perf_counter()
+    asyncio.run(drive())
+    elapsed = time.perf_counter() - started
+
+    processed = sum(stats['messages'] for stats in service.get_stats().values())
+    return {'processed': processed, 'wall_seconds': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test email ingestion against a local IMAP stub")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--messages", type=int, default=1000, help="Emails per mode")
+    parser.add_argument("--senders", type=int, default=100, help="Distinct sender addresses")
+    parser.add_argument("--mailboxes", type=int, default=2, help="Mailboxes for async mode")
+    parser.add_argument("--ocr-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--ocr", choices=["stub", "real"], default="stub")
+    parser.add_argument("--stub-ocr-ms", type=float, default=20.0, help="Simulated OCR time per image")
+    parser.add_argument("--min-rate", type=float, default=None,
+                        help="Fail if any mode processes fewer messages/sec than this")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="Also report peak Python heap (slows the run noticeably)")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Give up on a mode after this many seconds")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="freshtrack-loadtest-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+
+    # Imported after DATABASE_URL is set so the engine points at the temp DB
+    from database import init_db
+    import models  # noqa: F401  (registers the tables for init_db)
+    from imap_stub import running_imap_stub, seed_receipt_emails
+    import logging
+
+    logging.basicConfig(level=logging.WARNING, force=True)
+    init_db()
+    instrument(args.ocr, args.stub_ocr_ms)
+
+    password = "secret"
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    results = {}
+
+    with running_imap_stub() as server:
+        for mode in modes:
+            print(f"\n📬 Seeding {args.messages} emails for {mode} mode...")
+            if mode == "sync":
+                accounts = ["receipt-sync@freshtrack.app"]
+            else:
+                accounts = [f"receipt-{index}@freshtrack.app" for index in range(args.mailboxes)]
+
+            per_mailbox = [args.messages // len(accounts)] * len(accounts)
+            per_mailbox[0] += args.messages - sum(per_mailbox)
+            for account, count in zip(accounts, per_mailbox):
+                seed_receipt_emails(server, account, count, senders=args.senders, password=password)
+
+            OCR_TIME.reset()
+            DB_TIME.reset()
+            if args.tracemalloc:
+                tracemalloc.start()
+
+            if mode == "sync":
+                run = run_sync(server, accounts[0], password, args.messages)
+            else:
+                run = run_async(server, accounts, password, args.messages, args.ocr_workers,
+                                os.path.join(workdir, "checkpoints.json"), args.timeout)
+
+            peak_traced = None
+            if args.tracemalloc:
+                _, peak_traced = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+            wall = run['wall_seconds']
+            results[mode] = {
+                'messages': run['processed'],
+                'wall_seconds': round(wall, 3),
+                'messages_per_sec': round(run['processed'] / wall, 2) if wall else 0.0,
+                'ocr_seconds': round(OCR_TIME.seconds, 3),
+                'ocr_time_share': round(OCR_TIME.seconds / wall, 3) if wall else 0.0,
+                'db_seconds': round(DB_TIME.seconds, 3),
+                'db_statements': DB_TIME.calls,
+                'db_time_share': round(DB_TIME.seconds / wall, 3) if wall else 0.0,
+                'peak_python_memory_mb': round(peak_traced / 1024 / 1024, 1) if peak_traced else None,
+                'max_rss_mb': max_rss_mb()
+            }
+
+    print("\n" + "=" * 60)
+    print("📊 INGESTION LOAD TEST RESULTS")
+    print("=" * 60)
+    for mode, result in results.items():
+        print(f"\n{mode}:")
+        for key, value in result.items():
+            print(f"   {key}: {value}")
+    print("\n   (time shares are summed across threads and can exceed 1.0 in async mode)")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failed = False
+    for mode, result in results.items():
+        if result['messages'] < args.messages:
+            print(f"❌ {mode}: only {result['messages']}/{args.messages} messages processed")
+            failed = True
+        if args.min_rate is not None and result['messages_per_sec'] < args.min_rate:
+            print(f"❌ {mode}: {result['messages_per_sec']} msg/s is below --min-rate {args.min_rate}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
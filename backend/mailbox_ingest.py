@@ -0,0 +1,524 @@
+"""
+Multi-mailbox email ingestion service
+Monitors several receipt inboxes concurrently with asyncio from one process.
+Every mailbox keeps its own IMAP connection, checkpoint and rate limit, and
+all of them feed image attachments into one shared OCR worker pool.
+"""
+import asyncio
+import email
+import json
+import logging
+import os
+import signal
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from database import SessionLocal
+from email_monitor import EmailMonitorService
+from ocr_service import ReceiptOCRService
+from ocr_scheduler import OCRScheduler, EMAIL
+from sender_cache import SenderCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class MailboxConfig:
+    """Connection and pacing settings for one monitored inbox"""
+
+    def __init__(
+        self,
+        name: str,
+        email_address: str,
+        password: str,
+        imap_server: str = "imap.gmail.com",
+        imap_port: Optional[int] = None,
+        use_ssl: bool = True,
+        interval_seconds: int = 300,
+        max_messages_per_minute: int = 60,
+        max_in_flight: int = 4
+    ):
+        """
+        Args:
+            name: Unique mailbox name, used as the checkpoint key
+            email_address: Email address to monitor
+            password: Email password or app-specific password
+            imap_server: IMAP server address
+            imap_port: IMAP port (defaults to the standard port for use_ssl)
+            use_ssl: Connect over IMAP4_SSL
+            interval_seconds: Delay between polls of this mailbox
+            max_messages_per_minute: Fetch rate limit (0 = unlimited)
+            max_in_flight: Messages of this mailbox being processed at once
+        """
+        self.name = name
+        self.email_address = email_address
+        self.password = password
+        self.imap_server = imap_server
+        self.imap_port = imap_port
+        self.use_ssl = use_ssl
+        self.interval_seconds = interval_seconds
+        self.max_messages_per_minute = max_messages_per_minute
+        self.max_in_flight = max_in_flight
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MailboxConfig":
+        """
+        Build a config from one entry of the mailboxes config file
+
+        The password can be given inline (`password`) or, preferably, as the
+        name of an environment variable holding it (`password_env`).
+        """
+        password = data.get('password')
+        if password is None and data.get('password_env'):
+            password = os.getenv(data['password_env'], '')
+
+        if not password:
+            raise ValueError(f"No password configured for mailbox '{data.get('name')}'")
+
+        return cls(
+            name=data['name'],
+            email_address=data['email_address'],
+            password=password,
+            imap_server=data.get('imap_server', 'imap.gmail.com'),
+            imap_port=data.get('imap_port'),
+            use_ssl=data.get('use_ssl', True),
+            interval_seconds=data.get('interval_seconds', 300),
+            max_messages_per_minute=data.get('max_messages_per_minute', 60),
+            max_in_flight=data.get('max_in_flight', 4)
+        )
+
+
+class CheckpointStore:
+    """
+    Persist the last fully processed message UID of every mailbox
+
+    Checkpoints are keyed by mailbox name and tagged with the folder's
+    UIDVALIDITY, so a server-side renumbering resets the checkpoint instead
+    of skipping mail.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, Dict] = {}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+
+    def get(self, name: str, uidvalidity: Optional[str]) -> int:
+        """Return the last processed UID, or 0 if unknown or invalidated"""
+        entry = self._data.get(name)
+        if not entry or entry.get('uidvalidity') != uidvalidity:
+            return 0
+        return entry.get('last_uid', 0)
+
+    def set(self, name: str, uidvalidity: Optional[str], last_uid: int):
+        """Record progress and write the checkpoint file atomically"""
+        self._data[name] = {'uidvalidity': uidvalidity, 'last_uid': last_uid}
+
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._data, f)
+        os.replace(temp_path, self.path)
+
+
+class RateLimiter:
+    """Async token bucket limiting how many messages a mailbox fetches per minute"""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(per_minute, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MailboxWorker:
+    """Polling loop and connection state for a single mailbox"""
+
+    def __init__(self, config: MailboxConfig, service: "MultiMailboxIngestService"):
+        self.config = config
+        self.service = service
+        self.monitor = EmailMonitorService(
+            config.email_address,
+            config.password,
+            config.imap_server,
+            ocr_service=service.ocr_service,
+            ocr_scheduler=service.ocr_scheduler,
+            sender_cache=service.sender_cache,
+            imap_port=config.imap_port,
+            use_ssl=config.use_ssl
+        )
+        self.rate_limiter = RateLimiter(config.max_messages_per_minute)
+
+        # imaplib connections are not thread-safe, so every IMAP call of this
+        # mailbox goes through its own single-threaded executor
+        self.io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"imap-{config.name}")
+        self.connection = None
+        self.uidvalidity: Optional[str] = None
+        self.failures = 0
+
+        self.stats = {
+            'polls': 0,
+            'messages': 0,
+            'items_added': 0,
+            'errors': 0,
+            'last_check': None
+        }
+
+    async def _io(self, func, *args):
+        """Run a blocking IMAP call on this mailbox's connection thread"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, func, *args)
+
+    def _ensure_connection(self):
+        """Reuse the open connection if it is still alive, otherwise reconnect"""
+        if self.connection is not None:
+            try:
+                self.connection.noop()
+                return self.connection
+            except Exception:
+                self.connection = None
+
+        mail = self.monitor.connect_to_mailbox()
+        mail.select("inbox")
+        _, data = mail.response('UIDVALIDITY')
+        self.uidvalidity = data[0].decode() if data and data[0] else None
+        self.connection = mail
+        return mail
+
+    def _close_connection(self):
+        """Log out quietly; the next poll reconnects"""
+        if self.connection is not None:
+            try:
+                self.connection.logout()
+            except Exception:
+                pass
+            self.connection = None
+
+    def _search_new_uids(self) -> List[int]:
+        """Return unread message UIDs above this mailbox's checkpoint"""
+        mail = self._ensure_connection()
+        last_uid = self.service.checkpoints.get(self.config.name, self.uidvalidity)
+
+        status, data = mail.uid('SEARCH', None, 'UNSEEN', f'UID {last_uid + 1}:*')
+        if status != "OK":
+            raise RuntimeError(f"UID SEARCH failed: {status}")
+
+        # "n:*" always matches the newest message, even when its UID is below n
+        return sorted(uid for uid in map(int, data[0].split()) if uid > last_uid)
+
+    def _fetch_message(self, uid: int):
+        """Fetch one full message by UID"""
+        status, msg_data = self.connection.uid('FETCH', str(uid), '(RFC822)')
+        if status != "OK" or not msg_data or msg_data[0] is None:
+            raise RuntimeError(f"UID FETCH {uid} failed: {status}")
+        return email.message_from_bytes(msg_data[0][1])
+
+    def _fetch_senders(self, uids: List[int]) -> Dict[int, str]:
+        """Fetch the senders of a batch of messages in one UID FETCH"""
+        senders = self.monitor.fetch_senders(
+            self.connection,
+            [str(uid).encode() for uid in uids],
+            use_uid=True
+        )
+        return {int(uid): sender_email for uid, sender_email in senders.items()}
+
+    def _resolve_user_ids(self, sender_emails: List[str]) -> Dict[str, Optional[int]]:
+        """Resolve a batch of senders through the shared sender cache"""
+        db = SessionLocal()
+        try:
+            return self.monitor.resolve_user_ids(sender_emails, db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _save_items(self, items: List[Dict], user_id: int) -> int:
+        """Persist OCR results in a dedicated session"""
+        db = SessionLocal()
+        try:
+            return self.monitor.save_receipt_items(items, user_id, db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def _process_message(self, uid: int, msg, user_id: int) -> int:
+        """OCR every receipt image of one message and store the items"""
+        items_added = 0
+        for filename, payload in self.monitor.iter_image_attachments(msg):
+            try:
+                items = await self.service.run_ocr(filename, payload)
+                items_added += await asyncio.to_thread(self._save_items, items, user_id)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ [{self.config.name}] Error processing receipt in message {uid}: {str(e)}")
+
+        return items_added
+
+    async def poll(self, stop_event: asyncio.Event):
+        """
+        Process all new messages of this mailbox
+
+        Fetches are sequential on the mailbox connection while OCR and
+        database work for up to `max_in_flight` messages run concurrently.
+        The checkpoint only advances over a contiguous run of finished UIDs,
+        so a crash never skips a message that was still in flight.
+        """
+        self.stats['polls'] += 1
+        self.stats['last_check'] = time.time()
+
+        uids = await self._io(self._search_new_uids)
+        if not uids:
+            return
+
+        logger.info(f"📧 [{self.config.name}] Found {len(uids)} new email(s)")
+
+        uidvalidity = self.uidvalidity
+        finished = set()
+        next_index = 0
+        slots = asyncio.Semaphore(self.config.max_in_flight)
+        tasks = []
+
+        def advance_checkpoint():
+            nonlocal next_index
+            start = next_index
+            while next_index < len(uids) and uids[next_index] in finished:
+                next_index += 1
+            if next_index > start:
+                self.service.checkpoints.set(self.config.name, uidvalidity, uids[next_index - 1])
+
+        async def handle(uid, msg, user_id):
+            try:
+                items_added = await self._process_message(uid, msg, user_id)
+                self.stats['messages'] += 1
+                self.stats['items_added'] += items_added
+                if items_added > 0:
+                    logger.info(f"✅ [{self.config.name}] Added {items_added} items from message {uid}")
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ [{self.config.name}] Error processing email {uid}: {str(e)}")
+            finally:
+                finished.add(uid)
+                advance_checkpoint()
+                slots.release()
+
+        try:
+            for start in range(0, len(uids), self.monitor.FETCH_BATCH_SIZE):
+                if stop_event.is_set():
+                    break
+
+                # Resolve every sender of the batch to a user up front
+                batch = uids[start:start + self.monitor.FETCH_BATCH_SIZE]
+                senders = await self._io(self._fetch_senders, batch)
+                user_ids = await asyncio.to_thread(self._resolve_user_ids, list(senders.values()))
+
+                for uid in batch:
+                    if stop_event.is_set():
+                        break
+
+                    sender_email = senders.get(uid)
+                    user_id = user_ids.get(sender_email)
+                    if user_id is None:
+                        logger.warning(f"⚠️  [{self.config.name}] Skipping message {uid} "
+                                       f"from unresolved sender: {sender_email}")
+                        finished.add(uid)
+                        advance_checkpoint()
+                        continue
+
+                    await slots.acquire()
+                    await self.rate_limiter.acquire()
+
+                    try:
+                        msg = await self._io(self._fetch_message, uid)
+                    except Exception:
+                        slots.release()
+                        raise
+
+                    logger.info(f"📨 [{self.config.name}] Processing email from: {sender_email}")
+                    tasks.append(asyncio.create_task(handle(uid, msg, user_id)))
+        finally:
+            # Drain in-flight messages before returning, even on fetch errors
+            if tasks:
+                await asyncio.gather(*tasks)
+
+    async def run(self, stop_event: asyncio.Event):
+        """Poll until the stop event is set, backing off after failures"""
+        logger.info(f"🚀 [{self.config.name}] Monitoring {self.config.email_address} "
+                    f"every {self.config.interval_seconds}s")
+
+        while not stop_event.is_set():
+            try:
+                await self.poll(stop_event)
+                self.failures = 0
+                delay = self.config.interval_seconds
+            except Exception as e:
+                self.failures += 1
+                self.stats['errors'] += 1
+                logger.error(f"❌ [{self.config.name}] Poll failed: {str(e)}")
+                await self._io(self._close_connection)
+                delay = min(self.config.interval_seconds, 2 ** self.failures)
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+        await self._io(self._close_connection)
+        self.io_executor.shutdown(wait=True)
+        logger.info(f"⏹️  [{self.config.name}] Stopped")
+
+
+class MultiMailboxIngestService:
+    """Monitor many receipt mailboxes concurrently with one shared OCR pool"""
+
+    def __init__(
+        self,
+        mailboxes: List[MailboxConfig],
+        ocr_workers: Optional[int] = None,
+        checkpoint_file: str = "./data/mailbox_checkpoints.json"
+    ):
+        """
+        Args:
+            mailboxes: Mailboxes to monitor
+            ocr_workers: Size of the shared OCR pool (defaults to CPU count)
+            checkpoint_file: JSON file holding per-mailbox checkpoints
+        """
+        names = [mailbox.name for mailbox in mailboxes]
+        if len(names) != len(set(names)):
+            raise ValueError("Mailbox names must be unique")
+
+        self.ocr_service = ReceiptOCRService()
+        self.sender_cache = SenderCache()
+        # Email OCR runs on low-priority background threads, so an API
+        # process on the same host keeps serving interactive uploads first
+        self.ocr_scheduler = OCRScheduler(interactive_workers=0, background_workers=ocr_workers)
+        self.checkpoints = CheckpointStore(checkpoint_file)
+        self.workers = [MailboxWorker(config, self) for config in mailboxes]
+        self._stop_event: Optional[asyncio.Event] = None
+
+    @classmethod
+    def from_config_file(cls, path: str) -> "MultiMailboxIngestService":
+        """
+        Create the service from a JSON config file
+
+        See mailboxes.example.json for the expected layout.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        mailboxes = [MailboxConfig.from_dict(entry) for entry in config.get('mailboxes', [])]
+        if not mailboxes:
+            raise ValueError(f"No mailboxes configured in {path}")
+
+        return cls(
+            mailboxes,
+            ocr_workers=config.get('ocr_workers'),
+            checkpoint_file=config.get('checkpoint_file', './data/mailbox_checkpoints.json')
+        )
+
+    def _ocr_image_bytes(self, filename: str, payload: bytes) -> List[Dict]:
+        """Run OCR on an in-memory attachment (executes on an OCR worker thread)"""
+        suffix = os.path.splitext(filename)[1] or '.jpg'
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            temp_file.write(payload)
+            temp_path = temp_file.name
+
+        try:
+            return self.ocr_service.process_receipt_image(temp_path)
+        finally:
+            os.unlink(temp_path)
+
+    async def run_ocr(self, filename: str, payload: bytes) -> List[Dict]:
+        """Queue an attachment on the shared OCR pool and wait for its items"""
+        return await asyncio.wrap_future(
+            self.ocr_scheduler.submit(EMAIL, self._ocr_image_bytes, filename, payload)
+        )
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Per-mailbox counters keyed by mailbox name"""
+        return {worker.config.name: dict(worker.stats) for worker in self.workers}
+
+    async def run(self):
+        """Monitor all mailboxes until stop() is called"""
+        self._stop_event = asyncio.Event()
+        logger.info(f"🚀 Starting ingestion for {len(self.workers)} mailbox(es)")
+
+        try:
+            await asyncio.gather(*(worker.run(self._stop_event) for worker in self.workers))
+        finally:
+            self.ocr_scheduler.shutdown(wait=True)
+
+        logger.info("✅ Email ingestion stopped")
+
+    def stop(self):
+        """Ask every mailbox to finish in-flight messages and stop polling"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+
+async def _main(config_path: str, health_port: Optional[int]):
+    from health_server import HealthServer
+
+    service = MultiMailboxIngestService.from_config_file(config_path)
+
+    health_server = None
+    if health_port is not None:
+        health_server = HealthServer(service.get_stats, port=health_port)
+        health_server.start()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, service.stop)
+        except NotImplementedError:
+            # Windows event loops don't support signal handlers
+            pass
+
+    try:
+        await service.run()
+    finally:
+        if health_server is not None:
+            health_server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Monitor several receipt mailboxes")
+    parser.add_argument("--config", default="mailboxes.json", help="Path to the mailboxes config file")
+    parser.add_argument("--health-port", type=int, default=8081,
+                        help="Port for the /healthz and /metrics endpoint (0 picks a free port)")
+    parser.add_argument("--no-health", action="store_true", help="Disable the health endpoint")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_main(args.config, None if args.no_health else args.health_port))
+    except KeyboardInterrupt:
+        pass
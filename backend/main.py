@@ -10,16 +10,46 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, status
+from apscheduler.schedulers.background import BackgroundScheduler
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, case, delete, event, func, insert, select, tuple_, update
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, field_validator
+import asyncio
+import base64
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+import time
+
+from database import get_db, init_db, upgrade_schema, engine, SessionLocal
+from event_hub import EventHub
+from singleflight import SingleFlight
+from reference_data import recipe_index, shelf_life_index
+import reference_data
+from request_metrics import RequestMetricsMiddleware, instrument_engine
+from admission import AdmissionControlMiddleware
+import query_profiler
+import request_profiler
+import metrics
+from models import (
+    User, FoodItem, ShoppingListItem, SyncTombstone, Base, URGENCY_DAY_RANGES,
+    bump_data_version, expiry_now, next_data_version, prune_tombstones, urgency_for_days
+)
 
-from database import get_db, init_db, engine
-from models import User, FoodItem, FoodShelfLife, Recipe, ShoppingListItem, Base
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+from ocr_scheduler import get_ocr_scheduler, INTERACTIVE
+from ocr_service import ReceiptOCRService, load_libraries as load_ocr_libraries
 
 
 # Pydantic schemas for request/response
@@ -97,6 +127,75 @@ class ShoppingListItemResponse(BaseModel):
         from_attributes = True
 
 
+class DashboardStats(BaseModel):
+    total_items: int
+    expiring_today: int
+    expiring_within_3_days: int
+    fresh_items: int
+
+
+class DashboardResponse(BaseModel):
+    stats: DashboardStats
+    urgent_items: List[FoodItemResponse]
+    category_breakdown: dict
+
+
+class FoodItemSyncResponse(FoodItemResponse):
+    updated_at: Optional[datetime]
+    sync_version: int
+
+
+class ShoppingListItemSyncResponse(ShoppingListItemResponse):
+    updated_at: Optional[datetime]
+    sync_version: int
+
+
+class SyncDeleted(BaseModel):
+    items: List[int]
+    shopping_items: List[int]
+
+
+class SyncResponse(BaseModel):
+    cursor: int
+    full: bool
+    items: List[FoodItemSyncResponse]
+    shopping_items: List[ShoppingListItemSyncResponse]
+    deleted: SyncDeleted
+
+
+# Max rows accepted by one batch request
+MAX_BATCH_SIZE = 500
+
+
+class FoodItemBatchCreate(BaseModel):
+    items: List[FoodItemCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ShoppingListBatchCreate(BaseModel):
+    items: List[ShoppingListItemCreate] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BatchIds(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+    @field_validator("ids")
+    @classmethod
+    def unique_ids(cls, ids: List[int]) -> List[int]:
+        """Drop repeated ids (first occurrence wins), so each row is counted once"""
+        return list(dict.fromkeys(ids))
+
+
+class BatchItemResult(BaseModel):
+    id: int
+    status: str  # consumed / purchased / deleted / not_found
+
+
+class BatchResult(BaseModel):
+    requested: int
+    succeeded: int
+    results: List[BatchItemResult]
+
+
 # Create FastAPI app
 app = FastAPI(
     title="FreshTrack API",
@@ -104,6 +203,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Concurrency limits, wait queues and per-user upload rate for the
+# expensive routes (inside CORS, so browsers can read the 429/503s)
+app.add_middleware(AdmissionControlMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -111,15 +214,244 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After", query_profiler.PROFILE_HEADER, request_profiler.ID_HEADER],
 )
 
+# SQL_PROFILE=1: per-request statement log and X-SQL-Profile header
+if query_profiler.PROFILE_ENABLED:
+    app.add_middleware(query_profiler.QueryProfilerMiddleware)
+
+# PROFILE_TOKEN set: requests sending it in X-Profile-Token are sampled
+if request_profiler.PROFILE_TOKEN:
+    app.add_middleware(request_profiler.RequestProfilerMiddleware)
+
+# Per-route request/latency/DB metrics for GET /metrics (outermost, so it
+# also times the other middleware)
+app.add_middleware(RequestMetricsMiddleware)
+instrument_engine(engine)
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+# Response fields computed from expiration_date rather than stored
+DERIVED_ITEM_FIELDS = {"days_left": "expiration_date", "urgency_level": "expiration_date"}
+
+# days_left/urgency depend on the clock as well as the data, so ETags also
+# roll over every ETAG_TIME_BUCKET_SECONDS
+ETAG_TIME_BUCKET_SECONDS = int(os.getenv("ETAG_TIME_BUCKET_SECONDS", "300"))
+
+# Concurrent identical requests (same URL and data version) share one computation
+recipe_flights = SingleFlight("recommend_recipes")
+stats_flights = SingleFlight("user_stats")
+
+# Server-sent events: database poll interval and keep-alive comment interval
+EVENTS_POLL_INTERVAL_SECONDS = float(os.getenv("EVENTS_POLL_INTERVAL_SECONDS", "1.0"))
+SSE_HEARTBEAT_SECONDS = 15.0
+
+# Deletions are kept for delta sync this long (0 keeps them forever); a
+# client whose cursor is older gets a full sync
+TOMBSTONE_RETENTION_DAYS = float(os.getenv("TOMBSTONE_RETENTION_DAYS", "30"))
+TOMBSTONE_PRUNE_INTERVAL_MINUTES = 60
+
+
+# serve.py checks the schema once before starting workers and sets this
+SCHEMA_CHECKED = os.getenv("SCHEMA_CHECKED") == "1"
+
+# Load reference data and the OCR pool before taking traffic (WARMUP=0 to skip)
+WARMUP_ON_STARTUP = os.getenv("WARMUP", "1") == "1"
+
+# Set once startup (including warmup) has finished; reported by /ready
+readiness = {'ready': False, 'warmup': {}}
+
+
+def warm_up() -> dict:
+    """Fill this worker's caches so the first requests don't pay for them"""
+    timings = {}
+
+    started = time.perf_counter()
+    counts = reference_data.warm()
+    timings['reference_data_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    # Imports OpenCV/Tesseract bindings and starts the interactive OCR threads
+    load_ocr_libraries()
+    get_ocr_scheduler()
+    timings['ocr_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SELECT 1")
+    timings['database_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    return dict(counts, **timings)
+
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup"""
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database initialized!")
+    """Initialize database tables and warm caches on startup"""
+    if not SCHEMA_CHECKED:
+        Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+        print("✅ Database initialized!")
+    if WARMUP_ON_STARTUP:
+        readiness['warmup'] = await run_in_threadpool(warm_up)
+        print(f"🔥 Worker {os.getpid()} warmed up: {readiness['warmup']}")
+    event_hub.start()
+    if TOMBSTONE_RETENTION_DAYS > 0:
+        maintenance_scheduler.start()
+    readiness['ready'] = True
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Stop background work and end any event stream still open
+
+    uvicorn runs this after in-flight responses have finished, and event
+    streams never finish on their own: on SIGTERM it waits at most
+    timeout_graceful_shutdown (serve.py --graceful-timeout) and then
+    cancels them. Servers that run shutdown first get the streams ended
+    here, through the hub.
+    """
+    readiness['ready'] = False
+    if maintenance_scheduler.running:
+        maintenance_scheduler.shutdown(wait=False)
+    await event_hub.stop()
+
+
+# ==================== LIST & BATCH HELPERS ====================
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """Encode the (sort value, id) keyset position of the last returned row"""
+    raw = json.dumps([sort_value.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], response_model) -> Optional[List[str]]:
+    """Validate a comma-separated fields= projection against a response model"""
+    if not fields:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in response_model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Response for content that is already plain dicts/lists
+
+    Skips response_model validation; encodes with orjson when installed.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"),
+            default=lambda value: value.isoformat()
+        ).encode("utf-8")
+
+
+def row_columns(model, response_model, fields: Optional[List[str]], required=("id",)) -> List[str]:
+    """Stored columns to select for a (possibly projected) list response"""
+    wanted = set(fields or response_model.model_fields)
+    if model is FoodItem:
+        wanted = {DERIVED_ITEM_FIELDS.get(field, field) for field in wanted}
+    wanted.update(required)
+    return [column.name for column in model.__table__.columns if column.name in wanted]
+
+
+def food_item_dicts(rows, column_names: List[str], fields: Optional[List[str]] = None,
+                    now: Optional[datetime] = None) -> List[dict]:
+    """
+    FoodItemResponse-shaped dicts for Core rows
+
+    days_left/urgency_level are computed here against one clock read rather
+    than by the ORM properties per row.
+    """
+    fields = fields or list(FoodItemResponse.model_fields)
+    now = now or expiry_now()
+
+    result = []
+    for row in rows:
+        values = dict(zip(column_names, row))
+        days_left = (values["expiration_date"] - now).days
+        values["days_left"] = days_left
+        values["urgency_level"] = urgency_for_days(days_left)
+        result.append({field: values[field] for field in fields})
+    return result
+
+
+def plain_dicts(rows, column_names: List[str], fields: List[str]) -> List[dict]:
+    """Response dicts for Core rows of a model without derived fields"""
+    indexes = [column_names.index(field) for field in fields]
+    return [{field: row[index] for field, index in zip(fields, indexes)} for row in rows]
+
+
+def user_etag(request: Request, user_id: int, db: Session) -> Optional[str]:
+    """
+    Weak ETag for a per-user read endpoint
+
+    Built from the user's data_version, the request URL and the current time
+    bucket, so it costs one primary-key lookup instead of the endpoint's
+    queries. Returns None for unknown users.
+    """
+    version = db.scalar(select(User.data_version).where(User.id == user_id))
+    if version is None:
+        return None
+
+    bucket = int(time.time() // ETAG_TIME_BUCKET_SECONDS)
+    url_hash = hashlib.blake2s(str(request.url).encode(), digest_size=8).hexdigest()
+    return f'W/"{user_id}-{version}-{bucket}-{url_hash}"'
+
+
+def not_modified(request: Request, etag: Optional[str]) -> Optional[Response]:
+    """304 response if the client's If-None-Match already has this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not etag or not if_none_match:
+        return None
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    if etag in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+
+def set_etag(response: Response, etag: Optional[str]):
+    """Attach the ETag and ask clients to revalidate before reusing"""
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+
+
+def batch_results(ids: List[int], done_ids, done_status: str) -> dict:
+    """Per-id outcome of a set-based batch statement, in request order (ids unique)"""
+    ids = list(dict.fromkeys(ids))
+    done_ids = set(done_ids)
+    results = [
+        {"id": item_id, "status": done_status if item_id in done_ids else "not_found"}
+        for item_id in ids
+    ]
+    return {
+        "requested": len(ids),
+        "succeeded": sum(1 for result in results if result["status"] == done_status),
+        "results": results
+    }
 
 
 # Health check endpoint
@@ -133,6 +465,47 @@ async def root():
     }
 
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once this worker has started and warmed up
+
+    Unlike "/", answers 503 while starting or shutting down so load
+    balancers only route to warm workers.
+    """
+    if not readiness['ready']:
+        return JSONResponse(status_code=503, content={"status": "starting", "pid": os.getpid()})
+    return {"status": "ready", "pid": os.getpid(), "warmup": readiness['warmup']}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str, request: Request):
+    """
+    Download a request profile in collapsed stack format
+
+    Args:
+        profile_id: X-Profile-Id of the profiled response
+
+    Returns:
+        "frame;frame;frame count" lines for flamegraph.pl / speedscope
+    """
+    if not request_profiler.token_valid(request.headers.get(request_profiler.TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+    path = request_profiler.profile_path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    with open(path, encoding="utf-8") as f:
+        return PlainTextResponse(f.read())
+
+
 # ==================== USER ENDPOINTS ====================
 
 @app.post("/api/users/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -190,32 +563,77 @@ async def get_user_by_email(email: str, db: Session = Depends(get_db)):
 @app.get("/api/items/{user_id}", response_model=List[FoodItemResponse])
 async def get_user_items(
     user_id: int,
+    request: Request,
     include_consumed: bool = False,
+    category: Optional[str] = None,
+    urgency: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
     """
-    Get all food items for a user
+    Get food items for a user, one page at a time
+
+    Items are ordered by (expiration_date, id). When more items exist, the
+    X-Next-Cursor response header holds the cursor for the next page.
 
     Args:
         user_id: User ID
         include_consumed: Include consumed items (default: False)
+        category: Only items of this category
+        urgency: Comma-separated urgency levels (e.g. "expired,today,urgent")
+        fields: Comma-separated response fields to return (default: all)
+        cursor: X-Next-Cursor value from the previous page
+        limit: Page size
         db: Database session
 
     Returns:
         List of food items
     """
-    query = db.query(FoodItem).filter(FoodItem.user_id == user_id)
+    projection = parse_fields(fields, FoodItemResponse)
+
+    etag = user_etag(request, user_id, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    column_names = row_columns(FoodItem, FoodItemResponse, projection, required=("id", "expiration_date"))
+    query = select(*[FoodItem.__table__.c[name] for name in column_names]).where(FoodItem.user_id == user_id)
 
     if not include_consumed:
-        query = query.filter(FoodItem.is_consumed == 0)
+        query = query.where(FoodItem.is_consumed == 0)
+
+    if category:
+        query = query.where(FoodItem.category == category)
+
+    if urgency:
+        levels = [level.strip() for level in urgency.split(",") if level.strip()]
+        unknown = [level for level in levels if level not in URGENCY_DAY_RANGES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown urgency levels: {', '.join(unknown)}")
+        query = query.where(FoodItem.urgency_level.in_(levels))
+
+    if cursor:
+        after_date, after_id = decode_cursor(cursor)
+        query = query.where(tuple_(FoodItem.expiration_date, FoodItem.id) > tuple_(after_date, after_id))
+
+    # Plain tuples, no ORM identity map or per-row model validation
+    rows = db.execute(query.order_by(FoodItem.expiration_date, FoodItem.id).limit(limit + 1)).all()
+
+    response = FastJSONResponse(food_item_dicts(rows[:limit], column_names, projection))
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        response.headers["X-Next-Cursor"] = encode_cursor(last["expiration_date"], last["id"])
+    set_etag(response, etag)
 
-    items = query.order_by(FoodItem.expiration_date).all()
-    return items
+    return response
 
 
 @app.get("/api/items/expiring/{user_id}", response_model=List[FoodItemResponse])
 async def get_expiring_items(
     user_id: int,
+    request: Request,
     days: int = 3,
     db: Session = Depends(get_db)
 ):
@@ -230,15 +648,25 @@ async def get_expiring_items(
     Returns:
         List of items expiring within specified days
     """
-    threshold_date = datetime.now() + timedelta(days=days)
-
-    items = db.query(FoodItem).filter(
-        FoodItem.user_id == user_id,
-        FoodItem.is_consumed == 0,
-        FoodItem.expiration_date <= threshold_date
-    ).order_by(FoodItem.expiration_date).all()
+    etag = user_etag(request, user_id, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    threshold_date = expiry_now() + timedelta(days=days)
+
+    column_names = row_columns(FoodItem, FoodItemResponse, None)
+    rows = db.execute(
+        select(*[FoodItem.__table__.c[name] for name in column_names]).where(
+            FoodItem.user_id == user_id,
+            FoodItem.is_consumed == 0,
+            FoodItem.expiration_date <= threshold_date
+        ).order_by(FoodItem.expiration_date)
+    ).all()
 
-    return items
+    response = FastJSONResponse(food_item_dicts(rows, column_names))
+    set_etag(response, etag)
+    return response
 
 
 @app.post("/api/items/{user_id}", response_model=FoodItemResponse, status_code=status.HTTP_201_CREATED)
@@ -270,7 +698,8 @@ async def add_food_item(
         category=item.category,
         quantity=item.quantity,
         quantity_unit=item.quantity_unit,
-        expiration_date=item.expiration_date
+        expiration_date=item.expiration_date,
+        sync_version=bump_data_version(db, user_id)
     )
 
     db.add(food_item)
@@ -280,6 +709,70 @@ async def add_food_item(
     return food_item
 
 
+@app.post("/api/items/{user_id}/batch", response_model=List[FoodItemResponse], status_code=status.HTTP_201_CREATED)
+async def add_food_items_batch(
+    user_id: int,
+    batch: FoodItemBatchCreate,
+    db: Session = Depends(get_db)
+):
+    """
+    Add many food items with one multi-row INSERT
+
+    Args:
+        user_id: User ID
+        batch: Food items to add
+        db: Database session
+
+    Returns:
+        Created food items, in request order
+    """
+    if not db.query(User.id).filter(User.id == user_id).first():
+        raise HTTPException(status_code=404, detail="User not found")
+
+    version = bump_data_version(db, user_id)
+    rows = [{"user_id": user_id, "sync_version": version, **item.model_dump()} for item in batch.items]
+    food_items = db.scalars(
+        insert(FoodItem).returning(FoodItem, sort_by_parameter_order=True),
+        rows
+    ).all()
+    db.commit()
+
+    return food_items
+
+
+@app.put("/api/items/{user_id}/batch/consume", response_model=BatchResult)
+async def mark_items_consumed_batch(user_id: int, batch: BatchIds, db: Session = Depends(get_db)):
+    """
+    Mark many of a user's items as consumed with one UPDATE
+
+    Ids that don't exist or belong to another user come back as not_found.
+    """
+    consumed_ids = db.scalars(
+        update(FoodItem)
+        .where(FoodItem.user_id == user_id, FoodItem.id.in_(batch.ids))
+        .values(is_consumed=1, sync_version=next_data_version(FoodItem.user_id))
+        .returning(FoodItem.id),
+        execution_options={"synchronize_session": False}
+    ).all()
+    db.commit()
+
+    return batch_results(batch.ids, consumed_ids, "consumed")
+
+
+@app.post("/api/items/{user_id}/batch/delete", response_model=BatchResult)
+async def delete_items_batch(user_id: int, batch: BatchIds, db: Session = Depends(get_db)):
+    """Delete many of a user's items with one DELETE"""
+    deleted_ids = db.scalars(
+        delete(FoodItem)
+        .where(FoodItem.user_id == user_id, FoodItem.id.in_(batch.ids))
+        .returning(FoodItem.id),
+        execution_options={"synchronize_session": False}
+    ).all()
+    db.commit()
+
+    return batch_results(batch.ids, deleted_ids, "deleted")
+
+
 @app.put("/api/items/consume/{item_id}")
 async def mark_item_consumed(item_id: int, db: Session = Depends(get_db)):
     """
@@ -292,24 +785,35 @@ async def mark_item_consumed(item_id: int, db: Session = Depends(get_db)):
     Returns:
         Success message
     """
-    item = db.query(FoodItem).filter(FoodItem.id == item_id).first()
-    if not item:
+    # One UPDATE ... RETURNING: no SELECT round trip, no lost-update race;
+    # the food_items_bump_data_version trigger bumps the user's version
+    row = db.execute(
+        update(FoodItem)
+        .where(FoodItem.id == item_id)
+        .values(is_consumed=1, sync_version=next_data_version(FoodItem.user_id))
+        .returning(FoodItem.food_name),
+        execution_options={"synchronize_session": False}
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    item.is_consumed = 1
     db.commit()
 
-    return {"message": f"Item '{item.food_name}' marked as consumed"}
+    return {"message": f"Item '{row.food_name}' marked as consumed"}
 
 
 @app.delete("/api/items/{item_id}")
 async def delete_item(item_id: int, db: Session = Depends(get_db)):
     """Delete a food item"""
-    item = db.query(FoodItem).filter(FoodItem.id == item_id).first()
-    if not item:
+    # The food_items_tombstone trigger bumps the version and records the
+    # tombstone as part of this DELETE
+    user_id = db.scalar(
+        delete(FoodItem).where(FoodItem.id == item_id).returning(FoodItem.user_id),
+        execution_options={"synchronize_session": False}
+    )
+    if user_id is None:
         raise HTTPException(status_code=404, detail="Item not found")
 
-    db.delete(item)
     db.commit()
 
     return {"message": "Item deleted successfully"}
@@ -320,6 +824,8 @@ async def delete_item(item_id: int, db: Session = Depends(get_db)):
 @app.get("/api/recipes/recommend/{user_id}", response_model=List[RecipeResponse])
 async def recommend_recipes(
     user_id: int,
+    request: Request,
+    response: Response,
     limit: int = 5,
     db: Session = Depends(get_db)
 ):
@@ -334,6 +840,28 @@ async def recommend_recipes(
     Returns:
         List of recommended recipes with match rates
     """
+    etag = user_etag(request, user_id, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
+
+    # The ETag covers URL, data version and time bucket, so it identifies
+    # requests that must get the same answer
+    return await recipe_flights.run(etag, compute_recipe_recommendations, user_id, limit)
+
+
+def compute_recipe_recommendations(user_id: int, limit: int) -> List[RecipeResponse]:
+    """Score every recipe against the user's ingredients (blocking, own session)"""
+    db = SessionLocal()
+    try:
+        return score_recipes(db, user_id, limit)
+    finally:
+        db.close()
+
+
+def score_recipes(db: Session, user_id: int, limit: int) -> List[RecipeResponse]:
+    """Top recipes by ingredient match, boosted when they use urgent items"""
     # Get user's available ingredients
     user_items = db.query(FoodItem).filter(
         FoodItem.user_id == user_id,
@@ -348,17 +876,17 @@ async def recommend_recipes(
         if item.days_left is not None and item.days_left <= 3
     ]
 
-    # Get all recipes
-    recipes = db.query(Recipe).all()
+    # All recipes, parsed once per worker (see reference_data.py)
+    recipes = recipe_index.get(db)
+    user_ingredient_set = set(user_ingredients)
 
     # Calculate match rate for each recipe
     scored_recipes = []
     for recipe in recipes:
-        import json
-        recipe_ingredients = json.loads(recipe.ingredients) if recipe.ingredients else []
+        recipe_ingredients = recipe.ingredient_list
 
         # Calculate match
-        matched = len(set(user_ingredients) & set(recipe_ingredients))
+        matched = len(user_ingredient_set & recipe.ingredient_set)
         total = len(recipe_ingredients)
 
         if total == 0:
@@ -371,7 +899,7 @@ async def recommend_recipes(
         score = match_rate * (1.5 if uses_urgent else 1.0)
 
         # Find missing ingredients
-        missing = list(set(recipe_ingredients) - set(user_ingredients))
+        missing = list(recipe.ingredient_set - user_ingredient_set)
 
         recipe_dict = RecipeResponse(
             id=recipe.id,
@@ -399,17 +927,52 @@ async def recommend_recipes(
 @app.get("/api/shopping/{user_id}", response_model=List[ShoppingListItemResponse])
 async def get_shopping_list(
     user_id: int,
+    request: Request,
     include_purchased: bool = False,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
-    """Get user's shopping list"""
-    query = db.query(ShoppingListItem).filter(ShoppingListItem.user_id == user_id)
+    """
+    Get user's shopping list, newest first, one page at a time
+
+    Items are ordered by (created_at, id) descending; X-Next-Cursor holds
+    the cursor for the next page when more items exist.
+    """
+    projection = parse_fields(fields, ShoppingListItemResponse)
+
+    etag = user_etag(request, user_id, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    column_names = row_columns(ShoppingListItem, ShoppingListItemResponse, projection, required=("id", "created_at"))
+    query = select(*[ShoppingListItem.__table__.c[name] for name in column_names]).where(
+        ShoppingListItem.user_id == user_id
+    )
 
     if not include_purchased:
-        query = query.filter(ShoppingListItem.is_purchased == 0)
+        query = query.where(ShoppingListItem.is_purchased == 0)
+
+    if cursor:
+        before_created, before_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(ShoppingListItem.created_at, ShoppingListItem.id) < tuple_(before_created, before_id)
+        )
+
+    rows = db.execute(
+        query.order_by(ShoppingListItem.created_at.desc(), ShoppingListItem.id.desc()).limit(limit + 1)
+    ).all()
+
+    fields = projection or list(ShoppingListItemResponse.model_fields)
+    response = FastJSONResponse(plain_dicts(rows[:limit], column_names, fields))
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        response.headers["X-Next-Cursor"] = encode_cursor(last["created_at"], last["id"])
+    set_etag(response, etag)
 
-    items = query.order_by(ShoppingListItem.created_at.desc()).all()
-    return items
+    return response
 
 
 @app.post("/api/shopping/{user_id}", response_model=ShoppingListItemResponse, status_code=status.HTTP_201_CREATED)
@@ -424,7 +987,9 @@ async def add_to_shopping_list(
         item_name=item.item_name,
         quantity=item.quantity,
         quantity_unit=item.quantity_unit,
-        reason=item.reason
+        reason=item.reason,
+        # Unknown users have no version to bump
+        sync_version=bump_data_version(db, user_id) or 0
     )
 
     db.add(shopping_item)
@@ -434,63 +999,91 @@ async def add_to_shopping_list(
     return shopping_item
 
 
+@app.post("/api/shopping/{user_id}/batch", response_model=List[ShoppingListItemResponse],
+          status_code=status.HTTP_201_CREATED)
+async def add_to_shopping_list_batch(
+    user_id: int,
+    batch: ShoppingListBatchCreate,
+    db: Session = Depends(get_db)
+):
+    """Add many items to the shopping list with one multi-row INSERT"""
+    version = bump_data_version(db, user_id) or 0
+    rows = [{"user_id": user_id, "sync_version": version, **item.model_dump()} for item in batch.items]
+    shopping_items = db.scalars(
+        insert(ShoppingListItem).returning(ShoppingListItem, sort_by_parameter_order=True),
+        rows
+    ).all()
+    db.commit()
+
+    return shopping_items
+
+
+@app.put("/api/shopping/{user_id}/batch/purchase", response_model=BatchResult)
+async def mark_purchased_batch(user_id: int, batch: BatchIds, db: Session = Depends(get_db)):
+    """Mark many of a user's shopping items as purchased with one UPDATE"""
+    purchased_ids = db.scalars(
+        update(ShoppingListItem)
+        .where(ShoppingListItem.user_id == user_id, ShoppingListItem.id.in_(batch.ids))
+        .values(is_purchased=1, sync_version=next_data_version(ShoppingListItem.user_id))
+        .returning(ShoppingListItem.id),
+        execution_options={"synchronize_session": False}
+    ).all()
+    db.commit()
+
+    return batch_results(batch.ids, purchased_ids, "purchased")
+
+
 @app.put("/api/shopping/purchase/{item_id}")
 async def mark_purchased(item_id: int, db: Session = Depends(get_db)):
     """Mark shopping item as purchased"""
-    item = db.query(ShoppingListItem).filter(ShoppingListItem.id == item_id).first()
-    if not item:
+    row = db.execute(
+        update(ShoppingListItem)
+        .where(ShoppingListItem.id == item_id)
+        .values(is_purchased=1, sync_version=next_data_version(ShoppingListItem.user_id))
+        .returning(ShoppingListItem.item_name),
+        execution_options={"synchronize_session": False}
+    ).first()
+    if row is None:
         raise HTTPException(status_code=404, detail="Shopping item not found")
 
-    item.is_purchased = 1
     db.commit()
 
-    return {"message": f"'{item.item_name}' marked as purchased"}
+    return {"message": f"'{row.item_name}' marked as purchased"}
 
 
 # ==================== STATS ENDPOINTS ====================
 
 @app.get("/api/stats/{user_id}")
-async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
+async def get_user_stats(user_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Get user statistics
 
     Returns:
         Statistics about user's food inventory
     """
-    # Total items
-    total_items = db.query(FoodItem).filter(
-        FoodItem.user_id == user_id,
-        FoodItem.is_consumed == 0
-    ).count()
+    etag = user_etag(request, user_id, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    set_etag(response, etag)
 
-    # Items expiring today
-    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_end = today_start + timedelta(days=1)
-    expiring_today = db.query(FoodItem).filter(
-        FoodItem.user_id == user_id,
-        FoodItem.is_consumed == 0,
-        FoodItem.expiration_date >= today_start,
-        FoodItem.expiration_date < today_end
-    ).count()
-
-    # Items expiring within 3 days
-    three_days = datetime.now() + timedelta(days=3)
-    expiring_soon = db.query(FoodItem).filter(
-        FoodItem.user_id == user_id,
-        FoodItem.is_consumed == 0,
-        FoodItem.expiration_date <= three_days
-    ).count()
+    return await stats_flights.run(etag, compute_user_stats, user_id)
 
-    # Fresh items (more than 7 days)
-    seven_days = datetime.now() + timedelta(days=7)
-    fresh_items = db.query(FoodItem).filter(
-        FoodItem.user_id == user_id,
-        FoodItem.is_consumed == 0,
-        FoodItem.expiration_date > seven_days
-    ).count()
+
+def compute_user_stats(user_id: int) -> dict:
+    """Inventory statistics for a user (blocking, own session)"""
+    db = SessionLocal()
+    try:
+        return collect_user_stats(db, user_id)
+    finally:
+        db.close()
+
+
+def collect_user_stats(db: Session, user_id: int, now: Optional[datetime] = None) -> dict:
+    """Expiry counts (as of now) and category breakdown of unconsumed items"""
+    stats = count_stats(db, user_id, now or expiry_now())
 
     # Category breakdown
-    from sqlalchemy import func
     category_stats = db.query(
         FoodItem.category,
         func.count(FoodItem.id).label('count')
@@ -502,14 +1095,305 @@ async def get_user_stats(user_id: int, db: Session = Depends(get_db)):
     category_breakdown = {cat: count for cat, count in category_stats}
 
     return {
-        "total_items": total_items,
-        "expiring_today": expiring_today,
-        "expiring_within_3_days": expiring_soon,
-        "fresh_items": fresh_items,
+        **stats,
+        "category_breakdown": category_breakdown
+    }
+
+
+def stats_boundaries(now: datetime) -> dict:
+    """
+    expiration_date boundaries of the inventory counts, from one clock read
+
+        expiring_today          start of today <= expiration_date < start of tomorrow
+        expiring_within_3_days  expiration_date <= now + 3 days (expired included)
+        fresh_items             expiration_date > now + 7 days
+    """
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "today_start": today_start,
+        "today_end": today_start + timedelta(days=1),
+        "soon": now + timedelta(days=3),
+        "fresh": now + timedelta(days=7)
+    }
+
+
+def count_stats(db: Session, user_id: int, now: datetime) -> dict:
+    """Inventory counts of unconsumed items"""
+    # All counts in one pass; the predicates only read expiration_date, so
+    # SQLite answers them from the expiry index
+    bounds = stats_boundaries(now)
+    expiry = FoodItem.expiration_date
+
+    def count_where(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    total, today, soon, fresh = db.execute(
+        select(
+            func.count(),
+            count_where(and_(expiry >= bounds["today_start"], expiry < bounds["today_end"])),
+            count_where(expiry <= bounds["soon"]),
+            count_where(expiry > bounds["fresh"])
+        ).where(
+            FoodItem.user_id == user_id,
+            FoodItem.is_consumed == 0
+        )
+    ).one()
+    return {
+        "total_items": total,
+        "expiring_today": today,
+        "expiring_within_3_days": soon,
+        "fresh_items": fresh
+    }
+
+
+@app.get("/api/dashboard/{user_id}", response_model=DashboardResponse)
+async def get_dashboard(
+    user_id: int,
+    request: Request,
+    days: int = 3,
+    db: Session = Depends(get_db)
+):
+    """
+    Everything the dashboard screen shows, in one request
+
+    Same numbers as /api/stats plus the /api/items/expiring list. The
+    counts and the category breakdown are aggregated in SQL; only the
+    urgent rows are loaded.
+
+    Args:
+        user_id: User ID
+        days: Urgent list threshold in days (default: 3)
+        db: Database session
+
+    Returns:
+        Stats, urgent items and category breakdown
+    """
+    etag = user_etag(request, user_id, db)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+
+    # One clock read for days_left, the counts and the urgent list, so the
+    # list and expiring_within_3_days agree
+    now = expiry_now()
+    stats = collect_user_stats(db, user_id, now)
+    category_breakdown = stats.pop("category_breakdown")
+
+    column_names = row_columns(FoodItem, FoodItemResponse, None)
+    rows = db.execute(
+        select(*[FoodItem.__table__.c[name] for name in column_names]).where(
+            FoodItem.user_id == user_id,
+            FoodItem.is_consumed == 0,
+            FoodItem.expiration_date <= now + timedelta(days=days)
+        ).order_by(FoodItem.expiration_date, FoodItem.id)
+    ).all()
+
+    response = FastJSONResponse({
+        "stats": stats,
+        "urgent_items": food_item_dicts(rows, column_names, now=now),
         "category_breakdown": category_breakdown
+    })
+    set_etag(response, etag)
+    return response
+
+
+# ==================== SYNC ENDPOINTS ====================
+
+@app.get("/api/sync/{user_id}", response_model=SyncResponse)
+async def sync_changes(
+    user_id: int,
+    since: Optional[int] = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Rows changed since a cursor, for clients that keep a local copy
+
+    Without `since` (or with a cursor from another database, or one older
+    than TOMBSTONE_RETENTION_DAYS whose deletions have been pruned) this is
+    a full sync: all unconsumed items and the whole shopping list, with
+    `full` set so the client replaces its copy. Otherwise it
+    returns the items and shopping entries created, updated, consumed or
+    purchased after the cursor, plus the ids deleted after it. Pass the
+    returned cursor as `since` next time. Rows may be repeated across syncs
+    but are never skipped.
+
+    Args:
+        user_id: User ID
+        since: Cursor returned by the previous sync
+        db: Database session
+
+    Returns:
+        New cursor, changed rows and deleted ids
+    """
+    changes = load_changes(db, user_id, since)
+    if changes is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return changes
+
+
+def load_changes(db: Session, user_id: int, since: Optional[int]) -> Optional[dict]:
+    """
+    Sync payload for a user (see sync_changes); None for unknown users
+    """
+    # Read the cursor first: anything committed after this is either in
+    # this response or in the next one
+    user = db.execute(
+        select(User.data_version, User.tombstones_pruned_version).where(User.id == user_id)
+    ).first()
+    if user is None:
+        return None
+    cursor, pruned_version = user
+
+    full = since is None or since > cursor or since < pruned_version
+
+    items_query = db.query(FoodItem).filter(FoodItem.user_id == user_id)
+    shopping_query = db.query(ShoppingListItem).filter(ShoppingListItem.user_id == user_id)
+
+    deleted = {"items": [], "shopping_items": []}
+    if full:
+        items_query = items_query.filter(FoodItem.is_consumed == 0)
+    else:
+        items_query = items_query.filter(FoodItem.sync_version > since)
+        shopping_query = shopping_query.filter(ShoppingListItem.sync_version > since)
+
+        tombstones = db.query(SyncTombstone.item_type, SyncTombstone.item_id).filter(
+            SyncTombstone.user_id == user_id,
+            SyncTombstone.sync_version > since
+        ).all()
+        for item_type, item_id in tombstones:
+            deleted["items" if item_type == "food_item" else "shopping_items"].append(item_id)
+
+    return {
+        "cursor": cursor,
+        "full": full,
+        "items": items_query.order_by(FoodItem.sync_version, FoodItem.id).all(),
+        "shopping_items": shopping_query.order_by(ShoppingListItem.sync_version, ShoppingListItem.id).all(),
+        "deleted": deleted
     }
 
 
+def prune_expired_tombstones() -> int:
+    """Scheduler job: drop tombstones older than TOMBSTONE_RETENTION_DAYS"""
+    db = SessionLocal()
+    try:
+        pruned = prune_tombstones(db, datetime.utcnow() - timedelta(days=TOMBSTONE_RETENTION_DAYS))
+    finally:
+        db.close()
+    if pruned:
+        print(f"🧹 Pruned {pruned} sync tombstones older than {TOMBSTONE_RETENTION_DAYS:g} days")
+    return pruned
+
+
+# Every worker runs the job; pruning is idempotent and uses the deleted_at index
+maintenance_scheduler = BackgroundScheduler()
+maintenance_scheduler.add_job(
+    prune_expired_tombstones,
+    'interval',
+    minutes=TOMBSTONE_PRUNE_INTERVAL_MINUTES,
+    id='prune_tombstones',
+    next_run_time=datetime.now(),
+    max_instances=1,
+    coalesce=True
+)
+
+
+# ==================== PUSH EVENTS ====================
+
+def load_data_versions(user_ids) -> dict:
+    """Current data_version of each existing user in user_ids"""
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(User.id, User.data_version).where(User.id.in_(list(user_ids)))).all()
+        return {user_id: version for user_id, version in rows}
+    finally:
+        db.close()
+
+
+def load_change_event(user_id: int, since: Optional[int]) -> dict:
+    """JSON-ready sync payload, used as the body of a change event"""
+    db = SessionLocal()
+    try:
+        changes = load_changes(db, user_id, since)
+        return SyncResponse.model_validate(changes).model_dump(mode="json")
+    finally:
+        db.close()
+
+
+event_hub = EventHub(load_data_versions, load_change_event, poll_interval=EVENTS_POLL_INTERVAL_SECONDS)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def notify_event_hub(session):
+    """Push this worker's own writes without waiting for the next poll"""
+    event_hub.poke()
+
+
+def format_sse(event_name: str, data: dict, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_name}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+@app.get("/api/events/{user_id}")
+async def stream_events(
+    user_id: int,
+    request: Request,
+    since: Optional[int] = Query(None, ge=0)
+):
+    """
+    Server-sent events with the user's inventory and shopping list changes
+
+    Emits a `hello` event with the current cursor, then a `change` event
+    (same body as /api/sync) whenever data changes - via this API, another
+    worker, receipt OCR or the email monitor. With `since` or a
+    Last-Event-ID header (sent by EventSource on reconnect) the stream
+    starts with the changes the client missed.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+
+    versions = await asyncio.to_thread(load_data_versions, [user_id])
+    if user_id not in versions:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Subscribe before catching up so nothing committed in between is lost
+    queue = await event_hub.subscribe(user_id)
+    cursor = event_hub.channel_version(user_id)
+
+    async def stream():
+        try:
+            yield format_sse("hello", {"cursor": cursor})
+
+            if since is not None and since != cursor:
+                catch_up = await asyncio.to_thread(load_change_event, user_id, since)
+                yield format_sse("change", catch_up, catch_up["cursor"])
+
+            while True:
+                try:
+                    change = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+
+                if change is None:
+                    break
+                yield format_sse("change", change, change["cursor"])
+        finally:
+            event_hub.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 # ==================== RECEIPT UPLOAD ENDPOINT ====================
 
 @app.post("/api/receipt/upload/{user_id}")
@@ -540,24 +1424,26 @@ async def upload_receipt(
 
     try:
         # Save uploaded file temporarily
-        import tempfile
-        import shutil
-        from ocr_service import ReceiptOCRService
-
-        # Create temp file
         suffix = os.path.splitext(file.filename)[1] if file.filename else '.jpg'
         with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
             shutil.copyfileobj(file.file, temp_file)
             temp_path = temp_file.name
 
-        # Process receipt with OCR
+        # Process receipt with OCR on the interactive lane of the shared
+        # scheduler, ahead of any queued email/backfill work
         ocr_service = ReceiptOCRService()
-        extracted_items = ocr_service.process_receipt_image(temp_path)
-
-        # Clean up temp file
-        os.unlink(temp_path)
-
-        # Add items to database with estimated expiration dates
+        try:
+            extracted_items = await asyncio.wrap_future(
+                get_ocr_scheduler().submit(INTERACTIVE, ocr_service.process_receipt_image, temp_path)
+            )
+        finally:
+            # Clean up temp file
+            os.unlink(temp_path)
+
+        # Add items to database with estimated expiration dates. A receipt
+        # with no recognised items changes nothing, so the data version (and
+        # every ETag built from it) stays put
+        version = bump_data_version(db, user_id) if extracted_items else None
         added_items = []
         for item_data in extracted_items:
             # Get shelf life for this food
@@ -580,7 +1466,8 @@ async def upload_receipt(
                 expiration_date=expiration_date,
                 quantity=item_data['quantity'],
                 price=item_data.get('total_price'),
-                storage_location='refrigerator'
+                storage_location='refrigerator',
+                sync_version=version
             )
 
             db.add(food_item)
@@ -619,13 +1506,10 @@ def get_shelf_life_for_item(food_name: str, category: str, db: Session) -> int:
     Returns:
         Estimated shelf life in days
     """
-    # Try to find in database
-    shelf_life = db.query(FoodShelfLife).filter(
-        FoodShelfLife.food_name_cn.ilike(f"%{food_name}%")
-    ).first()
-
-    if shelf_life and shelf_life.refrigerator_max:
-        return shelf_life.refrigerator_max
+    # Try to find in the shelf-life table (cached per worker)
+    refrigerator_days = shelf_life_index.refrigerator_days(food_name, db)
+    if refrigerator_days:
+        return refrigerator_days
 
     # Default shelf life by category (refrigerated)
     default_shelf_life = {
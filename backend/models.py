@@ -1,12 +1,116 @@
 """
 Database models for FreshTrack application
 """
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey, Text
+from sqlalchemy import (
+    Column, Integer, String, DateTime, Float, ForeignKey, Text, Index, and_, case, delete, func, insert, or_,
+    select, update
+)
+from sqlalchemy.ext.hybrid import Comparator, hybrid_property
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, timedelta
 from database import Base
 
 
+# Urgency levels and the [min, max) days_left range each one covers
+URGENCY_DAY_RANGES = {
+    "expired": (None, 0),
+    "today": (0, 1),
+    "urgent": (1, 4),
+    "warning": (4, 8),
+    "fresh": (8, None),
+}
+
+
+def expiry_now() -> datetime:
+    """
+    The clock expiration dates are compared against
+
+    Expiration dates are naive local times (the web UI's date input,
+    receipt purchase_date = datetime.now()), so days_left, urgency_level,
+    the dashboard counts and the expiring lists all read local time here.
+    """
+    return datetime.now()
+
+
+def urgency_for_days(days: int) -> str:
+    """Urgency level for a days_left value"""
+    if days < 0:
+        return "expired"
+    elif days == 0:
+        return "today"
+    elif days <= 3:
+        return "urgent"
+    elif days <= 7:
+        return "warning"
+    else:
+        return "fresh"
+
+
+class DaysLeftComparator(Comparator):
+    """
+    SQL side of FoodItem.days_left
+
+    days_left is floor((expiration_date - now) / 1 day), so every comparison
+    becomes a range on expiration_date and can use the expiry index instead
+    of computing a value per row.
+    """
+
+    def __init__(self, expiration_date, now: datetime = None):
+        self.expiration_date = expiration_date
+        self.now = now or expiry_now()
+        super().__init__(expiration_date)
+
+    def _boundary(self, days: int):
+        return self.now + timedelta(days=days)
+
+    def __ge__(self, days):
+        return self.expiration_date >= self._boundary(days)
+
+    def __gt__(self, days):
+        return self.expiration_date >= self._boundary(days + 1)
+
+    def __lt__(self, days):
+        return self.expiration_date < self._boundary(days)
+
+    def __le__(self, days):
+        return self.expiration_date < self._boundary(days + 1)
+
+    def __eq__(self, days):
+        return and_(self >= days, self < days + 1)
+
+    def between_days(self, min_days, max_days):
+        """min_days <= days_left < max_days, either bound optional"""
+        conditions = []
+        if min_days is not None:
+            conditions.append(self >= min_days)
+        if max_days is not None:
+            conditions.append(self < max_days)
+        return and_(*conditions)
+
+
+class UrgencyComparator(Comparator):
+    """
+    SQL side of FoodItem.urgency_level
+
+    Used as a value (select/group_by) it is a CASE over expiration_date;
+    == and in_() compile to expiration_date ranges.
+    """
+
+    def __init__(self, expiration_date):
+        self.days_left = DaysLeftComparator(expiration_date)
+        whens = [
+            (self.days_left.between_days(min_days, max_days), level)
+            for level, (min_days, max_days) in URGENCY_DAY_RANGES.items()
+        ]
+        super().__init__(case(*whens, else_="unknown"))
+
+    def __eq__(self, level):
+        return self.days_left.between_days(*URGENCY_DAY_RANGES[level])
+
+    def in_(self, levels):
+        return or_(*[self == level for level in levels])
+
+
 class User(Base):
     """User model for storing user information"""
     __tablename__ = "users"
@@ -15,6 +119,11 @@ class User(Base):
     email = Column(String(255), unique=True, index=True, nullable=False)
     username = Column(String(100))
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped on every change to the user's items or shopping list (ETags)
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Highest sync_version among this user's pruned tombstones; a sync from
+    # an older cursor can't list all deletions and must be a full sync
+    tombstones_pruned_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship with food items
     food_items = relationship("FoodItem", back_populates="owner")
@@ -38,34 +147,45 @@ class FoodItem(Base):
     storage_location = Column(String(50), default="refrigerator")  # pantry/refrigerator/freezer
     is_consumed = Column(Integer, default=0)  # 0=未吃完, 1=已吃完
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # User.data_version of the last change to this row (delta sync cursor)
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship with user
     owner = relationship("User", back_populates="food_items")
 
-    @property
+    # Serves the per-user inventory listings ordered by expiration date
+    # (current items, and whole history with include_consumed), and delta
+    # sync by version
+    __table_args__ = (
+        Index("ix_food_items_user_consumed_expiry", "user_id", "is_consumed", "expiration_date", "id"),
+        Index("ix_food_items_user_expiry", "user_id", "expiration_date", "id"),
+        Index("ix_food_items_user_sync_version", "user_id", "sync_version"),
+    )
+
+    @hybrid_property
     def days_left(self):
         """Calculate days left until expiration"""
         if self.expiration_date:
-            delta = self.expiration_date - datetime.utcnow()
+            delta = self.expiration_date - expiry_now()
             return delta.days
         return None
 
-    @property
+    @days_left.comparator
+    def days_left(cls):
+        return DaysLeftComparator(cls.expiration_date)
+
+    @hybrid_property
     def urgency_level(self):
-        """Get urgency level: expired/urgent/warning/fresh"""
+        """Get urgency level: expired/today/urgent/warning/fresh"""
         days = self.days_left
         if days is None:
             return "unknown"
-        if days < 0:
-            return "expired"
-        elif days == 0:
-            return "today"
-        elif days <= 3:
-            return "urgent"
-        elif days <= 7:
-            return "warning"
-        else:
-            return "fresh"
+        return urgency_for_days(days)
+
+    @urgency_level.comparator
+    def urgency_level(cls):
+        return UrgencyComparator(cls.expiration_date)
 
 
 class FoodShelfLife(Base):
@@ -119,6 +239,125 @@ class ShoppingListItem(Base):
     is_purchased = Column(Integer, default=0)  # 0=待购买, 1=已购买
     reason = Column(String(200))  # e.g., "番茄炒蛋需要"
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # User.data_version of the last change to this row (delta sync cursor)
+    sync_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship with user
     owner = relationship("User", back_populates="shopping_items")
+
+    # Serves the per-user shopping list ordered by creation time (open
+    # items, and whole history with include_purchased), and delta sync by
+    # version
+    __table_args__ = (
+        Index("ix_shopping_list_user_purchased_created", "user_id", "is_purchased", "created_at", "id"),
+        Index("ix_shopping_list_user_created", "user_id", "created_at", "id"),
+        Index("ix_shopping_list_user_sync_version", "user_id", "sync_version"),
+    )
+
+
+class SyncTombstone(Base):
+    """Record of a deleted food/shopping item, so delta sync can report it"""
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    item_type = Column(String(20), nullable=False)  # food_item / shopping_item
+    item_id = Column(Integer, nullable=False)
+    sync_version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_version", "user_id", "sync_version"),
+        # Retention pruning (prune_tombstones)
+        Index("ix_sync_tombstones_deleted_at", "deleted_at"),
+    )
+
+
+# Change tracking done by the write statement itself. Tracked UPDATEs stamp
+# sync_version = next_data_version(user_id), and the trigger moves
+# users.data_version up to it. A DELETE bumps the version and records the
+# tombstone. So consume/purchase/delete, single or batch, each stay one
+# statement. Created by database.upgrade_schema().
+CHANGE_TRACKING_TRIGGERS = []
+for _table, _item_type in (("food_items", "food_item"), ("shopping_list", "shopping_item")):
+    CHANGE_TRACKING_TRIGGERS += [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_table}_bump_data_version
+        AFTER UPDATE OF sync_version ON {_table}
+        BEGIN
+            UPDATE users SET data_version = NEW.sync_version
+            WHERE id = NEW.user_id AND data_version < NEW.sync_version;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {_table}_tombstone
+        AFTER DELETE ON {_table}
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id = OLD.user_id;
+            INSERT INTO sync_tombstones (user_id, item_type, item_id, sync_version, deleted_at)
+            SELECT OLD.user_id, '{_item_type}', OLD.id, data_version, strftime('%Y-%m-%d %H:%M:%f', 'now')
+            FROM users WHERE id = OLD.user_id;
+        END
+        """,
+    ]
+Base.metadata.info["sqlite_triggers"] = CHANGE_TRACKING_TRIGGERS
+
+
+def bump_data_version(db, user_id: int):
+    """
+    Mark a user's data as changed
+
+    Runs inside the caller's transaction, so the new version becomes
+    visible together with the change it describes. Rows written in the same
+    transaction carry the returned version in sync_version.
+
+    Returns:
+        The new data version (None for unknown users)
+    """
+    return db.scalar(
+        update(User)
+        .where(User.id == user_id)
+        .values(data_version=User.data_version + 1)
+        .returning(User.data_version),
+        execution_options={"synchronize_session": False}
+    )
+
+
+def prune_tombstones(db, older_than: datetime) -> int:
+    """
+    Delete tombstones recorded before older_than and commit
+
+    Each affected user's tombstones_pruned_version is raised to the newest
+    pruned version first, so /api/sync knows which cursors have lost
+    deletions and answers them with a full sync instead.
+
+    Args:
+        db: Database session
+        older_than: Cutoff (UTC, like deleted_at)
+
+    Returns:
+        Number of tombstones deleted
+    """
+    expired = SyncTombstone.deleted_at < older_than
+    db.execute(
+        update(User)
+        .where(User.id.in_(select(SyncTombstone.user_id).where(expired)))
+        .values(tombstones_pruned_version=select(func.max(SyncTombstone.sync_version))
+                .where(SyncTombstone.user_id == User.id, expired)
+                .scalar_subquery()),
+        execution_options={"synchronize_session": False}
+    )
+    pruned = db.execute(delete(SyncTombstone).where(expired), execution_options={"synchronize_session": False})
+    db.commit()
+    return pruned.rowcount
+
+
+def next_data_version(user_id_column):
+    """
+    SQL expression for the version the next bump_data_version will return
+
+    For UPDATE statements: stamp sync_version with this and the
+    *_bump_data_version trigger bumps the owner's data_version to match.
+    """
+    return select(User.data_version + 1).where(User.id == user_id_column).scalar_subquery()
@@ -0,0 +1,211 @@
+"""
+Shared OCR scheduler with priority classes
+Interactive receipt uploads, email ingestion and bulk backfills all need the
+same CPU. Jobs are queued per priority class and picked highest class first:
+
+    INTERACTIVE  - a user is waiting at the screen (upload_receipt)
+    EMAIL        - background email ingestion
+    BACKFILL     - bulk re-processing
+
+Interactive jobs run on their own threads at normal OS priority. Email and
+backfill jobs share a pool of background threads (one per CPU by default)
+that run at a lower OS priority, so they use the whole machine when nobody
+is waiting but the kernel preempts them as soon as an interactive job -
+in this process or another one on the same host - needs the CPU.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+EMAIL = 1
+BACKFILL = 2
+
+PRIORITY_NAMES = {
+    INTERACTIVE: 'interactive',
+    EMAIL: 'email',
+    BACKFILL: 'backfill'
+}
+
+
+class OCRScheduler:
+    """Priority-aware thread pool for OCR jobs"""
+
+    def __init__(
+        self,
+        interactive_workers: Optional[int] = None,
+        background_workers: Optional[int] = None,
+        class_limits: Optional[Dict[int, int]] = None,
+        background_nice: int = 10
+    ):
+        """
+        Args:
+            interactive_workers: Threads reserved for interactive jobs (default: 2)
+            background_workers: Threads for email/backfill jobs (default: CPU count)
+            class_limits: Max concurrently running jobs per priority class
+            background_nice: OS niceness added to background threads (Linux)
+        """
+        cpu_count = os.cpu_count() or 1
+        self.interactive_workers = 2 if interactive_workers is None else interactive_workers
+        self.background_workers = cpu_count if background_workers is None else background_workers
+        self.background_nice = background_nice
+
+        self.class_limits = {
+            INTERACTIVE: self.interactive_workers,
+            EMAIL: self.background_workers,
+            BACKFILL: self.background_workers
+        }
+        self.class_limits.update(class_limits or {})
+
+        self._queues = {priority: deque() for priority in PRIORITY_NAMES}
+        self._running = {priority: 0 for priority in PRIORITY_NAMES}
+        self._completed = {priority: 0 for priority in PRIORITY_NAMES}
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = []
+
+        for index in range(self.interactive_workers):
+            self._start_worker(f"ocr-interactive-{index}", (INTERACTIVE,), nice=0)
+        for index in range(self.background_workers):
+            self._start_worker(f"ocr-background-{index}", (EMAIL, BACKFILL), nice=background_nice)
+
+    def _start_worker(self, name: str, priorities: tuple, nice: int):
+        thread = threading.Thread(target=self._worker, args=(priorities, nice), name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def submit(self, priority: int, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Queue a job and return a Future for its result
+
+        A new job goes ahead of every queued job of a lower class.
+        """
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown OCR priority: {priority}")
+
+        workers = self.interactive_workers if priority == INTERACTIVE else self.background_workers
+        if workers == 0:
+            raise RuntimeError(f"No OCR workers configured for {PRIORITY_NAMES[priority]} jobs")
+
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("OCR scheduler has been shut down")
+            self._queues[priority].append((future, fn, args, kwargs))
+            self._condition.notify_all()
+        return future
+
+    def _next_job(self, priorities: tuple):
+        """Pop the oldest job of the highest class that is under its limit"""
+        for priority in priorities:
+            if self._queues[priority] and self._running[priority] < self.class_limits[priority]:
+                return priority, self._queues[priority].popleft()
+        return None
+
+    def _worker(self, priorities: tuple, nice: int):
+        if nice:
+            try:
+                # Niceness is per-thread on Linux; child processes such as the
+                # tesseract binary inherit it
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+            except (AttributeError, OSError):
+                pass
+
+        while True:
+            with self._condition:
+                job = self._next_job(priorities)
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._condition.wait()
+                    job = self._next_job(priorities)
+
+                priority, (future, fn, args, kwargs) = job
+                self._running[priority] += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running[priority] -= 1
+                    self._completed[priority] += 1
+                    # A freed class slot may unblock a waiting worker
+                    self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Queued, running and completed job counts per class"""
+        with self._condition:
+            return {
+                name: {
+                    'queued': len(self._queues[priority]),
+                    'running': self._running[priority],
+                    'completed': self._completed[priority],
+                    'limit': self.class_limits[priority]
+                }
+                for priority, name in PRIORITY_NAMES.items()
+            }
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """
+        Stop accepting jobs; workers exit once the queues are drained
+
+        Args:
+            wait: Block until all worker threads have exited
+            cancel_pending: Cancel queued jobs instead of running them
+        """
+        with self._condition:
+            self._shutdown = True
+            if cancel_pending:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft()[0].cancel()
+            self._condition.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+_scheduler: Optional[OCRScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_ocr_scheduler() -> OCRScheduler:
+    """
+    Process-wide scheduler, configured from the environment on first use
+
+    OCR_INTERACTIVE_WORKERS, OCR_BACKGROUND_WORKERS, OCR_EMAIL_LIMIT,
+    OCR_BACKFILL_LIMIT and OCR_BACKGROUND_NICE override the defaults.
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            class_limits = {}
+            if os.getenv("OCR_EMAIL_LIMIT"):
+                class_limits[EMAIL] = int(os.getenv("OCR_EMAIL_LIMIT"))
+            if os.getenv("OCR_BACKFILL_LIMIT"):
+                class_limits[BACKFILL] = int(os.getenv("OCR_BACKFILL_LIMIT"))
+
+            interactive = os.getenv("OCR_INTERACTIVE_WORKERS")
+            background = os.getenv("OCR_BACKGROUND_WORKERS")
+            _scheduler = OCRScheduler(
+                interactive_workers=int(interactive) if interactive else None,
+                background_workers=int(background) if background else None,
+                class_limits=class_limits,
+                background_nice=int(os.getenv("OCR_BACKGROUND_NICE", "10"))
+            )
+            logger.info(f"🧵 OCR scheduler started ({_scheduler.interactive_workers} interactive, "
+                        f"{_scheduler.background_workers} background workers)")
+
+        return _scheduler
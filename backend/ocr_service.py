@@ -1,23 +1,159 @@
 """
 OCR Service for processing receipt images
 Uses Tesseract OCR + OpenCV for image preprocessing
+
+Every receipt is timed stage by stage (decode, grayscale, denoise,
+threshold, tesseract, parse, classify); the timings come back in an
+OCRResult and feed the freshtrack_ocr_* metrics. Results are cached by
+image hash, so a receipt that is uploaded or forwarded twice is only
+recognised once.
+
+OpenCV, numpy and pytesseract are imported on first use (load_libraries()),
+so modules that only hand receipts to this service (email_monitor,
+mailbox_ingest, main) start without them.
 """
-import cv2
-import pytesseract
+import hashlib
+import logging
+import os
 import re
-from typing import List, Dict
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, List, Dict, Optional
 from datetime import datetime
-import numpy as np
+
+if TYPE_CHECKING:
+    import numpy as np
+
+from metrics import counter, histogram
+
+
+logger = logging.getLogger(__name__)
+
+OCR_STAGES = ('decode', 'grayscale', 'denoise', 'threshold', 'tesseract', 'parse', 'classify')
+
+# Receipts kept in the image-hash result cache (0 disables it)
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "256"))
+
+OCR_STAGE_SECONDS = histogram(
+    "freshtrack_ocr_stage_seconds",
+    "Time spent in each OCR pipeline stage",
+    ("stage",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+OCR_RECEIPTS = counter(
+    "freshtrack_ocr_receipts_total",
+    "Receipt images processed; result=miss|hit (cache)|error",
+    ("result",)
+)
+OCR_ITEMS = histogram(
+    "freshtrack_ocr_items_per_receipt",
+    "Items recognised per receipt",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+OCR_IMAGE_PIXELS = histogram(
+    "freshtrack_ocr_image_megapixels",
+    "Size of decoded receipt images",
+    buckets=(0.5, 1, 2, 4, 8, 12, 16, 24, 48)
+)
+
+
+class OCRResult:
+    """Items recognised on one receipt plus how long each stage took"""
+
+    def __init__(self, items: List[Dict], timings: Dict[str, float], width: int = 0, height: int = 0,
+                 text_length: int = 0, image_hash: str = "", cache_hit: bool = False):
+        self.items = items
+        self.timings = timings
+        self.width = width
+        self.height = height
+        self.text_length = text_length
+        self.image_hash = image_hash
+        self.cache_hit = cache_hit
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.timings.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            'items': self.items,
+            'item_count': len(self.items),
+            'timings_ms': {stage: round(seconds * 1000, 2) for stage, seconds in self.timings.items()},
+            'total_ms': round(self.total_seconds * 1000, 2),
+            'width': self.width,
+            'height': self.height,
+            'text_length': self.text_length,
+            'cache_hit': self.cache_hit
+        }
+
+
+class OCRResultCache:
+    """Thread-safe LRU of image hash -> OCRResult"""
+
+    def __init__(self, max_size: int = OCR_CACHE_SIZE):
+        self.max_size = max_size
+        self._results: "OrderedDict[str, OCRResult]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_hash: str) -> Optional[OCRResult]:
+        with self._lock:
+            result = self._results.get(image_hash)
+            if result is not None:
+                self._results.move_to_end(image_hash)
+            return result
+
+    def put(self, image_hash: str, result: OCRResult):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._results[image_hash] = result
+            self._results.move_to_end(image_hash)
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+
+# Process-wide default, so services created per request share it
+shared_cache = OCRResultCache()
+
+
+def load_libraries():
+    """
+    Import OpenCV, numpy and pytesseract (once per process)
+
+    Returns:
+        (cv2, numpy, pytesseract) modules
+    """
+    import cv2
+    import numpy
+    import pytesseract
+
+    return cv2, numpy, pytesseract
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Add the block's duration to timings[stage]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
 
 
 class ReceiptOCRService:
     """Service for processing receipt images and extracting food items"""
 
-    def __init__(self):
-        # Configure Tesseract path for Windows
-        import sys
-        import os
+    def __init__(self, cache: Optional[OCRResultCache] = None):
+        """
+        Args:
+            cache: Image-hash result cache (the process-wide one if omitted)
+        """
+        self.cache = cache or shared_cache
 
+        # Configure Tesseract path for Windows
         if sys.platform == 'win32':
             # Try common installation paths
             possible_paths = [
@@ -28,69 +164,97 @@ class ReceiptOCRService:
 
             for path in possible_paths:
                 if os.path.exists(path):
+                    _, _, pytesseract = load_libraries()
                     pytesseract.pytesseract.tesseract_cmd = path
-                    print(f"✅ Found Tesseract at: {path}")
+                    logger.info(f"✅ Found Tesseract at: {path}")
                     break
             else:
-                print("⚠️  Warning: Tesseract not found in common paths.")
-                print("   Please install from: https://github.com/UB-Mannheim/tesseract/wiki")
-                print("   Or set the path manually in ocr_service.py")
+                logger.warning("⚠️  Tesseract not found in common paths. Install it from "
+                               "https://github.com/UB-Mannheim/tesseract/wiki or set the path "
+                               "manually in ocr_service.py")
 
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def decode_image(self, image_path: str, data: Optional[bytes] = None) -> "np.ndarray":
         """
-        Preprocess receipt image for better OCR accuracy
+        Decode a receipt image file (or its already-read bytes) to BGR pixels
+        """
+        cv2, np, _ = load_libraries()
+        if data is None:
+            img = cv2.imread(image_path)
+        else:
+            img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+        if img is None:
+            raise ValueError(f"Could not read image from {image_path}")
+        return img
+
+    def preprocess_pixels(self, img: "np.ndarray", timings: Optional[Dict[str, float]] = None) -> "np.ndarray":
+        """
+        Grayscale, denoise and binarize decoded pixels for OCR
 
         Args:
-            image_path: Path to the receipt image
+            img: BGR image
+            timings: Per-stage seconds are added here if given
 
         Returns:
             Preprocessed image as numpy array
         """
-        # Read image
-        img = cv2.imread(image_path)
-
-        if img is None:
-            raise ValueError(f"Could not read image from {image_path}")
+        cv2, np, _ = load_libraries()
+        timings = {} if timings is None else timings
 
         # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        with timed(timings, 'grayscale'):
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
         # Apply denoising
-        denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+        with timed(timings, 'denoise'):
+            denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
 
-        # Apply thresholding (binary)
-        thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+        with timed(timings, 'threshold'):
+            # Apply thresholding (binary)
+            thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
 
-        # Dilation and erosion to remove noise
-        kernel = np.ones((1, 1), np.uint8)
-        processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+            # Dilation and erosion to remove noise
+            kernel = np.ones((1, 1), np.uint8)
+            processed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
 
         return processed
 
-    def extract_text_from_image(self, image_path: str) -> str:
+    def preprocess_image(self, image_path: str) -> "np.ndarray":
         """
-        Extract text from receipt image using OCR
+        Preprocess receipt image for better OCR accuracy
 
         Args:
             image_path: Path to the receipt image
 
         Returns:
-            Extracted text as string
+            Preprocessed image as numpy array
         """
-        # Preprocess image
-        processed_img = self.preprocess_image(image_path)
+        return self.preprocess_pixels(self.decode_image(image_path))
 
+    def recognize_text(self, processed_img: "np.ndarray") -> str:
+        """Run Tesseract on a preprocessed image"""
         # Configure OCR (PSM 6 = single uniform block of text)
         custom_config = r'--oem 3 --psm 6'
+        _, _, pytesseract = load_libraries()
 
         # Perform OCR with Chinese and English support
-        text = pytesseract.image_to_string(
+        return pytesseract.image_to_string(
             processed_img,
             lang='chi_sim+eng',
             config=custom_config
         )
 
-        return text
+    def extract_text_from_image(self, image_path: str) -> str:
+        """
+        Extract text from receipt image using OCR
+
+        Args:
+            image_path: Path to the receipt image
+
+        Returns:
+            Extracted text as string
+        """
+        return self.recognize_text(self.preprocess_image(image_path))
 
     def parse_receipt_text(self, text: str) -> List[Dict]:
         """
@@ -102,6 +266,18 @@ class ReceiptOCRService:
         Returns:
             List of dictionaries containing item information
         """
+        return self.classify_items(self.parse_receipt_lines(text))
+
+    def parse_receipt_lines(self, text: str) -> List[Dict]:
+        """
+        Extract item lines from OCR text, without categories
+
+        Args:
+            text: Raw OCR text from receipt
+
+        Returns:
+            List of item dictionaries; classify_items() adds 'category'
+        """
         items = []
         lines = text.split('\n')
 
@@ -129,8 +305,7 @@ class ReceiptOCRService:
                     'name': name,
                     'quantity': quantity,
                     'unit_price': unit_price,
-                    'total_price': total_price,
-                    'category': self._classify_item(name)
+                    'total_price': total_price
                 })
                 continue
 
@@ -146,12 +321,17 @@ class ReceiptOCRService:
                         'name': name,
                         'quantity': 1,
                         'unit_price': price,
-                        'total_price': price,
-                        'category': self._classify_item(name)
+                        'total_price': price
                     })
 
         return items
 
+    def classify_items(self, items: List[Dict]) -> List[Dict]:
+        """Set each item's 'category' (in place) and return the list"""
+        for item in items:
+            item['category'] = self._classify_item(item['name'])
+        return items
+
     def _is_likely_food_item(self, text: str) -> bool:
         """
         Filter out non-food items (like "total", "cash", etc.)
@@ -208,37 +388,87 @@ class ReceiptOCRService:
         # Default category
         return '其他'
 
-    def process_receipt_image(self, image_path: str) -> List[Dict]:
+    def analyze_receipt_image(self, image_path: str) -> OCRResult:
         """
-        Main method to process a receipt image and extract items
+        Process a receipt image and report how long each stage took
 
         Args:
             image_path: Path to the receipt image file
 
         Returns:
-            List of extracted food items with structured data
+            OCRResult with the extracted items, per-stage timings, image size
+            and whether it was answered from the image-hash cache
         """
+        timings = {}
         try:
-            # Extract text
-            text = self.extract_text_from_image(image_path)
+            with timed(timings, 'decode'):
+                with open(image_path, 'rb') as f:
+                    data = f.read()
+                image_hash = hashlib.sha256(data).hexdigest()
+
+            cached = self.cache.get(image_hash)
+            if cached is not None:
+                OCR_RECEIPTS.inc(result="hit")
+                logger.info(f"♻️  Receipt {image_hash[:12]} already recognised, reusing {len(cached.items)} items")
+                return OCRResult(
+                    [dict(item) for item in cached.items], timings, cached.width, cached.height,
+                    cached.text_length, image_hash, cache_hit=True
+                )
 
-            print(f"📄 Extracted text from receipt:")
-            print(text)
-            print("\n" + "="*50 + "\n")
+            with timed(timings, 'decode'):
+                img = self.decode_image(image_path, data)
+            height, width = img.shape[:2]
 
-            # Parse items
-            items = self.parse_receipt_text(text)
+            processed_img = self.preprocess_pixels(img, timings)
 
-            print(f"✅ Found {len(items)} items:")
-            for item in items:
-                print(f"  - {item['name']} | {item['category']} | ¥{item['total_price']}")
+            with timed(timings, 'tesseract'):
+                text = self.recognize_text(processed_img)
+            logger.debug(f"📄 Extracted text from receipt:\n{text}")
 
-            return items
+            with timed(timings, 'parse'):
+                items = self.parse_receipt_lines(text)
+
+            with timed(timings, 'classify'):
+                self.classify_items(items)
 
         except Exception as e:
-            print(f"❌ Error processing receipt: {str(e)}")
+            OCR_RECEIPTS.inc(result="error")
+            logger.error(f"❌ Error processing receipt: {str(e)}")
             raise
 
+        result = OCRResult(items, timings, width, height, len(text), image_hash)
+        self.cache.put(image_hash, OCRResult(
+            [dict(item) for item in items], dict(timings), width, height, len(text), image_hash
+        ))
+
+        OCR_RECEIPTS.inc(result="miss")
+        OCR_ITEMS.observe(len(items))
+        OCR_IMAGE_PIXELS.observe(width * height / 1_000_000)
+        for stage, seconds in timings.items():
+            OCR_STAGE_SECONDS.observe(seconds, stage=stage)
+
+        logger.info(
+            f"✅ Found {len(items)} items on {width}x{height} receipt in {result.total_seconds * 1000:.0f} ms ("
+            + ", ".join(f"{stage} {timings[stage] * 1000:.0f}" for stage in OCR_STAGES if stage in timings)
+            + ")"
+        )
+        for item in items:
+            logger.debug(f"  - {item['name']} | {item['category']} | ¥{item['total_price']}")
+
+        return result
+
+    def process_receipt_image(self, image_path: str) -> List[Dict]:
+        """
+        Main method to process a receipt image and extract items
+
+        Args:
+            image_path: Path to the receipt image file
+
+        Returns:
+            List of extracted food items with structured data
+        """
+        return self.analyze_receipt_image(image_path).items
+
 
 # Example usage
 if __name__ == "__main__":
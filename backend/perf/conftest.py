@@ -0,0 +1,323 @@
+"""
+Fixtures for the in-process API performance suite
+
+main.app is driven through Starlette's TestClient against a throwaway
+SQLite database seeded with --perf-rows food items, a shopping list and the
+recipe and shelf-life tables. Receipt OCR is replaced by the real text
+parser on a fixed receipt, so uploads don't need the tesseract binary and
+time only the API and database work.
+
+Latency is recorded relative to a reference request (GET /api/users/{id},
+one primary-key read through the same middleware stack) measured in the
+same run, so baselines.json carries over between machines; SQL statements
+per request are compared exactly.
+
+    python -m pytest perf -q                          # compare with baselines.json
+    python -m pytest perf -q --perf-rows 10000        # bigger database
+    python -m pytest perf -q --perf-update-baselines  # record this machine's numbers
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+STUB_RECEIPT_TEXT = "2 x 牛奶 x 7.95 = 15.90\n苹果 12.50\n鸡蛋 9.80\nbread 6.00\n合计 44.20\n"
+
+CATEGORIES = ["蔬菜", "水果", "肉类", "乳制品", "蛋类", "调味品", "其他"]
+
+# (name, category, refrigerator days); includes the stub receipt's items
+FOODS = [
+    ("牛奶", "乳制品", 7), ("苹果", "水果", 30), ("鸡蛋", "蛋类", 28), ("bread", "其他", 5),
+    ("西红柿", "蔬菜", 7), ("土豆", "蔬菜", 21), ("洋葱", "蔬菜", 30), ("胡萝卜", "蔬菜", 21),
+    ("黄瓜", "蔬菜", 7), ("青椒", "蔬菜", 7), ("猪肉", "肉类", 3), ("鸡胸肉", "肉类", 2),
+    ("牛肉", "肉类", 3), ("豆腐", "其他", 5), ("酸奶", "乳制品", 14), ("香蕉", "水果", 5),
+    ("橙子", "水果", 21), ("生菜", "蔬菜", 5), ("大蒜", "调味品", 60), ("生姜", "调味品", 30),
+]
+
+# Reference endpoint latencies are divided by
+REFERENCE = ('GET', '/api/users/{user_id}', '/api/users/{user_id}')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf", "FreshTrack API performance suite")
+    group.addoption("--perf-rows", type=int, default=int(os.getenv("PERF_ROWS", "2000")),
+                    help="Food items seeded for the benchmark user")
+    group.addoption("--perf-recipes", type=int, default=int(os.getenv("PERF_RECIPES", "500")),
+                    help="Recipes seeded for the recommendation endpoint")
+    group.addoption("--perf-shelf-life", type=int, default=int(os.getenv("PERF_SHELF_LIFE", "200")),
+                    help="Shelf-life rows seeded for receipt uploads")
+    group.addoption("--perf-requests", type=int, default=int(os.getenv("PERF_REQUESTS", "50")),
+                    help="Timed requests per endpoint")
+    group.addoption("--perf-tolerance", type=float, default=float(os.getenv("PERF_TOLERANCE", "2.0")),
+                    help="Fail when latency relative to the reference exceeds baseline x tolerance")
+    group.addoption("--perf-update-baselines", action="store_true",
+                    help="Write the measured numbers to baselines.json instead of comparing")
+
+
+def pytest_configure(config):
+    # Before main/database are imported, so the engine uses the temp DB
+    workdir = tempfile.mkdtemp(prefix="freshtrack-perf-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'perf.db')}"
+    # One user uploads --perf-requests receipts back to back; keep the
+    # concurrency limits but not the per-user upload rate
+    os.environ.setdefault("UPLOAD_RATE_PER_MINUTE", "0")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    config.perf_results = {}
+
+
+def seed(rows: int, recipes: int, shelf_life: int) -> dict:
+    """
+    Benchmark data: a reader with `rows` food items and rows/4 shopping
+    entries, an uploader, and the recipe and shelf-life tables
+
+    Item names come from FOODS, so recommendations find matching recipes
+    and receipt items find their shelf life.
+    """
+    from sqlalchemy import insert
+    from database import SessionLocal
+    from models import User, FoodItem, ShoppingListItem, Recipe, FoodShelfLife
+
+    rng = random.Random(45)
+    db = SessionLocal()
+    reader = User(email="perf@freshtrack.app", username="perf")
+    uploader = User(email="perf-upload@freshtrack.app", username="perf-upload")
+    db.add_all([reader, uploader])
+    db.commit()
+
+    now = datetime.utcnow()
+    if rows:
+        db.execute(insert(FoodItem), [
+            {
+                "user_id": reader.id,
+                "food_name": FOODS[index % len(FOODS)][0],
+                "category": FOODS[index % len(FOODS)][1],
+                "purchase_date": now - timedelta(days=index % 10),
+                "expiration_date": now + timedelta(days=index % 30 - 5, hours=index % 24),
+                "quantity": 1 + index % 5,
+                "quantity_unit": "个",
+                "is_consumed": 1 if index % 10 == 0 else 0
+            }
+            for index in range(rows)
+        ])
+    shopping_rows = max(rows // 4, 1)
+    db.execute(insert(ShoppingListItem), [
+        {"user_id": reader.id, "item_name": FOODS[index % len(FOODS)][0], "quantity": 1 + index % 3}
+        for index in range(shopping_rows)
+    ])
+    if recipes:
+        db.execute(insert(Recipe), [
+            {
+                "name": f"Recipe {index + 1}",
+                "name_cn": f"菜谱{index + 1}",
+                "category": CATEGORIES[index % len(CATEGORIES)],
+                "ingredients": json.dumps(sorted(name for name, _, _ in rng.sample(FOODS, rng.randint(2, 6))),
+                                          ensure_ascii=False),
+                "instructions": "1. 准备食材 2. 烹饪 3. 装盘",
+                "prep_time": 5 + index % 4 * 5,
+                "cook_time": index % 6 * 10,
+                "servings": 1 + index % 4
+            }
+            for index in range(recipes)
+        ])
+    if shelf_life:
+        # Padding rows after the real names, as an imported table would have
+        db.execute(insert(FoodShelfLife), [
+            {
+                "food_name": f"{name} #{index // len(FOODS)}" if index >= len(FOODS) else name,
+                "food_name_cn": f"{name} #{index // len(FOODS)}" if index >= len(FOODS) else name,
+                "category": category,
+                "refrigerator_min": max(1, days // 2),
+                "refrigerator_max": days
+            }
+            for index, (name, category, days) in ((index, FOODS[index % len(FOODS)]) for index in range(shelf_life))
+        ])
+    db.commit()
+
+    users = {"reader": reader.id, "uploader": uploader.id}
+    db.close()
+    return users
+
+
+@pytest.fixture(scope="session")
+def backend_dir():
+    """Directory of the API modules (the working directory for subprocesses)"""
+    return BACKEND_DIR
+
+
+@pytest.fixture
+def imap_stub():
+    """Local IMAP server (imap_stub.py) running for the duration of one test"""
+    from imap_stub import running_imap_stub
+
+    with running_imap_stub() as server:
+        yield server
+
+
+@pytest.fixture
+def stub_ocr(monkeypatch):
+    """Receipt OCR parses STUB_RECEIPT_TEXT instead of running tesseract"""
+    from ocr_service import ReceiptOCRService
+
+    monkeypatch.setattr(ReceiptOCRService, "process_receipt_image",
+                        lambda self, image_path: self.parse_receipt_text(STUB_RECEIPT_TEXT))
+
+
+@pytest.fixture(scope="session")
+def perf_users(request):
+    from database import init_db
+    import models  # noqa: F401  (registers the tables for init_db)
+
+    init_db()
+    return seed(
+        request.config.getoption("--perf-rows"),
+        request.config.getoption("--perf-recipes"),
+        request.config.getoption("--perf-shelf-life")
+    )
+
+
+@pytest.fixture(scope="session")
+def client(perf_users):
+    from fastapi.testclient import TestClient
+    from ocr_service import ReceiptOCRService
+    import main
+
+    original = ReceiptOCRService.process_receipt_image
+    ReceiptOCRService.process_receipt_image = lambda self, image_path: self.parse_receipt_text(STUB_RECEIPT_TEXT)
+    try:
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        ReceiptOCRService.process_receipt_image = original
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def load_baselines() -> dict:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def perf_baseline(request):
+    """Baseline for one endpoint at the configured database size, or None"""
+    rows = str(request.config.getoption("--perf-rows"))
+    baselines = load_baselines().get(rows, {})
+    return lambda name: baselines.get(name)
+
+
+def time_requests(client, config, method: str, url: str, route: str, make_kwargs=None,
+                  expected_status: int = 200) -> dict:
+    """
+    Time --perf-requests calls of one endpoint after a short warm-up
+
+    Returns p50/p95/p99 latency in ms, sequential throughput and SQL
+    statements per request (from the request metrics middleware).
+    """
+    from request_metrics import DB_STATEMENTS
+
+    make_kwargs = make_kwargs or (lambda: {})
+    count = config.getoption("--perf-requests")
+
+    for _ in range(min(5, count)):
+        response = client.request(method, url, **make_kwargs())
+        assert response.status_code == expected_status, response.text
+
+    statements_before = DB_STATEMENTS.value(method=method, route=route)['sum']
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        kwargs = make_kwargs()
+        request_started = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        assert response.status_code == expected_status, response.text
+    elapsed = time.perf_counter() - started
+
+    return {
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'rps': round(count / elapsed, 1),
+        'statements': round((DB_STATEMENTS.value(method=method, route=route)['sum'] - statements_before) / count, 2)
+    }
+
+
+@pytest.fixture(scope="session")
+def perf_reference(client, perf_users, request):
+    """Latency of the reference request on this machine, in this run"""
+    method, url, route = REFERENCE
+    result = time_requests(client, request.config, method, url.format(user_id=perf_users['reader']), route)
+    request.config.perf_reference = result
+    return result
+
+
+@pytest.fixture
+def measure(client, perf_reference, request):
+    """
+    Time one endpoint (see time_requests)
+
+    Adds p50_ratio/p95_ratio: latency divided by the reference request's.
+    """
+    def run(name: str, method: str, url: str, route: str, make_kwargs=None, expected_status: int = 200):
+        result = time_requests(client, request.config, method, url, route, make_kwargs, expected_status)
+        for key in ('p50', 'p95'):
+            result[f'{key}_ratio'] = round(result[f'{key}_ms'] / max(perf_reference[f'{key}_ms'], 0.001), 2)
+        request.config.perf_results[name] = result
+        return result
+
+    return run
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if not config.getoption("--perf-update-baselines") or not config.perf_results:
+        return
+
+    baselines = load_baselines()
+    rows = str(config.getoption("--perf-rows"))
+    baselines.setdefault(rows, {}).update({
+        name: {key: result[key] for key in ('p50_ratio', 'p95_ratio', 'statements')}
+        for name, result in config.perf_results.items()
+    })
+    with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = getattr(config, "perf_results", None)
+    if not results:
+        return
+
+    reference = config.perf_reference
+    terminalreporter.section(f"API performance ({config.getoption('--perf-rows')} rows)")
+    terminalreporter.write_line(
+        f"reference {REFERENCE[0]} {REFERENCE[1]}: p50 {reference['p50_ms']:.2f} ms, p95 {reference['p95_ms']:.2f} ms"
+    )
+    terminalreporter.write_line(
+        f"{'endpoint':16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'SQL/req':>8} "
+        f"{'p50 ×ref':>9} {'p95 ×ref':>9}"
+    )
+    for name, result in results.items():
+        terminalreporter.write_line(
+            f"{name:16} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['rps']:>8.1f} {result['statements']:>8} "
+            f"{result['p50_ratio']:>9.2f} {result['p95_ratio']:>9.2f}"
+        )
+    if config.getoption("--perf-update-baselines"):
+        terminalreporter.write_line(f"📝 Baselines written to {BASELINES_PATH}")
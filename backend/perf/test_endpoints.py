@@ -0,0 +1,61 @@
+"""
+Latency, throughput and SQL-per-request regression checks per endpoint
+
+Each case fails when the endpoint issues more SQL statements per request
+than it used to, or when its p50 or p95 latency relative to the reference
+request (see conftest.py) grows beyond the stored ratio x --perf-tolerance.
+"""
+import itertools
+
+import pytest
+
+
+def receipt_upload():
+    """Fresh multipart body per request (the stub OCR ignores the bytes)"""
+    counter = itertools.count()
+    return lambda: {'files': {'file': (f"receipt-{next(counter)}.png", b"\x89PNG perf", "image/png")}}
+
+
+CASES = [
+    # name, method, url, route template, request kwargs factory, user
+    ('items', 'GET', '/api/items/{user_id}', '/api/items/{user_id}', None, 'reader'),
+    ('items_all', 'GET', '/api/items/{user_id}?limit=1000', '/api/items/{user_id}', None, 'reader'),
+    ('expiring', 'GET', '/api/items/expiring/{user_id}?days=3', '/api/items/expiring/{user_id}', None, 'reader'),
+    ('stats', 'GET', '/api/stats/{user_id}', '/api/stats/{user_id}', None, 'reader'),
+    ('dashboard', 'GET', '/api/dashboard/{user_id}', '/api/dashboard/{user_id}', None, 'reader'),
+    ('recommend', 'GET', '/api/recipes/recommend/{user_id}', '/api/recipes/recommend/{user_id}', None, 'reader'),
+    ('shopping', 'GET', '/api/shopping/{user_id}', '/api/shopping/{user_id}', None, 'reader'),
+    ('receipt_upload', 'POST', '/api/receipt/upload/{user_id}', '/api/receipt/upload/{user_id}',
+     receipt_upload, 'uploader'),
+]
+
+
+@pytest.mark.parametrize(
+    "name, method, url, route, kwargs_factory, user",
+    CASES,
+    ids=[case[0] for case in CASES]
+)
+def test_endpoint_performance(name, method, url, route, kwargs_factory, user,
+                              perf_users, measure, perf_baseline, request):
+    result = measure(
+        name, method, url.format(user_id=perf_users[user]), route,
+        make_kwargs=kwargs_factory() if kwargs_factory else None
+    )
+
+    if request.config.getoption("--perf-update-baselines"):
+        return
+
+    baseline = perf_baseline(name)
+    if baseline is None:
+        pytest.skip(f"No baseline for {name} at this --perf-rows; record one with --perf-update-baselines")
+
+    tolerance = request.config.getoption("--perf-tolerance")
+    regressions = []
+    for key in ('p50_ratio', 'p95_ratio'):
+        if result[key] > baseline[key] * tolerance:
+            regressions.append(f"{key} {result[key]:.2f} > {baseline[key]:.2f} x {tolerance}")
+    # Statement counts don't depend on the machine, so no tolerance
+    if result['statements'] > baseline['statements']:
+        regressions.append(f"SQL statements/request {result['statements']} > {baseline['statements']}")
+
+    assert not regressions, f"{name} regressed: " + "; ".join(regressions)
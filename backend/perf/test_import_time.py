@@ -0,0 +1,89 @@
+"""
+Cold-start import budgets for the API process and the CLI tools
+
+Each module is imported in a fresh interpreter (best of IMPORT_RUNS, so the
+first run's bytecode compilation doesn't count). A case fails when the
+import takes longer than its budget, or when it loads one of the OCR
+libraries that only ocr_service.load_libraries() should pull in.
+
+Budgets are relative to importing fastapi and sqlalchemy, measured the
+same way and interleaved with the module's own runs, so they hold on fast
+and slow machines alike: each is about 1.3x the module's measured share of
+that reference (with a floor of MIN_BUDGET_MS for modules that import
+almost nothing). Loosen
+them with PERF_IMPORT_BUDGET_SCALE=1.5 on noisy machines.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+IMPORT_RUNS = 3
+BUDGET_SCALE = float(os.getenv("PERF_IMPORT_BUDGET_SCALE", "1.0"))
+
+# Imported by the OCR pipeline only
+OCR_LIBRARIES = ("cv2", "numpy", "pytesseract")
+
+# The framework imports every API-side module pays for
+REFERENCE_IMPORT = "fastapi, sqlalchemy"
+
+# Budget as a multiple of the reference import time
+BUDGET_RATIOS = {
+    # API process
+    'main': 1.65,
+    'serve': 0.05,
+    # Receipt ingestion
+    'email_monitor': 0.6,
+    'mailbox_ingest': 0.65,
+    'ocr_service': 0.05,
+    # CLI tools
+    'generate_data': 0.05,
+    'loadgen': 0.35,
+    'loadtest_ingest': 0.1,
+    'bench_serialization': 0.05,
+    'bench_write_paths': 0.1,
+    'init_sample_data': 0.5,
+    'demo': 0.5,
+}
+
+# Below this, interpreter start-up noise dominates
+MIN_BUDGET_MS = 50
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'ms': elapsed * 1000, 'loaded': [name for name in {libraries!r} if name in sys.modules]}}))
+"""
+
+
+def import_in_fresh_interpreter(module: str, backend_dir: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, libraries=OCR_LIBRARIES)],
+        cwd=backend_dir, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, f"import {module} failed:\n{result.stderr}"
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module, ratio", sorted(BUDGET_RATIOS.items()), ids=sorted(BUDGET_RATIOS))
+def test_import_time(module, ratio, backend_dir):
+    # Interleaved with the reference so both see the same machine load
+    runs, reference_runs = [], []
+    for _ in range(IMPORT_RUNS):
+        reference_runs.append(import_in_fresh_interpreter(REFERENCE_IMPORT, backend_dir)['ms'])
+        runs.append(import_in_fresh_interpreter(module, backend_dir))
+    best_ms = min(run['ms'] for run in runs)
+    reference_ms = min(reference_runs)
+    budget_ms = max(ratio * reference_ms, MIN_BUDGET_MS) * BUDGET_SCALE
+
+    assert not runs[0]['loaded'], (
+        f"import {module} loads {', '.join(runs[0]['loaded'])}; import them in the OCR code path instead"
+    )
+    assert best_ms <= budget_ms, (
+        f"import {module} took {best_ms:.0f} ms, budget {budget_ms:.0f} ms "
+        f"({ratio} x {reference_ms:.0f} ms for import {REFERENCE_IMPORT})"
+    )
@@ -0,0 +1,43 @@
+"""
+Email ingestion against the local IMAP stub, at a volume small enough for CI
+
+Both ingestion paths must drain a seeded mailbox completely: every message
+processed, none left unread, and (for mailbox_ingest) the checkpoint moved
+to the last UID so the next poll starts after it. OCR is stubbed as in the
+API suite; loadtest_ingest.py covers throughput at larger volumes.
+"""
+import json
+
+from loadtest_ingest import run_async, run_sync
+
+MESSAGES = 200
+SENDERS = 20
+PASSWORD = "secret"
+
+
+def test_check_new_emails_drains_mailbox(imap_stub, stub_ocr, perf_users):
+    from imap_stub import seed_receipt_emails
+
+    account = "receipt-sync@freshtrack.app"
+    mailbox = seed_receipt_emails(imap_stub, account, MESSAGES, senders=SENDERS, password=PASSWORD)
+
+    run = run_sync(imap_stub, account, PASSWORD, MESSAGES)
+
+    assert run['processed'] == MESSAGES
+    assert mailbox.unseen_count() == 0
+
+
+def test_mailbox_ingest_drains_mailbox_and_advances_checkpoint(imap_stub, stub_ocr, perf_users, tmp_path):
+    from imap_stub import seed_receipt_emails
+
+    account = "receipt-async@freshtrack.app"
+    mailbox = seed_receipt_emails(imap_stub, account, MESSAGES, senders=SENDERS, password=PASSWORD)
+    checkpoint_file = tmp_path / "checkpoints.json"
+
+    run = run_async(imap_stub, [account], PASSWORD, MESSAGES, ocr_workers=4,
+                    checkpoint_file=str(checkpoint_file), timeout=60)
+
+    assert run['processed'] == MESSAGES
+    assert mailbox.unseen_count() == 0
+    checkpoint = json.loads(checkpoint_file.read_text(encoding="utf-8"))[account]
+    assert checkpoint['last_uid'] == mailbox.messages[-1]['uid']
@@ -0,0 +1,189 @@
+"""
+Opt-in SQL profiler
+With SQL_PROFILE=1 every statement run on the engine is timed and, while a
+request is being served, recorded against that request in normalized form
+(literals and IN-lists replaced by placeholders). At the end of the request
+it flags:
+
+    repeated  - the same statement shape run SQL_REPEAT_THRESHOLD+ times,
+                usually a query inside a loop (N+1)
+    slow      - statements slower than SQL_SLOW_QUERY_MS
+
+and writes one structured (JSON) log line, at WARNING when something was
+flagged and DEBUG otherwise. Responses carry a summary in the X-SQL-Profile
+header. Slow statements outside requests (email monitor, event hub) are
+logged as they happen.
+
+It costs a regex pass per statement, so leave it off in production.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ENABLED = os.getenv("SQL_PROFILE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "3"))
+
+PROFILE_HEADER = "X-SQL-Profile"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_statement(statement: str) -> str:
+    """
+    Statement shape: literals -> ?, IN (?, ?, ...) -> IN (?, ...)
+
+    Args:
+        statement: SQL as sent to the driver
+
+    Returns:
+        Single-line statement that is equal for calls differing only in values
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(?, ...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryProfile:
+    """Statements executed during one request (or profile() block)"""
+
+    def __init__(self):
+        self.queries: List[tuple] = []
+
+    def record(self, statement: str, seconds: float):
+        self.queries.append((normalize_statement(statement), seconds))
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(seconds for _, seconds in self.queries)
+
+    def repeated(self, threshold: int = None) -> List[dict]:
+        """Statement shapes run at least `threshold` times (N+1 suspects)"""
+        threshold = threshold or REPEAT_THRESHOLD
+        shapes: Dict[str, list] = {}
+        for shape, seconds in self.queries:
+            shapes.setdefault(shape, []).append(seconds)
+        return [
+            {'sql': shape, 'count': len(timings), 'total_ms': round(sum(timings) * 1000, 2)}
+            for shape, timings in shapes.items()
+            if len(timings) >= threshold
+        ]
+
+    def slow(self, threshold_ms: float = None) -> List[dict]:
+        threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+        return [
+            {'sql': shape, 'ms': round(seconds * 1000, 2)}
+            for shape, seconds in self.queries
+            if seconds * 1000 >= threshold_ms
+        ]
+
+    def summary(self) -> dict:
+        return {
+            'statements': len(self.queries),
+            'db_ms': round(self.total_seconds * 1000, 2),
+            'repeated': self.repeated(),
+            'slow': self.slow()
+        }
+
+
+current_profile: contextvars.ContextVar[Optional[QueryProfile]] = contextvars.ContextVar(
+    "current_profile", default=None
+)
+
+
+@contextmanager
+def profile():
+    """
+    Record the statements run inside the block
+
+    Works whether or not SQL_PROFILE is set, as long as install() was
+    called on the engine, e.g. in tests: with profile() as p: ...
+    """
+    query_profile = QueryProfile()
+    token = current_profile.set(query_profile)
+    try:
+        yield query_profile
+    finally:
+        current_profile.reset(token)
+
+
+def record_statement(statement: str, seconds: float):
+    """Statement consumer: add to the current profile, or log it if slow"""
+    query_profile = current_profile.get()
+    if query_profile is not None:
+        query_profile.record(statement, seconds)
+    elif seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning("slow_query %s", json.dumps({
+            'sql': normalize_statement(statement), 'ms': round(seconds * 1000, 2)
+        }, ensure_ascii=False))
+
+
+def install(engine):
+    """
+    Time every statement on the engine (idempotent)
+
+    Uses request_metrics' cursor hook rather than a second pair of
+    listeners, so each statement is timed once for both.
+    """
+    # Here rather than at the top: database.py imports this module and the
+    # CLI tools that import database.py don't need starlette
+    from request_metrics import add_statement_consumer, instrument_engine
+
+    instrument_engine(engine)
+    add_statement_consumer(record_statement)
+
+
+def profile_header(summary: dict) -> str:
+    return (f"statements={summary['statements']};db_ms={summary['db_ms']};"
+            f"repeated={len(summary['repeated'])};slow={len(summary['slow'])}")
+
+
+class QueryProfilerMiddleware:
+    """ASGI middleware profiling each request's SQL (add only when enabled)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile() as query_profile:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    # Statements after this point (streamed bodies) still
+                    # reach the log, just not the header
+                    header = profile_header(query_profile.summary())
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (PROFILE_HEADER.lower().encode("latin-1"), header.encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                log_profile(scope, query_profile)
+
+
+def log_profile(scope, query_profile: QueryProfile):
+    summary = query_profile.summary()
+    record = dict(method=scope["method"], path=scope["path"], **summary)
+    flagged = summary['repeated'] or summary['slow']
+    logger.log(
+        logging.WARNING if flagged else logging.DEBUG,
+        "sql_profile %s", json.dumps(record, ensure_ascii=False)
+    )
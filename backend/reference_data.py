@@ -0,0 +1,129 @@
+"""
+In-memory copies of the read-mostly reference tables
+food_shelf_life and recipes are only written by the import scripts
+(init_sample_data.py, demo.py, generate_data.py), yet every receipt item
+looked up its shelf life with an ILIKE scan and every recommendation loaded
+and JSON-parsed the whole recipe table. Each worker now keeps both in
+memory and reloads them every REFERENCE_DATA_TTL_SECONDS, so imports still
+show up without a restart. warm() loads them before a worker takes traffic.
+"""
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from database import SessionLocal
+
+
+REFERENCE_DATA_TTL_SECONDS = float(os.getenv("REFERENCE_DATA_TTL_SECONDS", "300"))
+
+# Distinct food names remembered per snapshot
+MAX_MEMOIZED_LOOKUPS = 10000
+
+
+class CachedRecipe:
+    """Recipe row with its ingredient list parsed once"""
+
+    __slots__ = ("id", "name", "name_cn", "category", "ingredients", "ingredient_list",
+                 "ingredient_set", "prep_time", "cook_time")
+
+    def __init__(self, recipe):
+        self.id = recipe.id
+        self.name = recipe.name
+        self.name_cn = recipe.name_cn
+        self.category = recipe.category
+        self.ingredients = recipe.ingredients
+        self.ingredient_list = json.loads(recipe.ingredients) if recipe.ingredients else []
+        self.ingredient_set = frozenset(self.ingredient_list)
+        self.prep_time = recipe.prep_time
+        self.cook_time = recipe.cook_time
+
+
+class ReferenceTable(ABC):
+    """Table snapshot rebuilt when older than the TTL; subclasses implement load()"""
+
+    def __init__(self, ttl: float = REFERENCE_DATA_TTL_SECONDS):
+        self.ttl = ttl
+        self._data = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db=None):
+        data = self._data
+        if data is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return data
+
+        with self._lock:
+            if self._data is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self._data = self._load_with(db)
+                self._loaded_at = time.monotonic()
+            return self._data
+
+    def invalidate(self):
+        self._loaded_at = 0.0
+
+    def _load_with(self, db):
+        if db is not None:
+            return self.load(db)
+        db = SessionLocal()
+        try:
+            return self.load(db)
+        finally:
+            db.close()
+
+    @abstractmethod
+    def load(self, db):
+        """Read the table from db and return the snapshot get() hands out"""
+
+
+class ShelfLifeIndex(ReferenceTable):
+    """food_shelf_life as (lowercased Chinese name, refrigerator_max) in id order"""
+
+    def load(self, db) -> dict:
+        from models import FoodShelfLife
+
+        rows = db.query(FoodShelfLife.food_name_cn, FoodShelfLife.refrigerator_max).order_by(FoodShelfLife.id).all()
+        return {
+            'rows': [((name or "").lower(), refrigerator_max) for name, refrigerator_max in rows],
+            'lookups': {}
+        }
+
+    def refrigerator_days(self, food_name: str, db=None) -> Optional[int]:
+        """
+        refrigerator_max of the first entry whose Chinese name contains
+        food_name (case-insensitive), the same row as
+        food_name_cn ILIKE '%food_name%' ... first()
+        """
+        data = self.get(db)
+        lookups = data['lookups']
+        key = food_name.lower()
+        if key not in lookups:
+            if len(lookups) >= MAX_MEMOIZED_LOOKUPS:
+                lookups.clear()
+            lookups[key] = next((days for name, days in data['rows'] if key in name), None)
+        return lookups[key]
+
+
+class RecipeIndex(ReferenceTable):
+    """All recipes with parsed ingredient sets"""
+
+    def load(self, db) -> List[CachedRecipe]:
+        from models import Recipe
+
+        return [CachedRecipe(recipe) for recipe in db.query(Recipe).order_by(Recipe.id).all()]
+
+
+shelf_life_index = ShelfLifeIndex()
+recipe_index = RecipeIndex()
+
+
+def warm(db=None) -> Dict[str, int]:
+    """Load every reference table now; returns row counts"""
+    shelf_life_index.invalidate()
+    recipe_index.invalidate()
+    return {
+        'shelf_life': len(shelf_life_index.get(db)['rows']),
+        'recipes': len(recipe_index.get(db))
+    }
@@ -0,0 +1,182 @@
+"""
+Per-route HTTP and database metrics
+RequestMetricsMiddleware is a plain ASGI middleware (so streaming responses
+such as /api/events pass straight through) that records, per route template:
+
+    freshtrack_http_requests_total             count by method, route, status
+    freshtrack_http_request_duration_seconds   latency histogram
+    freshtrack_http_requests_in_flight         requests currently being served
+    freshtrack_http_response_size_bytes        response body size histogram
+    freshtrack_db_statements_per_request       SQL statements per request
+    freshtrack_db_seconds_per_request          time spent in SQL per request
+
+Routes are labelled by template ("/api/items/{user_id}"), never by the raw
+path, so label cardinality stays bounded. The DB figures come from engine
+cursor events attributed to the request through a context variable, which
+follows the request into the threadpool and into coalesced computations.
+The same cursor hook hands each statement's timing to registered
+consumers (the SQL profiler), so statements are timed only once.
+"""
+import contextvars
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+from metrics import LATENCY_BUCKETS, counter, gauge, histogram
+
+
+REQUESTS = counter(
+    "freshtrack_http_requests_total",
+    "HTTP requests served",
+    ("method", "route", "status")
+)
+REQUEST_DURATION = histogram(
+    "freshtrack_http_request_duration_seconds",
+    "Time from request start to the end of the response body",
+    ("method", "route")
+)
+IN_FLIGHT = gauge(
+    "freshtrack_http_requests_in_flight",
+    "Requests currently being served",
+    ("method", "route")
+)
+RESPONSE_SIZE = histogram(
+    "freshtrack_http_response_size_bytes",
+    "Response body size",
+    ("method", "route"),
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+)
+DB_STATEMENTS = histogram(
+    "freshtrack_db_statements_per_request",
+    "SQL statements executed while serving one request",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+DB_TIME = histogram(
+    "freshtrack_db_seconds_per_request",
+    "Time spent executing SQL while serving one request",
+    ("method", "route"),
+    buckets=(0.0005, 0.001, 0.0025) + LATENCY_BUCKETS
+)
+
+# Label for paths no route matches (404s), so scanners can't add label values
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """SQL work done on behalf of one request"""
+
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+# Called with (statement, seconds) for every statement, in or out of requests
+statement_consumers: List[Callable[[str, float], None]] = []
+
+
+def add_statement_consumer(consumer: Callable[[str, float], None]):
+    """Also pass every statement's SQL and duration to consumer (idempotent)"""
+    if consumer not in statement_consumers:
+        statement_consumers.append(consumer)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if statement_consumers or current_request.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    seconds = time.perf_counter() - started.pop()
+
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += seconds
+    for consumer in statement_consumers:
+        consumer(statement, seconds)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    """Attribute statements run on this engine to the current request (idempotent)"""
+    if event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def route_template(scope) -> str:
+    """Path template of the route that will handle this request"""
+    app = scope.get("app")
+    if app is None:
+        return UNMATCHED_ROUTE
+
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial is None:
+            # Path matches but the method doesn't (405)
+            partial = getattr(route, "path", None)
+    return partial or UNMATCHED_ROUTE
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording the per-route metrics above"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        response = {'status': 500, 'bytes': 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response['status'] = message["status"]
+            elif message["type"] == "http.response.body":
+                response['bytes'] += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec(method=method, route=route)
+            current_request.reset(token)
+
+            REQUESTS.inc(method=method, route=route, status=response['status'])
+            REQUEST_DURATION.observe(elapsed, method=method, route=route)
+            RESPONSE_SIZE.observe(response['bytes'], method=method, route=route)
+            DB_STATEMENTS.observe(stats.statements, method=method, route=route)
+            DB_TIME.observe(stats.db_seconds, method=method, route=route)
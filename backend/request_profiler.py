@@ -0,0 +1,223 @@
+"""
+On-demand sampling profiler for single requests
+Set PROFILE_TOKEN on the server, then send one request with
+`X-Profile-Token: <token>`. While that request is served, a background
+thread samples the Python stacks of every busy thread (event loop and
+threadpool) every PROFILE_SAMPLE_INTERVAL_MS and writes them in collapsed
+stack format ("frame;frame;frame count" - flamegraph.pl, speedscope and
+inferno read it directly) to PROFILE_DIR. The response carries the profile
+id in X-Profile-Id; fetch it with GET /debug/profiles/{id} and the same
+header.
+
+Safe to leave enabled: without the token nothing changes, at most one
+request is profiled at a time, no more than PROFILE_MAX_PER_MINUTE per
+worker, and sampling stops after PROFILE_MAX_SECONDS (for event streams).
+Other requests running at the same time show up in the samples too, so
+profile on a quiet worker when the picture needs to be clean.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from metrics import counter
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./data/profiles")
+SAMPLE_INTERVAL_SECONDS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+MAX_PROFILES_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", "6"))
+MAX_PROFILE_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+
+TOKEN_HEADER = "X-Profile-Token"
+ID_HEADER = "X-Profile-Id"
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+PROFILE_REQUESTS = counter(
+    "freshtrack_profile_requests_total",
+    "Requests asking to be profiled; outcome=profiled|rate_limited|bad_token",
+    ("outcome",)
+)
+
+# Innermost frames of threads waiting for work rather than doing it
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame) -> Optional[str]:
+    """Root-first ';'-joined stack, or None for an idle thread"""
+    code = frame.f_code
+    if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+        return None
+
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """Samples all busy threads' stacks until stopped"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS, max_seconds: float = MAX_PROFILE_SECONDS):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + self.max_seconds
+
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = collapse_stack(frame)
+                if stack is None:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                # Thread name as the root frame keeps loop and pool work apart
+                self.stacks[f"{names.get(thread_id, thread_id)};{stack}"] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileLimiter:
+    """One profile at a time, at most `per_minute` started per minute"""
+
+    def __init__(self, per_minute: int = MAX_PROFILES_PER_MINUTE):
+        self.per_minute = per_minute
+        self._started = []
+        self._active = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._started = [started for started in self._started if now - started < 60]
+            if self._active or len(self._started) >= self.per_minute:
+                return False
+            self._active = True
+            self._started.append(now)
+            return True
+
+    def release(self):
+        with self._lock:
+            self._active = False
+
+
+limiter = ProfileLimiter()
+
+
+def token_valid(token: Optional[str]) -> bool:
+    if not PROFILE_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    """File of a stored profile, or None for an id that isn't one of ours"""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    return os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+
+
+def save_profile(profile_id: str, scope, sampler: StackSampler, elapsed: float):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(profile_path(profile_id), "w", encoding="utf-8") as f:
+        f.write(sampler.collapsed())
+    logger.info(
+        f"🔥 Profiled {scope['method']} {scope['path']}: {sampler.samples} samples "
+        f"over {elapsed * 1000:.0f} ms -> {profile_id}"
+    )
+
+
+class RequestProfilerMiddleware:
+    """ASGI middleware profiling requests that carry a valid X-Profile-Token"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(TOKEN_HEADER.lower().encode("latin-1"))
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not token_valid(token.decode("latin-1")):
+            PROFILE_REQUESTS.inc(outcome="bad_token")
+            await self.app(scope, receive, send)
+            return
+
+        if not limiter.acquire():
+            PROFILE_REQUESTS.inc(outcome="rate_limited")
+            await self.app(scope, receive, self._with_header(send, "rate-limited"))
+            return
+
+        PROFILE_REQUESTS.inc(outcome="profiled")
+        profile_id = f"{int(time.time())}-{secrets.token_hex(4)}"
+        sampler = StackSampler()
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, self._with_header(send, profile_id))
+        finally:
+            elapsed = time.perf_counter() - started
+            # Joining the sampler thread and writing the file block, so
+            # neither runs on the event loop
+            try:
+                await asyncio.to_thread(sampler.stop)
+            finally:
+                limiter.release()
+            try:
+                await asyncio.to_thread(save_profile, profile_id, scope, sampler, elapsed)
+            except OSError as e:
+                logger.error(f"❌ Could not save profile {profile_id}: {str(e)}")
+
+    @staticmethod
+    def _with_header(send, value: str):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (ID_HEADER.lower().encode("latin-1"), value.encode("latin-1"))
+                ]
+            await send(message)
+        return send_wrapper
@@ -0,0 +1,79 @@
+"""
+Sender address to user ID cache for email ingestion
+Partner inboxes receive thousands of messages from a few hundred senders, so
+resolving the sender of every message against the users table is wasted work.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class SenderCache:
+    """
+    Thread-safe bounded LRU cache mapping sender addresses to user IDs
+
+    Negative entries (user_id None) remember senders that are known not to
+    map to a user - invalid addresses, or unknown senders when
+    auto-registration is off. They expire after `negative_ttl` seconds so a
+    later registration is picked up.
+    """
+
+    def __init__(self, max_size: int = 10000, negative_ttl: float = 300.0):
+        """
+        Args:
+            max_size: Maximum number of cached senders
+            negative_ttl: Seconds a negative entry stays valid
+        """
+        self.max_size = max_size
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sender_email: str) -> Tuple[bool, Optional[int]]:
+        """
+        Look up a sender
+
+        Returns:
+            (found, user_id) - found is False on a miss; user_id is None for
+            a cached negative result
+        """
+        with self._lock:
+            entry = self._entries.get(sender_email)
+
+            if entry is not None:
+                user_id, expires_at = entry
+                if user_id is not None or time.monotonic() < expires_at:
+                    self._entries.move_to_end(sender_email)
+                    self.hits += 1
+                    return True, user_id
+                del self._entries[sender_email]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, sender_email: str, user_id: int):
+        """Cache a resolved user ID"""
+        self._store(sender_email, (user_id, 0.0))
+
+    def put_negative(self, sender_email: str):
+        """Cache that a sender does not map to any user"""
+        self._store(sender_email, (None, time.monotonic() + self.negative_ttl))
+
+    def invalidate(self, sender_email: str):
+        """Drop a sender from the cache"""
+        with self._lock:
+            self._entries.pop(sender_email, None)
+
+    def _store(self, sender_email: str, entry: Tuple[Optional[int], float]):
+        with self._lock:
+            self._entries[sender_email] = entry
+            self._entries.move_to_end(sender_email)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
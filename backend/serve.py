@@ -0,0 +1,67 @@
+"""
+Production entry point for the API
+Runs N uvicorn worker processes sharing one listening socket:
+
+    - the schema is created/upgraded once here, before any worker starts,
+      so workers don't race each other running DDL on boot
+    - SQLite is switched to WAL (see database.py), so the workers, the email
+      monitor and mailbox_ingest can read concurrently while writes queue
+      for the lock (SQLITE_BUSY_TIMEOUT_MS)
+    - each worker loads reference data, imports the OCR stack and starts its
+      OCR threads before it accepts connections; GET /ready answers 200 only
+      after that
+    - on SIGTERM a worker stops accepting connections, waits at most
+      --graceful-timeout seconds for in-flight requests and then cancels
+      the rest, including open /api/events streams (clients reconnect)
+
+Usage:
+    python serve.py                     # WEB_CONCURRENCY or CPU count workers on :8000
+    python serve.py --workers 4 --port 8080
+"""
+import argparse
+import os
+import sys
+
+# Fix encoding for Windows console
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the FreshTrack API with several worker processes")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--graceful-timeout", type=float,
+                        default=float(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "10")),
+                        help="Seconds to wait for in-flight requests on shutdown")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-warmup", action="store_true", help="Accept traffic before caches are warm")
+    args = parser.parse_args()
+
+    import uvicorn
+    from database import engine, init_db
+    import models  # noqa: F401  (registers the tables for init_db)
+
+    # Schema once, in the parent; workers inherit SCHEMA_CHECKED and skip it
+    init_db()
+    engine.dispose()
+    os.environ["SCHEMA_CHECKED"] = "1"
+    os.environ["WARMUP"] = "0" if args.no_warmup else "1"
+
+    print(f"🚀 Starting {args.workers} workers on {args.host}:{args.port}")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+        timeout_graceful_shutdown=args.graceful_timeout
+    )
+
+
+if __name__ == "__main__":
+    main()
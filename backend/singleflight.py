@@ -0,0 +1,62 @@
+"""
+Request coalescing ("single flight")
+Concurrent callers asking for the same key share one computation: the first
+one starts it in the threadpool, the rest await the same result. Nothing is
+cached once the computation finishes - keys should change with the data
+(e.g. include the user's data version) so a later call never gets a result
+computed before a write.
+"""
+import asyncio
+from typing import Callable, Dict, Hashable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import counter
+
+
+COALESCED_CALLS = counter(
+    "freshtrack_singleflight_calls_total",
+    "Calls to coalesced endpoints; role=leader ran the work, role=follower reused it",
+    ("name", "role")
+)
+
+
+class SingleFlight:
+    """Share one in-flight computation among concurrent identical calls"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Optional[Hashable], fn: Callable, *args):
+        """
+        Run fn(*args) in the threadpool, or join the identical call in flight
+
+        A None key disables coalescing for this call.
+        """
+        if key is None:
+            COALESCED_CALLS.inc(name=self.name, role="leader")
+            return await run_in_threadpool(fn, *args)
+
+        call = self._calls.get(key)
+        if call is None:
+            COALESCED_CALLS.inc(name=self.name, role="leader")
+            # A task of its own, so a leader whose client disconnects
+            # doesn't cancel the work its followers are waiting for
+            call = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._calls[key] = call
+            call.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            COALESCED_CALLS.inc(name=self.name, role="follower")
+
+        return await asyncio.shield(call)
+
+    def _finished(self, key: Hashable, call: asyncio.Future):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception retrieved even if every waiter went away
+        if not call.cancelled():
+            call.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
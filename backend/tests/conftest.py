@@ -0,0 +1,81 @@
+"""
+Fixtures for the API behaviour tests
+
+main.app runs in-process through Starlette's TestClient against a throwaway
+SQLite database (set before main/database are imported). Every test gets a
+fresh user, so tests don't see each other's rows.
+
+    python -m pytest tests -q
+"""
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_user_numbers = itertools.count(1)
+
+
+def pytest_configure(config):
+    workdir = tempfile.mkdtemp(prefix="freshtrack-tests-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'tests.db')}"
+    os.environ["WARMUP"] = "0"
+    # A time-bucket rollover mid-test would change ETags
+    os.environ["ETAG_TIME_BUCKET_SECONDS"] = "86400"
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="module")
+def client():
+    """
+    TestClient running the app's startup/shutdown once per test module
+
+    Module scope so the app is shut down again before another suite (perf/)
+    starts it in the same session.
+    """
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def new_user(client):
+    """Register a user with no items; returns its id"""
+    def register() -> int:
+        number = next(_user_numbers)
+        response = client.post("/api/users/register", json={"email": f"user{number}@tests.freshtrack.app"})
+        assert response.status_code == 201, response.text
+        return response.json()["id"]
+
+    return register
+
+
+@pytest.fixture
+def user_id(new_user):
+    return new_user()
+
+
+@pytest.fixture
+def add_items(client, user_id):
+    """Add food items expiring 1..count days from now; returns their ids"""
+    def add(count: int, category: str = "其他", days_offset: int = 0) -> list:
+        items = [
+            {
+                "food_name": f"item-{index}",
+                "category": category,
+                "expiration_date": (datetime.now() + timedelta(days=days_offset + index + 1)).isoformat()
+            }
+            for index in range(count)
+        ]
+        response = client.post(f"/api/items/{user_id}/batch", json={"items": items})
+        assert response.status_code == 201, response.text
+        return [item["id"] for item in response.json()]
+
+    return add
@@ -0,0 +1,112 @@
+"""Admission control: concurrency limits, bounded queues and per-user rate limits"""
+import asyncio
+
+import httpx
+
+from admission import AdmissionControlMiddleware, RoutePolicy, UserRateLimiter
+
+
+class GatedApp:
+    """ASGI app whose requests wait for `gate`, counting how many run at once"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, scope, receive, send):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.gate.wait()
+        finally:
+            self.running -= 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+
+def client_for(app) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def run_concurrently(policy: RoutePolicy, count: int, path: str = "/api/recipes/recommend/1", hold: float = 0.05):
+    """Send `count` concurrent requests, open the gate after `hold` seconds"""
+    async def run():
+        app = GatedApp()
+        async with client_for(AdmissionControlMiddleware(app, [policy])) as http:
+            tasks = [asyncio.ensure_future(http.get(path)) for _ in range(count)]
+            await asyncio.sleep(hold)
+            app.gate.set()
+            return await asyncio.gather(*tasks), app
+
+    return asyncio.run(run())
+
+
+def test_requests_within_limits_all_run_but_never_more_than_the_limit():
+    policy = RoutePolicy("GET", "/api/recipes/recommend/{user_id}", max_concurrency=2, max_queue=10, timeout=5)
+
+    responses, app = run_concurrently(policy, 6)
+
+    assert [response.status_code for response in responses] == [200] * 6
+    assert app.max_running == 2
+
+
+def test_full_queue_is_shed_with_503_and_retry_after():
+    policy = RoutePolicy("GET", "/api/recipes/recommend/{user_id}", max_concurrency=1, max_queue=2, timeout=5)
+
+    responses, _ = run_concurrently(policy, 5)
+
+    statuses = sorted(response.status_code for response in responses)
+    assert statuses == [200, 200, 200, 503, 503]
+    for response in responses:
+        if response.status_code == 503:
+            assert 1 <= int(response.headers["Retry-After"]) <= 60
+            assert response.json()["detail"]
+
+
+def test_queue_timeout_answers_503():
+    policy = RoutePolicy("GET", "/api/recipes/recommend/{user_id}", max_concurrency=1, max_queue=5, timeout=0.05)
+
+    responses, _ = run_concurrently(policy, 2, hold=0.3)
+
+    assert sorted(response.status_code for response in responses) == [200, 503]
+    assert all("Retry-After" in response.headers for response in responses if response.status_code == 503)
+
+
+def test_user_rate_limit_answers_429_per_user():
+    policy = RoutePolicy("POST", "/api/receipt/upload/{user_id}", max_concurrency=0, max_queue=0,
+                         user_rate=UserRateLimiter(rate_per_minute=6, burst=2))
+
+    async def run():
+        app = GatedApp()
+        app.gate.set()
+        async with client_for(AdmissionControlMiddleware(app, [policy])) as http:
+            first_user = [await http.post("/api/receipt/upload/1") for _ in range(3)]
+            other_user = await http.post("/api/receipt/upload/2")
+            return first_user, other_user
+
+    first_user, other_user = asyncio.run(run())
+
+    assert [response.status_code for response in first_user] == [200, 200, 429]
+    # One token every 10 s at 6/minute
+    assert 1 <= int(first_user[2].headers["Retry-After"]) <= 10
+    assert other_user.status_code == 200
+
+
+def test_other_routes_and_methods_pass_through():
+    policy = RoutePolicy("GET", "/api/recipes/recommend/{user_id}", max_concurrency=1, max_queue=0, timeout=5)
+
+    responses, app = run_concurrently(policy, 3, path="/api/items/1")
+
+    assert [response.status_code for response in responses] == [200] * 3
+    assert app.max_running == 3
+
+
+def test_slots_are_released_after_rejections():
+    policy = RoutePolicy("GET", "/api/recipes/recommend/{user_id}", max_concurrency=1, max_queue=0, timeout=5)
+
+    run_concurrently(policy, 3)
+
+    assert policy.limiter.active == 0
+    responses, _ = run_concurrently(policy, 1)
+    assert responses[0].status_code == 200
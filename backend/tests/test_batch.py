@@ -0,0 +1,70 @@
+"""Per-id results of the batch consume/delete/purchase endpoints"""
+
+
+def test_consume_reports_each_id_in_request_order(client, user_id, add_items):
+    first, second = add_items(2)
+
+    response = client.put(f"/api/items/{user_id}/batch/consume", json={"ids": [second, 999999, first]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "requested": 3,
+        "succeeded": 2,
+        "results": [
+            {"id": second, "status": "consumed"},
+            {"id": 999999, "status": "not_found"},
+            {"id": first, "status": "consumed"},
+        ]
+    }
+    remaining = client.get(f"/api/items/{user_id}").json()
+    assert remaining == []
+
+
+def test_repeated_ids_count_once(client, user_id, add_items):
+    item_id, = add_items(1)
+
+    body = client.put(f"/api/items/{user_id}/batch/consume", json={"ids": [item_id, item_id]}).json()
+
+    assert body["requested"] == 1
+    assert body["succeeded"] == 1
+    assert body["results"] == [{"id": item_id, "status": "consumed"}]
+
+
+def test_other_users_items_are_not_found(client, user_id, new_user, add_items):
+    item_id, = add_items(1)
+    other_user = new_user()
+
+    body = client.post(f"/api/items/{other_user}/batch/delete", json={"ids": [item_id]}).json()
+
+    assert body["succeeded"] == 0
+    assert body["results"] == [{"id": item_id, "status": "not_found"}]
+    assert [item["id"] for item in client.get(f"/api/items/{user_id}").json()] == [item_id]
+
+
+def test_delete_removes_only_found_ids(client, user_id, add_items):
+    keep, drop = add_items(2)
+
+    body = client.post(f"/api/items/{user_id}/batch/delete", json={"ids": [drop, 999999]}).json()
+
+    assert body["results"] == [{"id": drop, "status": "deleted"}, {"id": 999999, "status": "not_found"}]
+    assert [item["id"] for item in client.get(f"/api/items/{user_id}").json()] == [keep]
+
+
+def test_purchase_shopping_items(client, user_id):
+    created = client.post(f"/api/shopping/{user_id}/batch",
+                          json={"items": [{"item_name": "milk"}, {"item_name": "eggs"}]}).json()
+    milk = created[0]["id"]
+
+    body = client.put(f"/api/shopping/{user_id}/batch/purchase", json={"ids": [milk]}).json()
+
+    assert body == {"requested": 1, "succeeded": 1, "results": [{"id": milk, "status": "purchased"}]}
+    pending = client.get(f"/api/shopping/{user_id}").json()
+    assert [item["item_name"] for item in pending] == ["eggs"]
+
+
+def test_empty_and_oversized_batches_are_rejected(client, user_id):
+    from main import MAX_BATCH_SIZE
+
+    assert client.put(f"/api/items/{user_id}/batch/consume", json={"ids": []}).status_code == 422
+    too_many = list(range(1, MAX_BATCH_SIZE + 2))
+    assert client.put(f"/api/items/{user_id}/batch/consume", json={"ids": too_many}).status_code == 422
@@ -0,0 +1,76 @@
+"""Conditional GETs: ETag / If-None-Match on the per-user read endpoints"""
+import pytest
+
+READ_ENDPOINTS = [
+    "/api/items/{user_id}",
+    "/api/items/expiring/{user_id}?days=3",
+    "/api/stats/{user_id}",
+    "/api/dashboard/{user_id}",
+    "/api/shopping/{user_id}",
+]
+
+
+@pytest.mark.parametrize("path", READ_ENDPOINTS)
+def test_unchanged_data_answers_304(client, user_id, add_items, path):
+    add_items(2)
+    url = path.format(user_id=user_id)
+
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    again = client.get(url, headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+
+
+@pytest.mark.parametrize("path", READ_ENDPOINTS)
+def test_write_invalidates_etag(client, user_id, add_items, path):
+    item_id, _ = add_items(2)
+    url = path.format(user_id=user_id)
+    etag = client.get(url).headers["ETag"]
+
+    assert client.put(f"/api/items/consume/{item_id}").status_code == 200
+    response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("write", ["add", "consume", "delete", "shopping"])
+def test_every_kind_of_write_changes_the_etag(client, user_id, add_items, write):
+    item_id, = add_items(1)
+    url = f"/api/items/{user_id}"
+    etag = client.get(url).headers["ETag"]
+
+    if write == "add":
+        add_items(1)
+    elif write == "consume":
+        client.put(f"/api/items/{user_id}/batch/consume", json={"ids": [item_id]})
+    elif write == "delete":
+        client.delete(f"/api/items/{item_id}")
+    else:
+        client.post(f"/api/shopping/{user_id}", json={"item_name": "milk"})
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_etag_depends_on_the_url(client, user_id, add_items):
+    add_items(1)
+    etag = client.get(f"/api/items/{user_id}").headers["ETag"]
+
+    response = client.get(f"/api/items/{user_id}", params={"fields": "id"}, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+
+
+def test_other_users_writes_keep_the_etag(client, user_id, new_user, add_items):
+    add_items(1)
+    url = f"/api/items/{user_id}"
+    etag = client.get(url).headers["ETag"]
+
+    other_user = new_user()
+    client.post(f"/api/shopping/{other_user}", json={"item_name": "milk"})
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
@@ -0,0 +1,98 @@
+"""Keyset pagination (X-Next-Cursor) and fields= projection of the list endpoints"""
+import base64
+import json
+
+
+def encode(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_pages_cover_every_item_once_in_order(client, user_id, add_items):
+    ids = add_items(7)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(f"/api/items/{user_id}", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 3
+        seen += [item["id"] for item in page]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert seen == ids  # added in expiry order
+
+
+def test_last_page_has_no_cursor(client, user_id, add_items):
+    add_items(3)
+
+    response = client.get(f"/api/items/{user_id}", params={"limit": 3})
+
+    assert len(response.json()) == 3
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_shopping_list_pages(client, user_id):
+    items = [{"item_name": f"buy-{index}"} for index in range(5)]
+    created = client.post(f"/api/shopping/{user_id}/batch", json={"items": items}).json()
+
+    first = client.get(f"/api/shopping/{user_id}", params={"limit": 2})
+    second = client.get(f"/api/shopping/{user_id}",
+                        params={"limit": 10, "cursor": first.headers["X-Next-Cursor"]})
+
+    ids = [item["id"] for item in first.json() + second.json()]
+    assert sorted(ids) == sorted(item["id"] for item in created)
+    assert len(set(ids)) == 5
+
+
+def test_garbage_cursor_is_rejected(client, user_id):
+    response = client.get(f"/api/items/{user_id}", params={"cursor": "not a cursor!"})
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_tampered_cursors_are_rejected(client, user_id):
+    tampered = [
+        encode(["not-a-date", 1]),
+        encode(["2026-01-01T00:00:00", "x"]),
+        encode(["2026-01-01T00:00:00"]),
+        encode({"date": "2026-01-01T00:00:00", "id": 1}),
+        encode(None),
+        encode([123, 1]),
+    ]
+    for cursor in tampered:
+        response = client.get(f"/api/items/{user_id}", params={"cursor": cursor})
+        assert response.status_code == 400, cursor
+
+
+def test_fields_projection_returns_only_requested_fields(client, user_id, add_items):
+    add_items(2)
+
+    response = client.get(f"/api/items/{user_id}", params={"fields": "food_name,days_left"})
+
+    assert response.status_code == 200
+    assert [set(item) for item in response.json()] == [{"food_name", "days_left"}] * 2
+
+
+def test_projection_still_pages(client, user_id, add_items):
+    ids = add_items(3)
+
+    first = client.get(f"/api/items/{user_id}", params={"fields": "food_name", "limit": 2})
+    second = client.get(f"/api/items/{user_id}",
+                        params={"fields": "id", "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert [item["id"] for item in second.json()] == ids[2:]
+
+
+def test_unknown_field_is_rejected(client, user_id):
+    response = client.get(f"/api/items/{user_id}", params={"fields": "food_name,password"})
+
+    assert response.status_code == 400
+    assert "password" in response.json()["detail"]
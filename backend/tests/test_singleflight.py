@@ -0,0 +1,137 @@
+"""SingleFlight: concurrent identical calls share one computation"""
+import asyncio
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class SlowCounter:
+    """Blocking function that counts its calls and waits until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, value):
+        with self._lock:
+            self.calls += 1
+        self.release.wait(5)
+        return {"value": value}
+
+
+async def gather_released(counter: SlowCounter, calls):
+    """Start all calls, let them pile up, then let the computation finish"""
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    await asyncio.sleep(0.05)
+    counter.release.set()
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def test_concurrent_calls_with_same_key_share_one_run():
+    flights = SingleFlight("test")
+    counter = SlowCounter()
+
+    results = asyncio.run(gather_released(counter, [flights.run("key", counter, 1) for _ in range(10)]))
+
+    assert counter.calls == 1
+    assert results == [{"value": 1}] * 10
+    assert all(result is results[0] for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_different_keys_run_separately():
+    flights = SingleFlight("test")
+    counter = SlowCounter()
+
+    results = asyncio.run(gather_released(counter, [flights.run(key, counter, key) for key in ("a", "b", "a")]))
+
+    assert counter.calls == 2
+    assert results == [{"value": "a"}, {"value": "b"}, {"value": "a"}]
+
+
+def test_none_key_never_coalesces():
+    flights = SingleFlight("test")
+    counter = SlowCounter()
+
+    asyncio.run(gather_released(counter, [flights.run(None, counter, 1) for _ in range(3)]))
+
+    assert counter.calls == 3
+
+
+def test_results_are_not_cached_after_the_call():
+    flights = SingleFlight("test")
+    counter = SlowCounter()
+    counter.release.set()
+
+    async def twice():
+        await flights.run("key", counter, 1)
+        await flights.run("key", counter, 1)
+
+    asyncio.run(twice())
+
+    assert counter.calls == 2
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight("test")
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("boom")
+
+    async def run():
+        tasks = [asyncio.ensure_future(flights.run("key", failing)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert len(results) == 3
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    flights = SingleFlight("test")
+    counter = SlowCounter()
+
+    async def run():
+        leader = asyncio.ensure_future(flights.run("key", counter, 1))
+        follower = asyncio.ensure_future(flights.run("key", counter, 1))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        counter.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == {"value": 1}
+    assert counter.calls == 1
+
+
+def test_stats_endpoint_coalesces_identical_requests(client, user_id, add_items, monkeypatch):
+    """Concurrent /api/stats requests for one data version compute once"""
+    import httpx
+    import main
+
+    add_items(3)
+    counter = SlowCounter()
+    original = main.compute_user_stats
+    monkeypatch.setattr(main, "compute_user_stats", lambda uid: (counter(uid), original(uid))[1])
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            requests = [http.get(f"/api/stats/{user_id}") for _ in range(5)]
+            return await gather_released(counter, requests)
+
+    responses = asyncio.run(run())
+
+    assert counter.calls == 1
+    assert [response.status_code for response in responses] == [200] * 5
+    assert all(response.json()["total_items"] == 3 for response in responses)
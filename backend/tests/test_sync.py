@@ -0,0 +1,104 @@
+"""Delta sync: cursors, tombstones of deleted rows and the forced full resync"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, update
+
+
+def sync(client, user_id, since=None) -> dict:
+    params = {} if since is None else {"since": since}
+    response = client.get(f"/api/sync/{user_id}", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_full_sync_without_cursor(client, user_id, add_items):
+    ids = add_items(2)
+    client.post(f"/api/shopping/{user_id}", json={"item_name": "milk"})
+
+    body = sync(client, user_id)
+
+    assert body["full"] is True
+    assert [item["id"] for item in body["items"]] == ids
+    assert [item["item_name"] for item in body["shopping_items"]] == ["milk"]
+
+
+def test_delta_returns_only_changes_after_cursor(client, user_id, add_items):
+    old, changed = add_items(2)
+    cursor = sync(client, user_id)["cursor"]
+
+    client.put(f"/api/items/consume/{changed}")
+    new, = add_items(1, days_offset=5)
+    body = sync(client, user_id, cursor)
+
+    assert body["full"] is False
+    assert body["cursor"] > cursor
+    assert {item["id"] for item in body["items"]} == {changed, new}
+    assert [item["is_consumed"] for item in body["items"] if item["id"] == changed] == [1]
+    assert sync(client, user_id, body["cursor"])["items"] == []
+
+
+def test_deletes_are_reported_as_tombstones(client, user_id, add_items):
+    single, first, second = add_items(3)
+    shopping_id = client.post(f"/api/shopping/{user_id}", json={"item_name": "milk"}).json()["id"]
+    cursor = sync(client, user_id)["cursor"]
+
+    client.delete(f"/api/items/{single}")
+    client.post(f"/api/items/{user_id}/batch/delete", json={"ids": [first, second]})
+    # No API deletes shopping entries; the trigger covers any DELETE
+    from database import SessionLocal
+    from models import ShoppingListItem
+
+    db = SessionLocal()
+    try:
+        db.execute(delete(ShoppingListItem).where(ShoppingListItem.id == shopping_id))
+        db.commit()
+    finally:
+        db.close()
+    body = sync(client, user_id, cursor)
+
+    assert body["full"] is False
+    assert sorted(body["deleted"]["items"]) == sorted([single, first, second])
+    assert body["deleted"]["shopping_items"] == [shopping_id]
+    assert sync(client, user_id, body["cursor"])["deleted"] == {"items": [], "shopping_items": []}
+
+
+def test_cursor_from_another_database_gets_full_sync(client, user_id, add_items):
+    add_items(1)
+    cursor = sync(client, user_id)["cursor"]
+
+    assert sync(client, user_id, cursor + 1000)["full"] is True
+
+
+def test_cursor_older_than_pruned_tombstones_gets_full_sync(client, user_id, add_items):
+    import main
+    from database import SessionLocal
+    from models import SyncTombstone
+
+    old, recent, kept = add_items(3)
+    before_deletes = sync(client, user_id)["cursor"]
+    client.delete(f"/api/items/{old}")
+    after_old_delete = sync(client, user_id)["cursor"]
+    client.delete(f"/api/items/{recent}")
+
+    # Age the first tombstone past the retention window and prune it
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(SyncTombstone)
+            .where(SyncTombstone.user_id == user_id, SyncTombstone.item_id == old)
+            .values(deleted_at=datetime.utcnow() - timedelta(days=main.TOMBSTONE_RETENTION_DAYS + 1))
+        )
+        db.commit()
+    finally:
+        db.close()
+    assert main.prune_expired_tombstones() >= 1
+
+    # The old cursor would miss the pruned delete: full sync instead
+    stale = sync(client, user_id, before_deletes)
+    assert stale["full"] is True
+    assert [item["id"] for item in stale["items"]] == [kept]
+
+    # A cursor taken after the pruned delete still gets a delta
+    fresh = sync(client, user_id, after_old_delete)
+    assert fresh["full"] is False
+    assert fresh["deleted"]["items"] == [recent]
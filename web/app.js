@@ -5,6 +5,13 @@ const USER_ID = 1; // Demo user ID
 // Global state
 let currentPage = 'dashboard';
 let allFoodItems = [];
+let allShoppingItems = [];
+let fridgeItemsLoaded = false;
+let shoppingItemsLoaded = false;
+// X-Next-Cursor of the next page to load (null when everything is loaded)
+let fridgeCursor = null;
+let pendingShoppingCursor = null;
+let purchasedShoppingCursor = null;
 let currentFilter = 'all';
 
 // Initialize app
@@ -12,6 +19,7 @@ document.addEventListener('DOMContentLoaded', () => {
     initNavigation();
     loadDashboard();
     setDefaultDate();
+    subscribeToChanges();
 });
 
 // Navigation
@@ -63,13 +71,10 @@ function navigateToPage(pageName) {
 // Dashboard
 async function loadDashboard() {
     try {
-        const stats = await fetchAPI(`/api/stats/${USER_ID}`);
-        updateStats(stats);
-
-        const items = await fetchAPI(`/api/items/expiring/${USER_ID}?days=3`);
-        updateUrgentItems(items);
-
-        updateCategoryChart(stats.category_breakdown);
+        const dashboard = await fetchAPI(`/api/dashboard/${USER_ID}?days=3`);
+        updateStats(dashboard.stats);
+        updateUrgentItems(dashboard.urgent_items);
+        updateCategoryChart(dashboard.category_breakdown);
     } catch (error) {
         showToast('加载数据失败', 'error');
     }
@@ -137,9 +142,25 @@ function refreshDashboard() {
 // Fridge Items
 async function loadFridgeItems() {
     try {
-        const items = await fetchAPI(`/api/items/${USER_ID}`);
-        allFoodItems = items;
-        displayFoodItems(items);
+        const page = await fetchPage(`/api/items/${USER_ID}`);
+        allFoodItems = page.data;
+        fridgeCursor = page.nextCursor;
+        fridgeItemsLoaded = true;
+        filterItems(currentFilter);
+    } catch (error) {
+        showToast('加载食材失败', 'error');
+    }
+}
+
+async function loadMoreFridgeItems() {
+    if (!fridgeCursor) return;
+    try {
+        const page = await fetchPage(`/api/items/${USER_ID}`, fridgeCursor);
+        // Live updates may already have added some of these rows
+        allFoodItems = mergeRows(allFoodItems, page.data, [], () => false);
+        allFoodItems.sort((a, b) => a.expiration_date.localeCompare(b.expiration_date) || a.id - b.id);
+        fridgeCursor = page.nextCursor;
+        filterItems(currentFilter);
     } catch (error) {
         showToast('加载食材失败', 'error');
     }
@@ -148,7 +169,7 @@ async function loadFridgeItems() {
 function displayFoodItems(items) {
     const container = document.getElementById('fridgeItems');
 
-    if (items.length === 0) {
+    if (items.length === 0 && !fridgeCursor) {
         container.innerHTML = `
             <div class="empty-state">
                 <div class="empty-state-icon">📭</div>
@@ -186,7 +207,7 @@ function displayFoodItems(items) {
                 </div>
             </div>
         `;
-    }).join('');
+    }).join('') + loadMoreButton(fridgeCursor, 'loadMoreFridgeItems()');
 }
 
 function filterItems(filter) {
@@ -319,10 +340,42 @@ function addMissingToShoppingList(ingredients, recipeName) {
 }
 
 // Shopping List
+// Open items and the purchase history are paged separately, so a long
+// history never has to be downloaded to show what is left to buy
+const PENDING_SHOPPING_ENDPOINT = () => `/api/shopping/${USER_ID}`;
+const SHOPPING_HISTORY_ENDPOINT = () => `/api/shopping/${USER_ID}?include_purchased=true`;
+
 async function loadShoppingList() {
     try {
-        const items = await fetchAPI(`/api/shopping/${USER_ID}?include_purchased=true`);
-        displayShoppingList(items);
+        const [pending, history] = await Promise.all([
+            fetchPage(PENDING_SHOPPING_ENDPOINT()),
+            fetchPage(SHOPPING_HISTORY_ENDPOINT())
+        ]);
+        allShoppingItems = mergeRows(pending.data, history.data, [], () => false);
+        allShoppingItems.sort((a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id);
+        pendingShoppingCursor = pending.nextCursor;
+        purchasedShoppingCursor = history.nextCursor;
+        shoppingItemsLoaded = true;
+        displayShoppingList(allShoppingItems);
+    } catch (error) {
+        showToast('加载购物清单失败', 'error');
+    }
+}
+
+async function loadMoreShoppingItems(purchased) {
+    const cursor = purchased ? purchasedShoppingCursor : pendingShoppingCursor;
+    if (!cursor) return;
+    try {
+        const endpoint = purchased ? SHOPPING_HISTORY_ENDPOINT() : PENDING_SHOPPING_ENDPOINT();
+        const page = await fetchPage(endpoint, cursor);
+        allShoppingItems = mergeRows(allShoppingItems, page.data, [], () => false);
+        allShoppingItems.sort((a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id);
+        if (purchased) {
+            purchasedShoppingCursor = page.nextCursor;
+        } else {
+            pendingShoppingCursor = page.nextCursor;
+        }
+        displayShoppingList(allShoppingItems);
     } catch (error) {
         showToast('加载购物清单失败', 'error');
     }
@@ -335,13 +388,13 @@ function displayShoppingList(items) {
     const pending = items.filter(item => item.is_purchased === 0);
     const purchased = items.filter(item => item.is_purchased === 1);
 
-    pendingList.innerHTML = pending.length > 0 ?
+    pendingList.innerHTML = (pending.length > 0 || pendingShoppingCursor ?
         pending.map(item => createShoppingItemHTML(item)).join('') :
-        '<p class="empty-state">购物清单为空</p>';
+        '<p class="empty-state">购物清单为空</p>') + loadMoreButton(pendingShoppingCursor, 'loadMoreShoppingItems(false)');
 
-    purchasedList.innerHTML = purchased.length > 0 ?
+    purchasedList.innerHTML = (purchased.length > 0 || purchasedShoppingCursor ?
         purchased.map(item => createShoppingItemHTML(item)).join('') :
-        '<p class="empty-state">暂无已购买商品</p>';
+        '<p class="empty-state">暂无已购买商品</p>') + loadMoreButton(purchasedShoppingCursor, 'loadMoreShoppingItems(true)');
 }
 
 function createShoppingItemHTML(item) {
@@ -434,8 +487,60 @@ async function addFoodItem(event) {
     }
 }
 
+// Live updates (server-sent events)
+function subscribeToChanges() {
+    if (!window.EventSource) return;
+
+    // EventSource reconnects by itself and sends Last-Event-ID, so the
+    // server replays whatever was missed while disconnected
+    const source = new EventSource(`${API_BASE_URL}/api/events/${USER_ID}`);
+    source.addEventListener('change', (e) => applyChanges(JSON.parse(e.data)));
+}
+
+function mergeRows(rows, changed, deletedIds, isRemoved) {
+    const byId = new Map(rows.map(row => [row.id, row]));
+    deletedIds.forEach(id => byId.delete(id));
+    changed.forEach(row => {
+        if (isRemoved(row)) {
+            byId.delete(row.id);
+        } else {
+            byId.set(row.id, row);
+        }
+    });
+    return Array.from(byId.values());
+}
+
+function applyChanges(change) {
+    if (fridgeItemsLoaded) {
+        allFoodItems = change.full ? change.items : mergeRows(
+            allFoodItems, change.items, change.deleted.items, item => item.is_consumed === 1
+        );
+        allFoodItems.sort((a, b) => a.expiration_date.localeCompare(b.expiration_date) || a.id - b.id);
+        if (currentPage === 'fridge') filterItems(currentFilter);
+    }
+
+    if (shoppingItemsLoaded) {
+        allShoppingItems = change.full ? change.shopping_items : mergeRows(
+            allShoppingItems, change.shopping_items, change.deleted.shopping_items, () => false
+        );
+        allShoppingItems.sort((a, b) => b.created_at.localeCompare(a.created_at) || b.id - a.id);
+        if (currentPage === 'shopping') displayShoppingList(allShoppingItems);
+    }
+
+    // Counts and the urgent list are computed server-side
+    if (currentPage === 'dashboard') loadDashboard();
+}
+
 // Utility Functions
+
+// GET responses by endpoint, revalidated with If-None-Match
+const etagCache = new Map();
+
 async function fetchAPI(endpoint, method = 'GET', data = null) {
+    if (method === 'GET') {
+        return (await conditionalGet(endpoint)).data;
+    }
+
     const options = {
         method,
         headers: {
@@ -457,6 +562,51 @@ async function fetchAPI(endpoint, method = 'GET', data = null) {
     return response.json();
 }
 
+// GET that reuses the cached body when the server answers 304 Not Modified
+async function conditionalGet(endpoint) {
+    const cached = etagCache.get(endpoint);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, { headers });
+
+    if (response.status === 304 && cached) {
+        return cached;
+    }
+
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail || 'Request failed');
+    }
+
+    const entry = {
+        data: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+        etag: response.headers.get('ETag')
+    };
+    if (entry.etag) {
+        etagCache.set(endpoint, entry);
+    }
+
+    return entry;
+}
+
+// One page of a list endpoint: { data, nextCursor } (nextCursor from X-Next-Cursor)
+async function fetchPage(endpoint, cursor = null) {
+    const separator = endpoint.includes('?') ? '&' : '?';
+    return conditionalGet(
+        cursor ? `${endpoint}${separator}cursor=${encodeURIComponent(cursor)}` : endpoint
+    );
+}
+
+// "Load more" button for a paged list, or nothing when it is fully loaded
+function loadMoreButton(cursor, onclick) {
+    return cursor ? `
+        <div class="load-more">
+            <button class="btn btn-sm" onclick="${onclick}">⬇️ 加载更多</button>
+        </div>
+    ` : '';
+}
+
 function showToast(message, type = 'success') {
     const toast = document.getElementById('toast');
     toast.textContent = message;
@@ -605,6 +755,11 @@ async function uploadReceipt() {
 
         if (!response.ok) {
             const error = await response.json();
+            // 429/503 from admission control: say when to try again
+            const retryAfter = response.headers.get('Retry-After');
+            if (retryAfter && (response.status === 429 || response.status === 503)) {
+                throw new Error(`服务器繁忙，请 ${retryAfter} 秒后重试`);
+            }
             throw new Error(error.detail || 'Upload failed');
         }
 